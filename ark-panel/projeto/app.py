@@ -10,17 +10,162 @@ import psutil
 import a2s
 import threading
 import shutil
+import socket
+import queue
+import bisect
+import re
+import gzip
+import atexit
+import fcntl
+import errno
+import tempfile
+import sqlite3
+import sys
+import hmac
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for
 app = Flask(__name__)
 # Configurações
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_DIR = os.path.join(BASE_DIR, 'config')
 SERVERS_FILE = os.path.join(CONFIG_DIR, 'servers.json')
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+LOG_INDEX_DIR = os.path.join(LOGS_DIR, '.index')
+RUN_DIR = os.path.join(BASE_DIR, 'run')
+DATA_DIR = os.path.join(BASE_DIR, 'data')
 # Criar diretórios necessários
 os.makedirs(CONFIG_DIR, exist_ok=True)
 os.makedirs(LOGS_DIR, exist_ok=True)
+os.makedirs(LOG_INDEX_DIR, exist_ok=True)
+os.makedirs(RUN_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+# Configurações do painel (config/panel.json sobrescreve os valores padrão)
+PANEL_SETTINGS_FILE = os.path.join(CONFIG_DIR, 'panel.json')
+DEFAULT_PANEL_SETTINGS = {
+    'status_refresh_interval': 10,  # Segundos entre coletas de status dos servidores
+    'process_rescan_interval': 60,  # Segundos entre varreduras completas para servidores sem PID registrado
+    'a2s_timeout': 2.0,  # Prazo máximo (segundos) de cada consulta A2S
+    'a2s_max_workers': 16,  # Consultas A2S simultâneas
+    'a2s_cache_ttl': 5,  # Segundos que uma resposta A2S bem-sucedida é reaproveitada
+    'a2s_backoff_base': 5,  # Espera inicial (segundos) após uma falha A2S, dobrando a cada falha seguida
+    'a2s_backoff_max': 120,  # Espera máxima (segundos) entre tentativas para servidores inacessíveis
+    'log_rotate_max_bytes': 50 * 1024 * 1024,  # Rotacionar logs a partir deste tamanho
+    'log_rotate_max_age_days': 7,  # Rotacionar logs abertos há mais que este número de dias
+    'log_rotate_check_interval': 300,  # Segundos entre verificações de rotação
+    'log_retention_count': 10,  # Arquivos compactados mantidos por log
+    'log_retention_days': 30,  # Arquivos compactados mais antigos que isso são removidos
+    'job_max_workers': 2,  # Execuções simultâneas do SteamCMD (instalar/atualizar/desinstalar)
+    'job_history_limit': 200,  # Tarefas concluídas mantidas no histórico
+    'shared_install': False,  # Uma instalação base do SteamCMD por branch, clonada para cada mapa
+    'shared_install_root': '/home/arkserver/ark-base',  # Instalações base: <raiz>/<branch>
+    # auto: hardlink para conteúdo imutável (mesmo inode = page cache compartilhado), reflink/cópia para o resto;
+    # reflink: tudo via reflink (cópia independente, sem compartilhar page cache); copy: cópia completa
+    'shared_install_link_mode': 'auto',
+    'build_check_ttl': 600,  # Segundos de cache da build mais recente por branch (consultada uma vez para todos)
+    'rolling_update_concurrency': 2,  # Servidores parados/atualizados ao mesmo tempo numa atualização gradual
+    'rolling_update_drain_timeout': 600,  # Segundos esperando servidores com jogadores esvaziarem antes de atualizá-los mesmo assim
+    'rolling_update_boot_timeout': 900,  # Segundos esperando o servidor voltar a responder A2S após reiniciar
+    'rolling_update_poll_interval': 15,  # Intervalo entre consultas de jogadores/A2S durante a atualização gradual
+    'metrics_history_enabled': True,  # Gravar as coletas de status em data/metrics.db
+    'metrics_raw_retention_hours': 24,  # Amostras brutas (uma por coleta)
+    'metrics_1m_retention_days': 7,  # Agregados de 1 minuto
+    'metrics_15m_retention_days': 90,  # Agregados de 15 minutos
+    'metrics_1h_retention_days': 730,  # Agregados de 1 hora
+    'server_mode': 'dev',  # dev (servidor do Flask), waitress (threads) ou gunicorn (processos + threads)
+    'server_host': '0.0.0.0',
+    'server_port': 5000,
+    'server_threads': 16,  # Threads por processo (waitress/gunicorn)
+    'server_workers': 2,  # Processos do gunicorn; só o líder coleta status, os demais leem o snapshot compartilhado
+    'max_log_streams': 6,  # Conexões SSE de log simultâneas por processo
+    'heavy_request_slots': 4,  # Buscas em logs e históricos simultâneos por processo
+    'heavy_request_wait': 2,  # Segundos esperando uma vaga antes de responder 503 (em vez de ocupar todas as threads)
+    'admin_token': '',  # Token das rotas administrativas (X-Admin-Token); vazio = rotas bloqueadas
+    'admin_allow_localhost': False,  # Liberar sem token para 127.0.0.1/::1 (atrás de nginx/proxy TODA requisição é local)
+    'profile_max_seconds': 60  # Duração máxima de uma sessão do profiler por amostragem
+}
+def load_panel_settings():
+    """Carregar configurações do painel sobre os valores padrão"""
+    settings = dict(DEFAULT_PANEL_SETTINGS)
+    if os.path.exists(PANEL_SETTINGS_FILE):
+        try:
+            with open(PANEL_SETTINGS_FILE, 'r') as f:
+                settings.update(json.load(f))
+        except Exception as e:
+            print(f"Erro ao ler {PANEL_SETTINGS_FILE}, usando padrões: {e}")
+    return settings
+PANEL_SETTINGS = load_panel_settings()
+# Histogramas em memória para /metrics (formato de exposição do Prometheus, sem dependências)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HISTOGRAMS = {
+    'ark_panel_a2s_query_seconds': ('Latência das consultas A2S', LATENCY_BUCKETS),
+    'ark_panel_process_scan_seconds': ('Duração das varreduras da tabela de processos', LATENCY_BUCKETS),
+    'ark_panel_status_collection_seconds': ('Duração de cada coleta de status', LATENCY_BUCKETS + (30.0, 60.0)),
+    'ark_panel_http_request_seconds': ('Latência das requisições HTTP por endpoint', LATENCY_BUCKETS),
+    'ark_panel_stage_seconds': ('Duração das etapas internas (leitura de arquivos, renderização)', (0.0001, 0.0005, 0.001) + LATENCY_BUCKETS)
+}
+_histogram_series = {name: {} for name in HISTOGRAMS}
+_histogram_lock = threading.Lock()
+def observe_histogram(name, value, labels=None):
+    """Registrar uma observação num histograma (contagem por bucket, soma e total)"""
+    buckets = HISTOGRAMS[name][1]
+    key = tuple(sorted((labels or {}).items()))
+    with _histogram_lock:
+        series = _histogram_series[name].get(key)
+        if series is None:
+            series = _histogram_series[name][key] = {'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series['counts'][i] += 1
+                break
+        series['sum'] += value
+        series['count'] += 1
+def copy_histogram_series():
+    """Cópia consistente das séries de todos os histogramas deste processo"""
+    with _histogram_lock:
+        return {name: {k: dict(v, counts=list(v['counts'])) for k, v in series.items()}
+                for name, series in _histogram_series.items()}
+@contextmanager
+def timed_stage(stage):
+    """Medir um trecho do caminho quente (usável como bloco with ou como decorador)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_histogram('ark_panel_stage_seconds', time.perf_counter() - started, {'stage': stage})
+def estimate_histogram_quantile(buckets, counts, total, q):
+    """Estimar um quantil pelo limite superior do bucket que o contém"""
+    target = q * total
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return None
+def get_timing_summary():
+    """Resumo dos histogramas por série: contagem, média e p50/p95 aproximados (em ms)"""
+    summary = {}
+    with _histogram_lock:
+        for name, (_, buckets) in HISTOGRAMS.items():
+            rows = []
+            for key, series in _histogram_series[name].items():
+                if not series['count']:
+                    continue
+                p50 = estimate_histogram_quantile(buckets, series['counts'], series['count'], 0.5)
+                p95 = estimate_histogram_quantile(buckets, series['counts'], series['count'], 0.95)
+                rows.append({
+                    'labels': dict(key),
+                    'count': series['count'],
+                    'mean_ms': round(series['sum'] / series['count'] * 1000, 3),
+                    'p50_ms': p50 * 1000 if p50 is not None else None,
+                    'p95_ms': p95 * 1000 if p95 is not None else None
+                })
+            rows.sort(key=lambda r: r['mean_ms'] * r['count'], reverse=True)
+            summary[name] = rows
+    return summary
 # Servidores pré-configurados
 ALL_ARK_MAPS = {
     "servers": [
@@ -143,21 +288,138 @@ ALL_ARK_MAPS = {
         }
     ]
 }
+# Registro de servidores em memória: recarregado só quando servers.json muda (mtime/inode/tamanho)
+SERVER_REGISTRY_CHECK_INTERVAL = 1.0  # No máximo um stat() do arquivo por segundo
+SERVER_PORT_KEYS = ('game_port', 'query_port', 'rcon_port')
+SERVER_REQUIRED_KEYS = ('id', 'path') + SERVER_PORT_KEYS
+_server_registry = {
+    'data': None,
+    'by_id': {},
+    'by_port': {key: {} for key in SERVER_PORT_KEYS},
+    'signature': None,
+    'checked_at': 0.0,
+    'errors': []
+}
+_server_registry_lock = threading.RLock()  # Reentrante: load_servers() cria o arquivo via save_servers()
+def get_servers_file_signature():
+    """Identidade do arquivo de servidores (None se não existir)"""
+    try:
+        st = os.stat(SERVERS_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+def find_server_conflicts(servers):
+    """Detectar ids repetidos e portas em conflito entre servidores
+
+    O ARK usa game_port e game_port+1 (UDP) além da query_port (UDP); a rcon_port é TCP.
+    """
+    errors = []
+    seen_ids = set()
+    udp_ports = {}
+    tcp_ports = {}
+    for server in servers:
+        if server['id'] in seen_ids:
+            errors.append({'message': f"ID {server['id']} repetido", 'server_ids': [server['id']]})
+        seen_ids.add(server['id'])
+        for ports, port, label in ((udp_ports, server['game_port'], 'game_port'),
+                                   (udp_ports, server['game_port'] + 1, 'game_port+1'),
+                                   (udp_ports, server['query_port'], 'query_port'),
+                                   (tcp_ports, server['rcon_port'], 'rcon_port')):
+            owner = ports.get(port)
+            if owner is not None and owner[0] != server['id']:
+                errors.append({'message': f"Porta {port} em conflito: servidor {owner[0]} ({owner[1]}) e servidor {server['id']} ({label})",
+                               'server_ids': [owner[0], server['id']]})
+            ports.setdefault(port, (server['id'], label))
+    return errors
+def validate_servers_data(servers_data):
+    """Conferir o formato mínimo da configuração (levanta ValueError descrevendo o problema)"""
+    if not isinstance(servers_data, dict) or not isinstance(servers_data.get('servers'), list):
+        raise ValueError("esperado um objeto com a lista 'servers'")
+    for position, server in enumerate(servers_data['servers']):
+        if not isinstance(server, dict):
+            raise ValueError(f"servidor na posição {position} não é um objeto")
+        missing = [key for key in SERVER_REQUIRED_KEYS if key not in server]
+        if missing:
+            raise ValueError(f"servidor na posição {position} sem {', '.join(missing)}")
+        for key in ('id',) + SERVER_PORT_KEYS:
+            if not isinstance(server[key], int) or isinstance(server[key], bool):
+                raise ValueError(f"servidor na posição {position}: {key} deve ser um número inteiro")
+def index_servers(servers_data, signature):
+    """Publicar uma configuração no registro com os índices por id e portas (chamar com o lock)
+
+    Os índices são montados antes da troca: uma configuração inválida levanta ValueError e o
+    registro continua com a anterior.
+    """
+    validate_servers_data(servers_data)
+    servers = servers_data['servers']
+    by_id = {s['id']: s for s in servers}
+    by_port = {key: {s[key]: s for s in servers} for key in SERVER_PORT_KEYS}
+    errors = find_server_conflicts(servers)
+    _server_registry.update(data=servers_data, by_id=by_id, by_port=by_port, signature=signature, errors=errors)
+    for error in errors:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Configuração de servidores: {error['message']}")
 def load_servers():
-    """Carregar servidores do arquivo"""
-    if os.path.exists(SERVERS_FILE):
+    """Carregar servidores (da memória; o arquivo só é relido quando muda)
+
+    O resultado é compartilhado entre requisições: não modificar, usar save_servers() para alterar.
+    """
+    now = time.time()
+    with _server_registry_lock:
+        if _server_registry['data'] is not None and now - _server_registry['checked_at'] < SERVER_REGISTRY_CHECK_INTERVAL:
+            return _server_registry['data']
+        _server_registry['checked_at'] = now
+        signature = get_servers_file_signature()
+        if _server_registry['data'] is not None and signature == _server_registry['signature']:
+            return _server_registry['data']
+        if signature is None:
+            save_servers(ALL_ARK_MAPS)
+            return _server_registry['data']
         try:
-            with open(SERVERS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return ALL_ARK_MAPS
-    else:
-        save_servers(ALL_ARK_MAPS)
-        return ALL_ARK_MAPS
+            with timed_stage('load_servers_json'), open(SERVERS_FILE, 'r') as f:
+                servers_data = json.load(f)
+            index_servers(servers_data, signature)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Arquivo inválido: manter a última configuração válida em vez de voltar silenciosamente ao padrão
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao ler {SERVERS_FILE}: {e}")
+            if _server_registry['data'] is None:
+                index_servers(ALL_ARK_MAPS, None)
+            _server_registry['signature'] = signature
+        return _server_registry['data']
 def save_servers(servers_data):
-    """Salvar servidores no arquivo"""
-    with open(SERVERS_FILE, 'w') as f:
+    """Salvar servidores de forma atômica (temporário + fsync + rename) e atualizar o registro"""
+    validate_servers_data(servers_data)
+    tmp_file = SERVERS_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
         json.dump(servers_data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, SERVERS_FILE)
+    dir_fd = os.open(CONFIG_DIR, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    with _server_registry_lock:
+        index_servers(servers_data, get_servers_file_signature())
+        _server_registry['checked_at'] = time.time()
+def get_server(server_id):
+    """Servidor pelo id (O(1)) ou None"""
+    load_servers()
+    return _server_registry['by_id'].get(server_id)
+def get_servers_by_ids(server_ids):
+    """Servidores existentes entre os ids informados, na ordem da configuração"""
+    load_servers()
+    wanted = set(server_ids)
+    return [s for s in _server_registry['data']['servers'] if s['id'] in wanted]
+def get_server_by_port(port, kind='game_port'):
+    """Servidor pela porta (game_port, query_port ou rcon_port) ou None"""
+    load_servers()
+    return _server_registry['by_port'][kind].get(port)
+def get_server_config_errors(server_id=None):
+    """Conflitos encontrados na última carga da configuração (opcionalmente só os de um servidor)"""
+    load_servers()
+    return [e for e in _server_registry['errors'] if server_id is None or server_id in e['server_ids']]
+@timed_stage('check_server_installed')
 def check_server_installed(server):
     """Verificar se o servidor está instalado (versão Linux)"""
     # Verificar arquivo de marcação primeiro
@@ -177,8 +439,107 @@ def check_server_installed(server):
             pass
     
     return False
+# Build IDs: instalada (appmanifest) x mais recente do branch (app_info_print, em cache)
+VDF_TOKEN_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"|(\{)|(\})')
+_appmanifest_cache = {}
+_latest_builds = {'builds': {}, 'fetched_at': 0}
+_latest_builds_lock = threading.Lock()
+def parse_vdf(text):
+    """Converter texto VDF/ACF da Valve ("chave" "valor" / "chave" { ... }) em dicionário
+
+    Chaves KeyValues não diferenciam maiúsculas ("BetaKey" e "betakey" aparecem em manifestos):
+    ficam em minúsculas, e as consultas usam os nomes em minúsculas.
+    """
+    root = {}
+    stack = [root]
+    key = None
+    for m in VDF_TOKEN_PATTERN.finditer(text):
+        if m.group(2):
+            child = {}
+            stack[-1][key] = child
+            stack.append(child)
+            key = None
+        elif m.group(3):
+            if len(stack) > 1:
+                stack.pop()
+            key = None
+        elif key is None:
+            key = m.group(1).lower()
+        else:
+            stack[-1][key] = m.group(1)
+            key = None
+    return root
+def get_installed_build(server_path, app_id=376030):
+    """Build ID e branch instalados, lidos do appmanifest (em cache pelo mtime); None se não houver"""
+    manifest = os.path.join(server_path, 'steamapps', f'appmanifest_{app_id}.acf')
+    try:
+        mtime = os.stat(manifest).st_mtime
+    except OSError:
+        return None
+    cached = _appmanifest_cache.get(manifest)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(manifest, 'r', errors='replace') as f:
+            state = parse_vdf(f.read()).get('appstate', {})
+    except OSError:
+        return None
+    config = state.get('mountedconfig') or state.get('userconfig') or {}
+    build = {'buildid': state.get('buildid'), 'branch': config.get('betakey') or 'public'}
+    _appmanifest_cache[manifest] = (mtime, build)
+    return build
+def fetch_latest_builds(app_id=376030):
+    """Consultar no SteamCMD as builds atuais de todos os branches ({branch: buildid})"""
+    steamcmd_path = '/home/arkserver/steamcmd/steamcmd.sh'
+    if not os.path.exists(steamcmd_path):
+        return {}
+    cmd = [
+        '/usr/bin/sudo', '-u', 'arkserver', steamcmd_path, '+@ShutdownOnFailedCommand', '1', '+@NoPromptForPassword', '1',
+        '+login', 'anonymous', '+app_info_update', '1', '+app_info_print', str(app_id), '+quit'
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd='/tmp', timeout=120)
+    m = re.search(rf'^"{app_id}"\s*$', result.stdout, re.M)
+    if not m:
+        return {}
+    info = parse_vdf(result.stdout[m.start():]).get(str(app_id), {})
+    branches = info.get('depots', {}).get('branches', {})
+    return {name: b['buildid'] for name, b in branches.items() if isinstance(b, dict) and 'buildid' in b}
+def get_latest_build(branch, app_id=376030):
+    """Build mais recente do branch; uma consulta ao SteamCMD serve todos os servidores até o TTL expirar"""
+    with _latest_builds_lock:
+        if time.time() - _latest_builds['fetched_at'] > float(PANEL_SETTINGS['build_check_ttl']):
+            try:
+                builds = fetch_latest_builds(app_id)
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao consultar builds do SteamCMD: {e}")
+                builds = {}
+            # Falhas também contam como consulta: não repetir o SteamCMD para cada servidor até o TTL
+            _latest_builds['fetched_at'] = time.time()
+            if builds:
+                _latest_builds['builds'] = builds
+        return _latest_builds['builds'].get((branch or 'public').lower())
+def check_build_current(server_path, branch, app_id=376030):
+    """Comparar a build instalada com a mais recente do branch
+
+    Retorna {'installed', 'installed_branch', 'latest', 'up_to_date'}; up_to_date é None quando
+    não foi possível determinar (sem appmanifest ou sem acesso ao SteamCMD).
+    """
+    installed = get_installed_build(server_path, app_id)
+    latest = get_latest_build(branch, app_id)
+    status = {
+        'installed': installed['buildid'] if installed else None,
+        'installed_branch': installed['branch'] if installed else None,
+        'latest': latest,
+        'up_to_date': None
+    }
+    if installed and latest:
+        status['up_to_date'] = installed['buildid'] == latest and installed['branch'] == (branch or 'public')
+    return status
 def get_server_version(server):
-    """Obter versão do servidor instalado"""
+    """Obter versão do servidor instalado (build ID do appmanifest, ou o texto de .ark_version)"""
+    build = get_installed_build(server['path'])
+    if build and build['buildid']:
+        return f"Build {build['buildid']} ({build['branch']})"
     version_file = os.path.join(server['path'], '.ark_version')
     if os.path.exists(version_file):
         try:
@@ -196,40 +557,258 @@ def get_installation_date(server):
         except:
             return "Desconhecida"
     return "Desconhecida"
-def get_real_player_count(server):
+def get_real_player_count(server, timeout=None):
     """Consultar número real de jogadores"""
+    if timeout is None:
+        timeout = float(PANEL_SETTINGS['a2s_timeout'])
+    started = time.time()
     try:
         address = (server['ip'], server['query_port'])
-        info = a2s.info(address)
+        info = a2s.info(address, timeout=timeout)
+        observe_histogram('ark_panel_a2s_query_seconds', time.time() - started, {'result': 'ok'})
         return {
+            'state': 'ok',
             'player_count': info.player_count,
             'max_players': info.max_players,
             'map_name': info.map_name,
             'server_name': info.server_name
         }
     except Exception as e:
+        state = 'timeout' if isinstance(e, socket.timeout) else 'error'
+        observe_histogram('ark_panel_a2s_query_seconds', time.time() - started, {'result': state})
         return {
+            'state': state,
             'player_count': 0,
             'max_players': 0,
             'map_name': server['map'],
             'server_name': server['name'],
-            'error': str(e)
+            'error': str(e) or e.__class__.__name__
         }
-def check_server_process(server):
-    """Verificar se o processo do servidor está rodando"""
+# Cache A2S por (ip, query_port): TTL curto para sucessos, backoff exponencial para falhas
+_a2s_cache = {}
+_a2s_cache_lock = threading.Lock()
+_a2s_cache_stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'invalidations': 0}
+def get_cached_player_count(server):
+    """Obter resultado A2S do cache (ou None se expirado/ausente)"""
+    key = (server['ip'], server['query_port'])
+    now = time.time()
+    with _a2s_cache_lock:
+        entry = _a2s_cache.get(key)
+        if entry and now < entry['expires_at']:
+            if entry['result']['state'] == 'ok':
+                _a2s_cache_stats['hits'] += 1
+            else:
+                _a2s_cache_stats['negative_hits'] += 1
+            return entry['result']
+        _a2s_cache_stats['misses'] += 1
+        return None
+def store_player_count(server, result):
+    """Guardar resultado A2S no cache, aplicando backoff em falhas consecutivas"""
+    key = (server['ip'], server['query_port'])
+    now = time.time()
+    with _a2s_cache_lock:
+        if result['state'] == 'ok':
+            failures = 0
+            ttl = float(PANEL_SETTINGS['a2s_cache_ttl'])
+        else:
+            previous = _a2s_cache.get(key)
+            failures = (previous['failures'] if previous else 0) + 1
+            ttl = min(float(PANEL_SETTINGS['a2s_backoff_base']) * (2 ** (failures - 1)),
+                      float(PANEL_SETTINGS['a2s_backoff_max']))
+        _a2s_cache[key] = {'result': result, 'expires_at': now + ttl, 'failures': failures}
+def invalidate_player_count(server):
+    """Descartar o cache A2S de um servidor (ex.: ao iniciar/parar)"""
+    with _a2s_cache_lock:
+        if _a2s_cache.pop((server['ip'], server['query_port']), None) is not None:
+            _a2s_cache_stats['invalidations'] += 1
+def get_a2s_cache_stats():
+    """Contadores do cache A2S"""
+    with _a2s_cache_lock:
+        stats = dict(_a2s_cache_stats)
+        stats['entries'] = len(_a2s_cache)
+        stats['backing_off'] = len([e for e in _a2s_cache.values() if e['failures'] and e['expires_at'] > time.time()])
+    lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+    stats['hit_ratio'] = round((stats['hits'] + stats['negative_hits']) / lookups, 3) if lookups else 0.0
+    return stats
+# Consultas A2S em paralelo: o tempo total fica limitado pelo servidor mais lento
+_a2s_executor = ThreadPoolExecutor(max_workers=int(PANEL_SETTINGS['a2s_max_workers']), thread_name_prefix='a2s')
+def query_players_concurrently(servers, timeout=None):
+    """Consultar A2S de vários servidores em paralelo, com prazo rígido por servidor"""
+    if timeout is None:
+        timeout = float(PANEL_SETTINGS['a2s_timeout'])
+    results = {}
+    pending = []
+    for server in servers:
+        cached = get_cached_player_count(server)
+        if cached is not None:
+            results[server['id']] = cached
+        else:
+            pending.append(server)
+    futures = {_a2s_executor.submit(get_real_player_count, server, timeout): server for server in pending}
+    if not futures:
+        return results
+    # Margem curta sobre o timeout do socket para cobrir o agendamento das threads
+    wait(futures, timeout=timeout + 0.5)
+    for future, server in futures.items():
+        if future.done():
+            results[server['id']] = future.result()
+        else:
+            future.cancel()
+            results[server['id']] = {
+                'state': 'timeout',
+                'player_count': 0,
+                'max_players': 0,
+                'map_name': server['map'],
+                'server_name': server['name'],
+                'error': f'Sem resposta em {timeout}s'
+            }
+        store_player_count(server, results[server['id']])
+    return results
+# Prefixo do nome do processo (o kernel trunca o comm em 15 caracteres)
+SERVER_PROCESS_NAME_PREFIX = 'ShooterGameServ'
+def parse_server_cmdline(cmdline):
+    """Extrair (mapa, porta do jogo) da linha de comando de um ShooterGameServer"""
+    map_name = None
+    game_port = None
+    for arg in cmdline[1:]:
+        if arg.startswith('-'):
+            if arg.startswith('-Port='):
+                try:
+                    game_port = int(arg[len('-Port='):])
+                except ValueError:
+                    pass
+            continue
+        if map_name is None and '?' in arg:
+            url_parts = arg.split('?')
+            map_name = url_parts[0]
+            # Porta também pode vir na URL do mapa (?Port=7777)
+            for option in url_parts[1:]:
+                if option.startswith('Port=') and game_port is None:
+                    try:
+                        game_port = int(option[len('Port='):])
+                    except ValueError:
+                        pass
+    return map_name, game_port
+def build_process_index():
+    """Varrer a tabela de processos uma única vez e indexar por (mapa, porta do jogo)"""
+    started = time.time()
+    index = {}
     try:
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+        for proc in psutil.process_iter(['name']):
             try:
-                if proc.info['cmdline']:
-                    cmdline = ' '.join(proc.info['cmdline'])
-                    if f"ShooterGameServer {server['map']}" in cmdline and str(server['game_port']) in cmdline:
-                        return True
+                # Filtrar pelo nome antes de ler a linha de comando
+                name = proc.info['name'] or ''
+                if not name.startswith(SERVER_PROCESS_NAME_PREFIX):
+                    continue
+                cmdline = proc.cmdline()
+                if not cmdline:
+                    continue
+                map_name, game_port = parse_server_cmdline(cmdline)
+                if map_name:
+                    index[(map_name, game_port)] = proc
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 pass
-        return False
     except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao indexar processos: {e}")
+    observe_histogram('ark_panel_process_scan_seconds', time.time() - started)
+    return index
+def find_server_process(server, process_index=None):
+    """Obter o processo do servidor a partir do índice (O(1))"""
+    if process_index is None:
+        process_index = build_process_index()
+    return process_index.get((server['map'], server['game_port']))
+def check_server_process(server, process_index=None):
+    """Verificar se o processo do servidor está rodando"""
+    return find_server_process(server, process_index) is not None
+# Registro de PIDs: handles psutil de longa duração por servidor (cpu_percent real entre coletas)
+_server_processes = {}
+_server_processes_lock = threading.Lock()
+_last_process_scan = 0.0
+def get_pid_file(server_id):
+    """Caminho do pidfile de um servidor"""
+    return os.path.join(RUN_DIR, f'server_{server_id}.pid')
+def register_server_process(server, pid, proc=None):
+    """Registrar o PID do ShooterGameServer de um servidor (memória + pidfile)"""
+    if proc is None:
+        proc = psutil.Process(pid)
+    with _server_processes_lock:
+        _server_processes[server['id']] = proc
+    try:
+        with open(get_pid_file(server['id']), 'w') as f:
+            f.write(f"{pid}\n")
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao gravar pidfile do servidor {server['id']}: {e}")
+    return proc
+def unregister_server_process(server_id):
+    """Remover o servidor do registro de PIDs"""
+    with _server_processes_lock:
+        _server_processes.pop(server_id, None)
+    try:
+        os.remove(get_pid_file(server_id))
+    except FileNotFoundError:
+        pass
+def get_tracked_process(server):
+    """Obter o handle registrado do servidor se o processo ainda estiver vivo"""
+    with _server_processes_lock:
+        proc = _server_processes.get(server['id'])
+    if proc is None:
+        return None
+    try:
+        # is_running() compara o create_time, então PIDs reutilizados não são confundidos
+        if proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE:
+            return proc
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    unregister_server_process(server['id'])
+    return None
+def process_matches_server(proc, server):
+    """Verificar se um processo é o ShooterGameServer deste servidor"""
+    try:
+        if not proc.name().startswith(SERVER_PROCESS_NAME_PREFIX):
+            return False
+        return parse_server_cmdline(proc.cmdline()) == (server['map'], server['game_port'])
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
         return False
-def get_server_metrics(server):
+def adopt_server_processes(servers):
+    """Readotar servidores em execução a partir dos pidfiles (após reiniciar o painel)"""
+    for server in servers:
+        pid_file = get_pid_file(server['id'])
+        if not os.path.exists(pid_file):
+            continue
+        try:
+            with open(pid_file, 'r') as f:
+                pid = int(f.read().strip())
+            proc = psutil.Process(pid)
+            if process_matches_server(proc, server):
+                with _server_processes_lock:
+                    _server_processes[server['id']] = proc
+                continue
+        except (ValueError, OSError, psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        unregister_server_process(server['id'])
+def get_server_processes(servers, force_scan=False):
+    """Montar o índice (mapa, porta) -> processo pelo registro, varrendo a tabela só quando necessário"""
+    global _last_process_scan
+    index = {}
+    untracked = []
+    for server in servers:
+        proc = get_tracked_process(server)
+        if proc is not None:
+            index[(server['map'], server['game_port'])] = proc
+        else:
+            untracked.append(server)
+    # Servidores iniciados fora do painel são descobertos pela varredura periódica
+    rescan_interval = float(PANEL_SETTINGS['process_rescan_interval'])
+    if untracked and (force_scan or time.time() - _last_process_scan >= rescan_interval):
+        _last_process_scan = time.time()
+        scanned = build_process_index()
+        for server in untracked:
+            key = (server['map'], server['game_port'])
+            proc = scanned.get(key)
+            if proc is not None:
+                index[key] = register_server_process(server, proc.pid, proc)
+    return index
+def get_server_metrics(server, process_index=None, player_info=None):
     """Obter métricas reais do servidor"""
     try:
         is_installed = check_server_installed(server)
@@ -249,31 +828,34 @@ def get_server_metrics(server):
         version = get_server_version(server)
         install_date = get_installation_date(server)
         
-        is_running = check_server_process(server)
-        if is_running:
+        build = get_installed_build(server['path'])
+        proc = find_server_process(server, process_index)
+        if proc is not None:
             # Obter métricas do processo
             cpu_percent = 0
             memory_mb = 0
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'cpu_percent', 'memory_info']):
-                try:
-                    if proc.info['cmdline']:
-                        cmdline = ' '.join(proc.info['cmdline'])
-                        if f"ShooterGameServer {server['map']}" in cmdline:
-                            cpu_percent = proc.cpu_percent()
-                            memory_mb = proc.memory_info().rss / 1024 / 1024
-                            break
-                except:
-                    pass
+            started_at = None
+            try:
+                with proc.oneshot():
+                    cpu_percent = proc.cpu_percent()
+                    memory_mb = proc.memory_info().rss / 1024 / 1024
+                    started_at = proc.create_time()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
             # Obter jogadores reais
-            player_info = get_real_player_count(server)
+            if player_info is None:
+                player_info = query_players_concurrently([server])[server['id']]
             return {
                 'status': 'online',
                 'players': player_info['player_count'],
                 'max_players': player_info['max_players'],
+                'query_state': player_info['state'],
                 'cpu_percent': round(cpu_percent, 2),
                 'memory_mb': round(memory_mb, 2),
+                'started_at': started_at,
                 'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'version': version,
+                'build': build,
                 'install_date': install_date
             }
         else:
@@ -285,6 +867,7 @@ def get_server_metrics(server):
                 'memory_mb': 0,
                 'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'version': version,
+                'build': build,
                 'install_date': install_date
             }
     except Exception as e:
@@ -299,6 +882,497 @@ def get_server_metrics(server):
             'version': 'N/A',
             'install_date': 'N/A'
         }
+# Coletor de status em segundo plano: as rotas leem apenas o snapshot
+_status_snapshot = {'servers': [], 'by_id': {}, 'updated_at': None, 'duration': 0.0}
+_status_lock = threading.Lock()
+_status_refresh_event = threading.Event()
+_status_collector_thread = None
+_status_collector_lock = threading.Lock()
+def pending_server_metrics():
+    """Métricas provisórias para servidores ainda não coletados"""
+    return {
+        'status': 'unknown',
+        'players': 0,
+        'max_players': 0,
+        'cpu_percent': 0,
+        'memory_mb': 0,
+        'last_check': 'N/A',
+        'version': 'N/A',
+        'install_date': 'N/A'
+    }
+def refresh_status_snapshot():
+    """Coletar métricas de todos os servidores e publicar um novo snapshot"""
+    started = time.time()
+    servers_data = load_servers()
+    process_index = get_server_processes(servers_data['servers'])
+    running = [s for s in servers_data['servers'] if (s['map'], s['game_port']) in process_index]
+    player_infos = query_players_concurrently(running)
+    server_status = []
+    for server in servers_data['servers']:
+        metrics = get_server_metrics(server, process_index, player_infos.get(server['id']))
+        server_status.append({**server, **metrics})
+    with _status_lock:
+        _status_snapshot['servers'] = server_status
+        _status_snapshot['by_id'] = {s['id']: s for s in server_status}
+        _status_snapshot['updated_at'] = time.time()
+        _status_snapshot['duration'] = time.time() - started
+        updated_at = _status_snapshot['updated_at']
+        duration = _status_snapshot['duration']
+    observe_histogram('ark_panel_status_collection_seconds', time.time() - started)
+    write_shared_snapshot(server_status, updated_at, duration)
+    if PANEL_SETTINGS['metrics_history_enabled']:
+        try:
+            record_metrics_samples(server_status)
+        except sqlite3.Error as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao gravar histórico de métricas: {e}")
+# Histórico de métricas: SQLite (WAL) com amostras brutas e agregados min/avg/max de 1 min, 15 min e 1 h
+METRICS_DB_FILE = os.path.join(DATA_DIR, 'metrics.db')
+METRICS_RESOLUTIONS = (60, 900, 3600)  # Cada nível é agregado a partir do anterior
+METRICS_RETENTION_SETTINGS = {60: 'metrics_1m_retention_days', 900: 'metrics_15m_retention_days', 3600: 'metrics_1h_retention_days'}
+METRICS_FIELDS = ('cpu', 'rss', 'players')
+METRICS_MAX_POINTS = 2000  # Limite de pontos por série devolvida pela API
+METRICS_MAINTENANCE_INTERVAL = 60  # Segundos entre agregações/limpezas
+_metrics_db_lock = threading.Lock()
+_metrics_db = None
+_metrics_last_maintenance = 0.0
+_metrics_readers = threading.local()
+def open_metrics_db():
+    """Abrir o banco de métricas (WAL: leituras da API não bloqueiam a gravação do coletor)"""
+    conn = sqlite3.connect(METRICS_DB_FILE, timeout=10, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS metrics_raw (
+            server_id INTEGER NOT NULL, ts INTEGER NOT NULL, online INTEGER NOT NULL,
+            cpu REAL NOT NULL, rss REAL NOT NULL, players INTEGER NOT NULL,
+            PRIMARY KEY (server_id, ts)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS metrics_rollup (
+            resolution INTEGER NOT NULL, server_id INTEGER NOT NULL, bucket INTEGER NOT NULL,
+            samples INTEGER NOT NULL, online REAL NOT NULL,
+            cpu_min REAL, cpu_avg REAL, cpu_max REAL,
+            rss_min REAL, rss_avg REAL, rss_max REAL,
+            players_min REAL, players_avg REAL, players_max REAL,
+            PRIMARY KEY (resolution, server_id, bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS metrics_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    ''')
+    return conn
+def get_metrics_writer():
+    """Conexão única de gravação (usar com _metrics_db_lock)"""
+    global _metrics_db
+    if _metrics_db is None:
+        _metrics_db = open_metrics_db()
+    return _metrics_db
+def get_metrics_reader():
+    """Conexão de leitura por thread"""
+    conn = getattr(_metrics_readers, 'conn', None)
+    if conn is None:
+        conn = open_metrics_db()
+        _metrics_readers.conn = conn
+    return conn
+def record_metrics_samples(server_status, ts=None):
+    """Gravar uma amostra por servidor instalado (uma transação por coleta)"""
+    ts = int(time.time() if ts is None else ts)
+    rows = [(s['id'], ts, 1 if s['status'] == 'online' else 0, float(s.get('cpu_percent') or 0),
+             float(s.get('memory_mb') or 0), int(s.get('players') or 0))
+            for s in server_status if s['status'] not in ('not_installed', 'unknown')]
+    with _metrics_db_lock:
+        conn = get_metrics_writer()
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO metrics_raw VALUES (?, ?, ?, ?, ?, ?)', rows)
+    if ts - _metrics_last_maintenance >= METRICS_MAINTENANCE_INTERVAL:
+        maintain_metrics_history(ts)
+def rollup_metrics(conn, resolution, source, until):
+    """Agregar os buckets completos desde a última marca (reprocessar um bucket é idempotente)"""
+    key = f'rollup_{resolution}'
+    row = conn.execute('SELECT value FROM metrics_meta WHERE key = ?', (key,)).fetchone()
+    since = row[0] if row else 0
+    until = until - until % resolution  # Apenas buckets já encerrados
+    if until <= since:
+        return
+    if source is None:
+        conn.execute('''
+            INSERT OR REPLACE INTO metrics_rollup
+            SELECT ?, server_id, ts - ts % ?, COUNT(*), AVG(online),
+                   MIN(cpu), AVG(cpu), MAX(cpu), MIN(rss), AVG(rss), MAX(rss),
+                   MIN(players), AVG(players), MAX(players)
+            FROM metrics_raw WHERE ts >= ? AND ts < ?
+            GROUP BY server_id, ts - ts % ?
+        ''', (resolution, resolution, since, until, resolution))
+    else:
+        # Médias ponderadas pelo número de amostras de cada bucket menor
+        conn.execute('''
+            INSERT OR REPLACE INTO metrics_rollup
+            SELECT ?, server_id, bucket - bucket % ?, SUM(samples), SUM(online * samples) / SUM(samples),
+                   MIN(cpu_min), SUM(cpu_avg * samples) / SUM(samples), MAX(cpu_max),
+                   MIN(rss_min), SUM(rss_avg * samples) / SUM(samples), MAX(rss_max),
+                   MIN(players_min), SUM(players_avg * samples) / SUM(samples), MAX(players_max)
+            FROM metrics_rollup WHERE resolution = ? AND bucket >= ? AND bucket < ?
+            GROUP BY server_id, bucket - bucket % ?
+        ''', (resolution, resolution, source, since, until, resolution))
+    conn.execute('INSERT OR REPLACE INTO metrics_meta VALUES (?, ?)', (key, until))
+def maintain_metrics_history(now=None):
+    """Atualizar os agregados e apagar o que passou da retenção de cada nível"""
+    global _metrics_last_maintenance
+    now = int(time.time() if now is None else now)
+    _metrics_last_maintenance = now
+    with _metrics_db_lock:
+        conn = get_metrics_writer()
+        with conn:
+            source = None
+            for resolution in METRICS_RESOLUTIONS:
+                rollup_metrics(conn, resolution, source, now)
+                source = resolution
+            conn.execute('DELETE FROM metrics_raw WHERE ts < ?',
+                         (now - float(PANEL_SETTINGS['metrics_raw_retention_hours']) * 3600,))
+            for resolution, setting in METRICS_RETENTION_SETTINGS.items():
+                conn.execute('DELETE FROM metrics_rollup WHERE resolution = ? AND bucket < ?',
+                             (resolution, now - float(PANEL_SETTINGS[setting]) * 86400))
+def choose_metrics_resolution(start, step, now=None):
+    """Escolher a fonte mais grossa que ainda atende o passo pedido e cobre o início do intervalo"""
+    now = time.time() if now is None else now
+    retention = {0: float(PANEL_SETTINGS['metrics_raw_retention_hours']) * 3600}  # 0 = amostras brutas
+    for resolution in METRICS_RESOLUTIONS:
+        retention[resolution] = float(PANEL_SETTINGS[METRICS_RETENTION_SETTINGS[resolution]]) * 86400
+    covering = [r for r in sorted(retention) if now - start <= retention[r]] or [METRICS_RESOLUTIONS[-1]]
+    fine = [r for r in covering if r <= step]
+    return max(fine) if fine else min(covering)
+def merge_metrics_rows(a, b):
+    """Juntar duas linhas do mesmo passo (t, amostras, online, min/avg/max por campo), ponderando pelas amostras"""
+    samples = a[1] + b[1]
+    merged = [a[0], samples, (a[2] * a[1] + b[2] * b[1]) / samples]
+    for i in range(len(METRICS_FIELDS)):
+        low, avg, high = 3 + i * 3, 4 + i * 3, 5 + i * 3
+        merged += [min(a[low], b[low]), (a[avg] * a[1] + b[avg] * b[1]) / samples, max(a[high], b[high])]
+    return merged
+def query_metrics_history(server_id, start, end, step=None):
+    """Série agregada (min/avg/max por passo) entre start e end, em timestamps Unix
+
+    Os agregados só cobrem buckets já encerrados; o trecho ainda não agregado (até um bucket da
+    resolução escolhida) vem das amostras brutas, então o fim da série chega até a última coleta.
+    """
+    span = max(1, end - start)
+    step = max(1, int(step or span / 300))
+    step = max(step, int(span / METRICS_MAX_POINTS))  # Limitar o tamanho da resposta
+    resolution = choose_metrics_resolution(start, step)
+    if resolution:
+        step = -(-step // resolution) * resolution  # Múltiplo da resolução: buckets da fonte não são divididos
+    conn = get_metrics_reader()
+    conn.execute('BEGIN')  # Mesmo snapshot (WAL) para a marca de agregação, os agregados e as amostras brutas
+    try:
+        raw_from = start
+        rows = []
+        if resolution:
+            row = conn.execute('SELECT value FROM metrics_meta WHERE key = ?', (f'rollup_{resolution}',)).fetchone()
+            raw_from = max(start, row[0] if row else 0)
+            rows = conn.execute('''
+                SELECT bucket - bucket % ? AS t, SUM(samples), SUM(online * samples) / SUM(samples),
+                       MIN(cpu_min), SUM(cpu_avg * samples) / SUM(samples), MAX(cpu_max),
+                       MIN(rss_min), SUM(rss_avg * samples) / SUM(samples), MAX(rss_max),
+                       MIN(players_min), SUM(players_avg * samples) / SUM(samples), MAX(players_max)
+                FROM metrics_rollup WHERE resolution = ? AND server_id = ? AND bucket >= ? AND bucket < ?
+                GROUP BY t ORDER BY t
+            ''', (step, resolution, server_id, start, min(end, raw_from))).fetchall()
+        tail = conn.execute('''
+            SELECT ts - ts % ? AS t, COUNT(*), AVG(online),
+                   MIN(cpu), AVG(cpu), MAX(cpu), MIN(rss), AVG(rss), MAX(rss),
+                   MIN(players), AVG(players), MAX(players)
+            FROM metrics_raw WHERE server_id = ? AND ts >= ? AND ts < ?
+            GROUP BY t ORDER BY t
+        ''', (step, server_id, raw_from, end)).fetchall() if raw_from < end else []
+    finally:
+        conn.rollback()
+    if rows and tail and rows[-1][0] == tail[0][0]:
+        # Passo dividido entre o último agregado e o início da cauda bruta
+        rows[-1] = merge_metrics_rows(rows[-1], tail.pop(0))
+    rows += tail
+    points = []
+    for row in rows:
+        point = {'t': row[0], 'samples': row[1], 'online': round(row[2], 3)}
+        for i, field in enumerate(METRICS_FIELDS):
+            point[f'{field}_min'], point[f'{field}_avg'], point[f'{field}_max'] = (
+                round(v, 2) for v in row[3 + i * 3:6 + i * 3])
+        points.append(point)
+    return {'from': start, 'to': end, 'step': step, 'resolution': resolution or 'raw', 'points': points}
+def parse_history_time(value, default):
+    """Timestamp Unix ou data ISO (AAAA-MM-DD[THH:MM[:SS]]) da query string"""
+    if not value:
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp())
+def status_collector_loop():
+    """Loop do coletor: atualiza o snapshot a cada intervalo ou quando solicitado"""
+    interval = max(1, float(PANEL_SETTINGS['status_refresh_interval']))
+    while True:
+        _status_refresh_event.wait(interval)
+        _status_refresh_event.clear()
+        try:
+            refresh_status_snapshot()
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro no coletor de status: {e}")
+def start_status_collector():
+    """Iniciar os serviços de fundo (uma única vez por processo)
+
+    Com vários processos (gunicorn), apenas o líder — quem detém o flock de PANEL_LEADER_LOCK_FILE — coleta
+    status, roda tarefas e mantém os logs; os demais leem o snapshot publicado em STATUS_SNAPSHOT_FILE e
+    falam com o líder pelo socket de controle. Se o líder morrer, o flock é liberado e outro processo assume.
+    """
+    with _status_collector_lock:
+        if _panel_role['started']:
+            return
+        _panel_role['started'] = True
+    if acquire_panel_leadership(blocking=False):
+        start_leader_services()
+    else:
+        load_shared_snapshot()
+        threading.Thread(target=panel_standby_loop, name='panel-standby', daemon=True).start()
+def start_leader_services():
+    """Coletor (com uma primeira coleta síncrona), manutenção de logs, tarefas e socket de controle"""
+    global _status_collector_thread
+    start_log_maintenance()
+    start_job_workers()
+    try:
+        adopt_server_processes(load_servers()['servers'])
+        refresh_status_snapshot()
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro na coleta inicial de status: {e}")
+    _status_collector_thread = threading.Thread(target=status_collector_loop, name='status-collector', daemon=True)
+    _status_collector_thread.start()
+    start_control_server()
+def panel_standby_loop():
+    """Processo seguidor: esperar o flock do líder e assumir a coleta quando ele for liberado"""
+    if acquire_panel_leadership(blocking=True):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Processo {os.getpid()} assumiu a coleta de status")
+        start_leader_services()
+def request_status_refresh():
+    """Antecipar a próxima coleta (ex.: após iniciar/parar um servidor)"""
+    if _panel_role['leader']:
+        _status_refresh_event.set()
+        return
+    try:
+        call_panel_leader('refresh')
+    except PanelLeaderUnavailable:
+        pass  # O líder coleta de qualquer forma no próximo intervalo
+def get_status_snapshot():
+    """Obter (lista de servidores com métricas, índice por id, idade do snapshot em segundos)"""
+    if not _panel_role['started']:
+        start_status_collector()
+    if not _panel_role['leader']:
+        load_shared_snapshot()
+    with _status_lock:
+        servers = list(_status_snapshot['servers'])
+        by_id = dict(_status_snapshot['by_id'])
+        updated_at = _status_snapshot['updated_at']
+    age = round(time.time() - updated_at, 1) if updated_at else None
+    return servers, by_id, age
+# Vários processos: eleição do líder por flock, snapshot compartilhado em arquivo e socket de controle local
+PANEL_LEADER_LOCK_FILE = os.path.join(RUN_DIR, 'panel_leader.lock')
+STATUS_SNAPSHOT_FILE = os.path.join(RUN_DIR, 'status_snapshot.json')
+PANEL_CONTROL_SOCKET = os.path.join(RUN_DIR, 'panel.sock')
+PANEL_CONTROL_TIMEOUT = 10  # Segundos de espera por uma resposta do líder
+SHARED_FILE_MODE = 0o644  # mkstemp cria com 0600: workers rodando com outro usuário não leriam os arquivos
+_panel_role = {'started': False, 'leader': False, 'lock_file': None, 'snapshot_signature': None, 'jobs_signature': None}
+_panel_role_lock = threading.Lock()
+class PanelLeaderUnavailable(Exception):
+    """O processo líder não respondeu pelo socket de controle"""
+def acquire_panel_leadership(blocking=False):
+    """Tentar (ou esperar) o flock do líder; o arquivo fica aberto enquanto o processo viver"""
+    with _panel_role_lock:
+        if _panel_role['leader']:
+            return True
+        if _panel_role['lock_file'] is None:
+            try:
+                _panel_role['lock_file'] = open(PANEL_LEADER_LOCK_FILE, 'a')
+            except OSError as e:
+                # Sem como coordenar: comportar-se como processo único
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao abrir {PANEL_LEADER_LOCK_FILE}: {e}")
+                _panel_role['leader'] = True
+                return True
+        lock_file = _panel_role['lock_file']
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except OSError as e:
+        if e.errno in (errno.EWOULDBLOCK, errno.EAGAIN, errno.EACCES):
+            return False
+        raise
+    with _panel_role_lock:
+        _panel_role['leader'] = True
+    return True
+def write_shared_snapshot(server_status, updated_at, duration):
+    """Publicar o snapshot para os outros processos (substituição atômica: leitores nunca veem meio arquivo)"""
+    if not _panel_role['leader']:
+        return
+    try:
+        fd, tmp_file = tempfile.mkstemp(dir=RUN_DIR, prefix='.status_snapshot.')
+        os.fchmod(fd, SHARED_FILE_MODE)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'servers': server_status, 'updated_at': updated_at, 'duration': duration, 'pid': os.getpid()}, f)
+        os.replace(tmp_file, STATUS_SNAPSHOT_FILE)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao publicar snapshot de status: {e}")
+def load_shared_snapshot():
+    """Processo seguidor: recarregar o snapshot publicado pelo líder se ele mudou (um stat por requisição)"""
+    try:
+        st = os.stat(STATUS_SNAPSHOT_FILE)
+    except FileNotFoundError:
+        return
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if signature == _panel_role['snapshot_signature']:
+        return
+    try:
+        with open(STATUS_SNAPSHOT_FILE, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    with _status_lock:
+        _status_snapshot['servers'] = data['servers']
+        _status_snapshot['by_id'] = {s['id']: s for s in data['servers']}
+        _status_snapshot['updated_at'] = data['updated_at']
+        _status_snapshot['duration'] = data['duration']
+    _panel_role['snapshot_signature'] = signature
+def call_panel_leader(op, timeout=PANEL_CONTROL_TIMEOUT, **args):
+    """Enviar uma operação ao líder (uma linha JSON de ida e uma de volta)"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(PANEL_CONTROL_SOCKET)
+            sock.sendall(json.dumps({'op': op, 'args': args}).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                reply = json.loads(f.readline() or b'null')
+    except (OSError, ValueError) as e:
+        raise PanelLeaderUnavailable(f'Processo líder indisponível: {e}')
+    if not reply or not reply.get('ok'):
+        raise PanelLeaderUnavailable((reply or {}).get('error', 'Resposta inválida do processo líder'))
+    return reply.get('result')
+def handle_control_request(op, args):
+    """Operações que os seguidores delegam ao líder"""
+    if op == 'refresh':
+        # Servidor iniciado por fora do líder (ex.: start_server.sh manual): readotar pidfiles e esquecer o A2S em cache
+        servers = load_servers()['servers']
+        adopt_server_processes([s for s in servers if get_tracked_process(s) is None])
+        with _a2s_cache_lock:
+            _a2s_cache.clear()
+        _status_refresh_event.set()
+        return None
+    if op == 'submit_job':
+        job, created = submit_job(args['job_type'], args.get('server_id'), args.get('params'))
+        return {'job': job, 'created': created}
+    if op == 'steamcmd_progress':
+        return get_steamcmd_progress(args.get('server_id'))
+    if op in ('start_server', 'stop_server'):
+        # Só o líder guarda os handles dos processos dos servidores
+        server = get_server(args['server_id'])
+        if server is None:
+            raise ValueError('Servidor não encontrado')
+        if op == 'start_server':
+            return launch_server(server)
+        terminate_server(server, args.get('timeout_seconds', 30))
+        return None
+    if op == 'metrics':
+        return render_prometheus_metrics()
+    raise ValueError(f'Operação desconhecida: {op}')
+def serve_control_connection(conn):
+    with conn:
+        try:
+            conn.settimeout(PANEL_CONTROL_TIMEOUT)
+            with conn.makefile('rb') as f:
+                request_data = json.loads(f.readline())
+            result = handle_control_request(request_data['op'], request_data.get('args') or {})
+            reply = {'ok': True, 'result': result}
+        except Exception as e:
+            reply = {'ok': False, 'error': str(e)}
+        try:
+            conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+def control_server_loop(server_sock):
+    while True:
+        conn, _ = server_sock.accept()
+        threading.Thread(target=serve_control_connection, args=(conn,), name='panel-control-conn', daemon=True).start()
+def start_control_server():
+    """Abrir o socket de controle do líder (apenas o dono do flock chega aqui, então o socket antigo é lixo)"""
+    try:
+        if os.path.exists(PANEL_CONTROL_SOCKET):
+            os.unlink(PANEL_CONTROL_SOCKET)
+        server_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_sock.bind(PANEL_CONTROL_SOCKET)
+        os.chmod(PANEL_CONTROL_SOCKET, 0o600)
+        server_sock.listen(64)
+    except OSError as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao abrir o socket de controle: {e}")
+        return
+    threading.Thread(target=control_server_loop, args=(server_sock,), name='panel-control', daemon=True).start()
+# Histogramas com vários processos: cada worker publica os seus em run/metrics/<pid>.json e o líder soma
+PANEL_METRICS_DIR = os.path.join(RUN_DIR, 'metrics')
+PANEL_METRICS_PUBLISH_INTERVAL = 5  # Segundos entre publicações (atraso máximo das requisições dos seguidores em /metrics)
+_published_histograms = {}  # Séries somadas dos outros workers (substituídas inteiras a cada releitura)
+def publish_process_histograms():
+    """Gravar os histogramas deste processo de forma atômica"""
+    data = {name: [[[list(pair) for pair in key], s['counts'], s['sum'], s['count']] for key, s in series.items()]
+            for name, series in copy_histogram_series().items()}
+    fd, tmp_file = tempfile.mkstemp(dir=PANEL_METRICS_DIR, prefix='.metrics.')
+    os.fchmod(fd, SHARED_FILE_MODE)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_file, os.path.join(PANEL_METRICS_DIR, f'{os.getpid()}.json'))
+def add_histogram_series(series_by_key, key, counts, total, count):
+    """Somar uma série (contagens por bucket, soma e total) às de mesma chave"""
+    series = series_by_key.setdefault(key, {'counts': [0] * len(counts), 'sum': 0.0, 'count': 0})
+    series['counts'] = [a + b for a, b in zip(series['counts'], counts)]
+    series['sum'] += total
+    series['count'] += count
+def load_published_histograms():
+    """Somar as séries publicadas pelos outros processos (lê run/metrics; chamado no intervalo do publicador)
+
+    Arquivos de workers que já terminaram continuam na soma: contadores do Prometheus não podem diminuir.
+    """
+    merged = {name: {} for name in HISTOGRAMS}
+    own_file = f'{os.getpid()}.json'
+    try:
+        names = os.listdir(PANEL_METRICS_DIR)
+    except FileNotFoundError:
+        return merged
+    for name in names:
+        if not name.endswith('.json') or name == own_file:
+            continue
+        try:
+            with open(os.path.join(PANEL_METRICS_DIR, name), 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric, rows in data.items():
+            if metric not in merged:
+                continue
+            for key, counts, total, count in rows:
+                add_histogram_series(merged[metric], tuple(tuple(pair) for pair in key), counts, total, count)
+    return merged
+def refresh_published_histograms():
+    """Líder: reler as séries publicadas pelos outros workers para o próximo /metrics"""
+    global _published_histograms
+    _published_histograms = load_published_histograms()
+def merge_published_histograms():
+    """Séries deste processo somadas às dos demais já carregadas em memória (sem E/S por requisição)"""
+    merged = copy_histogram_series()
+    for metric, series_by_key in _published_histograms.items():
+        for key, series in series_by_key.items():
+            add_histogram_series(merged[metric], key, series['counts'], series['sum'], series['count'])
+    return merged
+def metrics_publisher_loop():
+    while True:
+        time.sleep(PANEL_METRICS_PUBLISH_INTERVAL)
+        try:
+            publish_process_histograms()
+            if _panel_role['leader']:
+                refresh_published_histograms()
+        except OSError as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao publicar histogramas: {e}")
+def start_metrics_publisher():
+    """Worker do gunicorn: publicar os histogramas periodicamente"""
+    os.makedirs(PANEL_METRICS_DIR, exist_ok=True)
+    threading.Thread(target=metrics_publisher_loop, name='metrics-publisher', daemon=True).start()
 def create_start_script(server, config_settings=None):
     """Criar script de inicialização para o servidor com caminhos corretos"""
     script_path = os.path.join(server['path'], 'start_server.sh')
@@ -338,7 +1412,9 @@ echo "Porta do jogo: {server['game_port']}"
 echo "Porta de consulta: {server['query_port']}"
 echo "Porta RCON: {server['rcon_port']}"
 
-"{executable_path}" "{server['map']}?listen?SessionName={session_name}?ServerPassword={server_password}?ServerAdminPassword={admin_password}?MaxPlayers={max_players}" \\
+# Registrar o PID: com exec o ShooterGameServer herda o PID deste script
+echo $$ > "{get_pid_file(server['id'])}"
+exec "{executable_path}" "{server['map']}?listen?SessionName={session_name}?ServerPassword={server_password}?ServerAdminPassword={admin_password}?MaxPlayers={max_players}" \\
   -server \\
   -log \\
   -Port={server['game_port']} \\
@@ -349,6 +1425,158 @@ echo "Porta RCON: {server['rcon_port']}"
         f.write(start_script)
     # Usar caminho absoluto para chmod
     subprocess.run(['/bin/chmod', '+x', script_path])
+def launch_server(server):
+    """Iniciar o servidor e registrar o PID do ShooterGameServer"""
+    if _panel_role['started'] and not _panel_role['leader']:
+        return call_panel_leader('start_server', server_id=server['id'])
+    # Criar diretórios necessários
+    os.makedirs(server['path'], exist_ok=True)
+    os.makedirs(os.path.join(server['path'], 'ShooterGame/Saved/Config/LinuxServer'), exist_ok=True)
+    # Criar script de inicialização
+    create_start_script(server)
+    # Iniciar servidor (nohup e o script fazem exec, então o PID é o do ShooterGameServer)
+    script_path = os.path.join(server['path'], 'start_server.sh')
+    # Preservar o log da execução anterior (ex.: histórico de crash) em vez de truncá-lo
+    server_log = f"{LOGS_DIR}/server_{server['id']}.log"
+    rotate_log_file(server_log, copytruncate=False)
+    # O_APPEND permite rotação por copytruncate com o servidor rodando
+    with open(server_log, 'a') as log_f:
+        process = subprocess.Popen(['/usr/bin/nohup', '/bin/bash', script_path],
+                                   stdout=log_f,
+                                   stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+    register_server_process(server, process.pid)
+    invalidate_player_count(server)
+    request_status_refresh()
+    return process.pid
+def terminate_server(server, timeout=30):
+    """Parar o servidor pelo PID registrado (ou por pkill se não estiver registrado)"""
+    if _panel_role['started'] and not _panel_role['leader']:
+        # O handle do processo está no líder; aqui só restaria o pkill por porta
+        call_panel_leader('stop_server', timeout=timeout + PANEL_CONTROL_TIMEOUT, server_id=server['id'], timeout_seconds=timeout)
+        return
+    proc = get_tracked_process(server)
+    if proc is not None:
+        try:
+            proc.terminate()
+            proc.wait(timeout=timeout)
+        except psutil.TimeoutExpired:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+    else:
+        subprocess.run(['/usr/bin/pkill', '-f', f"ShooterGameServer.*Port={server['game_port']}"])
+    unregister_server_process(server['id'])
+    invalidate_player_count(server)
+    request_status_refresh()
+# Escritor de logs: uma thread mantém os arquivos abertos e grava em lotes com latência limitada
+LOG_WRITER_FLUSH_INTERVAL = 0.2  # Latência máxima (segundos) entre a linha enfileirada e a escrita
+LOG_WRITER_BATCH_BYTES = 256 * 1024  # Gravar antes do intervalo se o lote atingir este tamanho
+LOG_WRITER_IDLE_CLOSE = 60  # Fechar arquivos sem escrita há mais que isso
+LOG_WRITER_QUEUE_MAX = 100000  # Fila cheia bloqueia o produtor (backpressure) em vez de crescer sem limite
+_log_write_queue = queue.Queue(maxsize=LOG_WRITER_QUEUE_MAX)
+_log_writer_thread = None
+_log_writer_lock = threading.Lock()
+_log_writer_stats = {'lines': 0, 'bytes': 0, 'batches': 0, 'started_at': None}
+def write_log(log_file, text):
+    """Enfileirar texto para ser anexado a um arquivo de log"""
+    start_log_writer()
+    _log_write_queue.put((log_file, text))
+def flush_log_writes(timeout=5):
+    """Esperar até que tudo o que foi enfileirado esteja gravado em disco"""
+    if _log_writer_thread is None:
+        return True
+    done = threading.Event()
+    _log_write_queue.put((None, done))
+    return done.wait(timeout)
+def open_log_handle(handles, log_file):
+    """Obter o arquivo aberto (O_APPEND), reabrindo se ele foi removido ou substituído"""
+    entry = handles.get(log_file)
+    if entry is not None:
+        try:
+            if os.stat(log_file).st_ino == os.fstat(entry['file'].fileno()).st_ino:
+                return entry
+        except OSError:
+            pass
+        entry['file'].close()
+    entry = {'file': open(log_file, 'a'), 'last_write': time.time()}
+    handles[log_file] = entry
+    return entry
+def write_log_batch(handles, pending):
+    """Gravar os textos acumulados por arquivo (uma chamada write por arquivo)"""
+    written = 0
+    for log_file, chunks in pending.items():
+        data = ''.join(chunks)
+        try:
+            entry = open_log_handle(handles, log_file)
+            entry['file'].write(data)
+            entry['file'].flush()
+            entry['last_write'] = time.time()
+            written += len(data)
+        except OSError as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao gravar {log_file}: {e}")
+    with _log_writer_lock:
+        _log_writer_stats['bytes'] += written
+        _log_writer_stats['batches'] += 1
+    pending.clear()
+def log_writer_loop():
+    """Loop do escritor: agrupa as linhas da fila e grava no máximo a cada intervalo"""
+    handles = {}
+    pending = {}
+    pending_bytes = 0
+    pending_lines = 0
+    deadline = None
+    while True:
+        timeout = None if deadline is None else max(0, deadline - time.time())
+        try:
+            log_file, text = _log_write_queue.get(timeout=timeout)
+        except queue.Empty:
+            log_file, text = None, None
+        if log_file is not None:
+            pending.setdefault(log_file, []).append(text)
+            pending_bytes += len(text)
+            pending_lines += 1
+            if deadline is None:
+                deadline = time.time() + LOG_WRITER_FLUSH_INTERVAL
+            if pending_bytes < LOG_WRITER_BATCH_BYTES and time.time() < deadline:
+                continue
+        if pending:
+            write_log_batch(handles, pending)
+            with _log_writer_lock:
+                _log_writer_stats['lines'] += pending_lines
+        pending_bytes = 0
+        pending_lines = 0
+        deadline = None
+        if text is not None and log_file is None:
+            text.set()  # Pedido de flush_log_writes()
+        now = time.time()
+        for path in [p for p, entry in handles.items() if now - entry['last_write'] > LOG_WRITER_IDLE_CLOSE]:
+            handles.pop(path)['file'].close()
+def start_log_writer():
+    """Iniciar a thread do escritor de logs (uma única vez)"""
+    global _log_writer_thread
+    if _log_writer_thread is not None:
+        return
+    with _log_writer_lock:
+        if _log_writer_thread is not None:
+            return
+        _log_writer_stats['started_at'] = time.time()
+        _log_writer_thread = threading.Thread(target=log_writer_loop, name='log-writer', daemon=True)
+        _log_writer_thread.start()
+        atexit.register(flush_log_writes, 2)
+def get_log_writer_stats():
+    """Vazão e profundidade da fila do escritor de logs"""
+    with _log_writer_lock:
+        stats = dict(_log_writer_stats)
+    elapsed = time.time() - stats['started_at'] if stats['started_at'] else 0
+    return {
+        'queue_depth': _log_write_queue.qsize(),
+        'lines_written': stats['lines'],
+        'bytes_written': stats['bytes'],
+        'batches': stats['batches'],
+        'lines_per_batch': round(stats['lines'] / stats['batches'], 1) if stats['batches'] else 0,
+        'bytes_per_second': round(stats['bytes'] / elapsed, 1) if elapsed else 0
+    }
 def log_installation(message, server_id=None):
     """Log de instalação geral ou específica de servidor"""
     if server_id:
@@ -356,10 +1584,193 @@ def log_installation(message, server_id=None):
     else:
         log_file = os.path.join(LOGS_DIR, 'installation.log')
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with open(log_file, 'a') as f:
-        f.write(f"[{timestamp}] {message}\n")
+    write_log(log_file, f"[{timestamp}] {message}\n")
     print(f"[{timestamp}] {message}")
-def install_server_steamcmd(server_path, server_id, app_id=376030, force_update=False, branch="preaquatica"):
+# Progresso do SteamCMD: linhas "Update state (0x61) downloading, progress: 45.12 (8123456789 / 18000000000)"
+STEAMCMD_PROGRESS_PATTERN = re.compile(
+    r'Update state \(0x(?P<code>[0-9a-fA-F]+)\) (?P<phase>[^,]+), progress: (?P<percent>[\d.]+) \((?P<done>\d+) / (?P<total>\d+)\)')
+# Resultado de um app_update: "Success! App '376030' fully installed.", "Error! App '376030' state is 0x602 ..."
+# ou "ERROR! Failed to install app '376030' (Disk write failure)" (caixa varia entre versões)
+STEAMCMD_RESULT_PATTERN = re.compile(
+    r"^(?P<result>Success|Error)! (?:App|Failed to install app) '(?P<app_id>\d+)'(?P<detail>.*)$", re.IGNORECASE)
+STEAMCMD_LOG_PREFIX_PATTERN = re.compile(r'^\[(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\](?: \[[A-Z_]+\d+\])? ?')
+STEAMCMD_RUNS_FILE = os.path.join(LOGS_DIR, 'steamcmd_runs.jsonl')
+STEAMCMD_RATE_SMOOTHING = 0.3  # Peso da amostra mais recente na taxa instantânea (média exponencial)
+_steamcmd_progress = {}
+_steamcmd_progress_lock = threading.Lock()
+def parse_steamcmd_line(line):
+    """Converter uma linha de saída do SteamCMD em evento estruturado (ou None)"""
+    m = STEAMCMD_PROGRESS_PATTERN.search(line)
+    if m:
+        return {
+            'event': 'progress',
+            'state_code': int(m.group('code'), 16),
+            'phase': m.group('phase').strip(),
+            'percent': float(m.group('percent')),
+            'bytes_done': int(m.group('done')),
+            'bytes_total': int(m.group('total'))
+        }
+    m = STEAMCMD_RESULT_PATTERN.match(line.strip())
+    if m:
+        return {'event': 'result', 'success': m.group('result').lower() == 'success', 'detail': m.group('detail').strip()}
+    return None
+def new_steamcmd_progress(server_id, kind, job_id=None, now=None):
+    """Estado de progresso de uma execução do SteamCMD"""
+    now = time.time() if now is None else now
+    return {
+        'server_id': server_id,
+        'kind': kind,
+        'job_id': job_id,
+        'state': 'running',
+        'phase': 'starting',
+        'state_code': None,
+        'percent': 0.0,
+        'bytes_done': 0,
+        'bytes_total': 0,
+        'rate_instant': 0.0,
+        'rate_average': 0.0,
+        'eta_seconds': None,
+        'started_at': now,
+        'updated_at': now,
+        'phase_started_at': now,
+        'phase_started_bytes': 0,
+        'phases': {},
+        'peak_download_rate': 0.0,
+        'download_bytes': 0,
+        'download_seconds': 0.0,
+        'result': None
+    }
+def close_steamcmd_phase(progress, now):
+    """Contabilizar o tempo (e os bytes baixados) da fase atual"""
+    elapsed = max(0.0, now - progress['phase_started_at'])
+    phase = progress['phase']
+    progress['phases'][phase] = round(progress['phases'].get(phase, 0.0) + elapsed, 3)
+    if phase == 'downloading':
+        progress['download_seconds'] += elapsed
+        progress['download_bytes'] += max(0, progress['bytes_done'] - progress['phase_started_bytes'])
+def apply_steamcmd_event(progress, event, now=None):
+    """Atualizar o estado com um evento: fase, bytes, taxa instantânea/média e ETA"""
+    now = time.time() if now is None else now
+    if event['event'] == 'result':
+        progress['result'] = 'success' if event['success'] else 'error'
+        progress['result_detail'] = event['detail']
+        return progress
+    if event['phase'] != progress['phase']:
+        close_steamcmd_phase(progress, now)
+        progress.update(phase=event['phase'], phase_started_at=now, phase_started_bytes=event['bytes_done'],
+                        rate_instant=0.0)
+    else:
+        elapsed = now - progress['updated_at']
+        delta = event['bytes_done'] - progress['bytes_done']
+        if elapsed > 0 and delta >= 0:
+            sample = delta / elapsed
+            progress['rate_instant'] = (sample if progress['rate_instant'] == 0
+                                        else STEAMCMD_RATE_SMOOTHING * sample + (1 - STEAMCMD_RATE_SMOOTHING) * progress['rate_instant'])
+    phase_elapsed = now - progress['phase_started_at']
+    progress.update(state_code=event['state_code'], percent=event['percent'], bytes_done=event['bytes_done'],
+                    bytes_total=event['bytes_total'], updated_at=now)
+    progress['rate_average'] = (event['bytes_done'] - progress['phase_started_bytes']) / phase_elapsed if phase_elapsed > 0 else 0.0
+    if progress['phase'] == 'downloading':
+        progress['peak_download_rate'] = max(progress['peak_download_rate'], progress['rate_instant'])
+    rate = progress['rate_instant'] or progress['rate_average']
+    remaining = event['bytes_total'] - event['bytes_done']
+    progress['eta_seconds'] = round(remaining / rate) if rate > 0 and remaining > 0 else (0 if remaining <= 0 else None)
+    return progress
+def summarize_steamcmd_progress(progress):
+    """Resumo de uma execução para planejamento de capacidade (MB/s de pico e médio, tempo por fase)"""
+    mb = 1024 * 1024
+    return {
+        'server_id': progress['server_id'],
+        'kind': progress['kind'],
+        'job_id': progress['job_id'],
+        'state': progress['state'],
+        'result': progress['result'],
+        'started_at': datetime.fromtimestamp(progress['started_at']).strftime('%Y-%m-%d %H:%M:%S'),
+        'duration_seconds': round(progress['updated_at'] - progress['started_at'], 1),
+        'bytes_total': progress['bytes_total'],
+        'download_bytes': progress['download_bytes'],
+        'download_seconds': round(progress['download_seconds'], 1),
+        'peak_mbps': round(progress['peak_download_rate'] / mb, 2),
+        'average_mbps': round(progress['download_bytes'] / progress['download_seconds'] / mb, 2) if progress['download_seconds'] > 0 else 0.0,
+        'phases': progress['phases']
+    }
+def finish_steamcmd_progress(progress, success, now=None):
+    """Encerrar a execução: fechar a fase atual e calcular o resumo"""
+    now = time.time() if now is None else now
+    close_steamcmd_phase(progress, now)
+    progress.update(state='succeeded' if success else 'failed', updated_at=now, eta_seconds=0 if success else None,
+                    rate_instant=0.0, phase_started_at=now)
+    progress['summary'] = summarize_steamcmd_progress(progress)
+    return progress['summary']
+def summarize_steamcmd_transcript(lines, server_id=None, kind='install'):
+    """Reprocessar uma transcrição gravada (log de instalação ou installation.log) e obter o resumo
+
+    Linhas com prefixo "[AAAA-MM-DD HH:MM:SS]" (installation.log) fornecem os tempos; sem ele
+    apenas fases e bytes são reconstituídos.
+    """
+    progress = None
+    now = 0.0
+    for line in lines:
+        m = STEAMCMD_LOG_PREFIX_PATTERN.match(line)
+        if m:
+            now = datetime.strptime(m.group('ts'), '%Y-%m-%d %H:%M:%S').timestamp()
+            line = line[m.end():]
+        event = parse_steamcmd_line(line)
+        if event is None:
+            continue
+        if progress is None:
+            progress = new_steamcmd_progress(server_id, kind, now=now)
+        apply_steamcmd_event(progress, event, now)
+    if progress is None:
+        return None
+    return finish_steamcmd_progress(progress, progress['result'] != 'error', now)
+def start_steamcmd_progress(server_id, kind, job_id=None):
+    """Registrar uma nova execução do SteamCMD como o progresso atual do servidor"""
+    progress = new_steamcmd_progress(server_id, kind, job_id)
+    with _steamcmd_progress_lock:
+        _steamcmd_progress[server_id] = progress
+    return progress
+def track_steamcmd_line(progress, line):
+    """Processar uma linha da saída em tempo real"""
+    event = parse_steamcmd_line(line)
+    if event is not None:
+        with _steamcmd_progress_lock:
+            apply_steamcmd_event(progress, event)
+def end_steamcmd_progress(progress, success):
+    """Encerrar a execução e gravar o resumo em steamcmd_runs.jsonl"""
+    with _steamcmd_progress_lock:
+        summary = finish_steamcmd_progress(progress, success)
+    write_log(STEAMCMD_RUNS_FILE, json.dumps(summary) + '\n')
+    return summary
+def get_steamcmd_progress(server_id=None):
+    """Último progresso conhecido (de um servidor ou de todos); nos seguidores, consultado ao líder"""
+    if _panel_role['started'] and not _panel_role['leader']:
+        try:
+            progress = call_panel_leader('steamcmd_progress', server_id=server_id)
+        except PanelLeaderUnavailable:
+            return None if server_id is not None else {}
+        return progress if server_id is not None else {int(sid): p for sid, p in (progress or {}).items()}
+    with _steamcmd_progress_lock:
+        if server_id is not None:
+            progress = _steamcmd_progress.get(server_id)
+            return dict(progress, phases=dict(progress['phases'])) if progress else None
+        return {sid: dict(p, phases=dict(p['phases'])) for sid, p in _steamcmd_progress.items()}
+def load_steamcmd_runs(server_id=None, limit=50):
+    """Resumos das últimas execuções (mais recentes primeiro)"""
+    runs = []
+    if not os.path.exists(STEAMCMD_RUNS_FILE):
+        return runs
+    for _, line in iter_log_lines_reverse(STEAMCMD_RUNS_FILE):
+        try:
+            run = json.loads(line)
+        except ValueError:
+            continue
+        if server_id is None or run.get('server_id') == server_id:
+            runs.append(run)
+            if len(runs) >= limit:
+                break
+    return runs
+def install_server_steamcmd(server_path, server_id, app_id=376030, force_update=False, branch="preaquatica", job_id=None):
     """Instalar servidor usando SteamCMD com plataforma correta e seleção de branch"""
     try:
         log_installation(f"Iniciando instalação para: {server_path} (branch: {branch})", server_id)
@@ -395,83 +1806,94 @@ def install_server_steamcmd(server_path, server_id, app_id=376030, force_update=
         
         # Construir comando com branch
         if branch and branch != "public":
-            install_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} -beta {branch} validate +quit'
+            install_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} -beta {branch} +quit'
         else:
             # Branch public (padrão)
-            install_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} validate +quit'
+            install_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} +quit'
         
         log_installation(f"Comando: {install_cmd}", server_id)
         
         # Criar arquivo de log específico para esta instalação
         install_log_file = os.path.join(LOGS_DIR, f'install_server_{server_id}.log')
+        general_log_file = os.path.join(LOGS_DIR, 'installation.log')
         
         # Executar o comando e capturar output em tempo real
-        with open(install_log_file, 'a') as log_f:
-            process = subprocess.Popen(
-                install_cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                cwd='/tmp',
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # Ler a saída em tempo real e escrever no log
-            for line in process.stdout:
-                log_f.write(line)
-                log_f.flush() # Garantir que seja escrito imediatamente
-                # Também escrever no log geral para rastreamento
-                with open(os.path.join(LOGS_DIR, 'installation.log'), 'a') as general_log:
-                    general_log.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [SERVER_{server_id}] {line}")
-            
-            # Esperar o processo terminar
-            process.wait()
-            
-            if process.returncode == 0:
-                # Verificar se a instalação foi bem sucedida (pasta Linux existe)
-                linux_bin_path = os.path.join(server_path, 'ShooterGame', 'Binaries', 'Linux')
-                if os.path.exists(linux_bin_path):
-                    executable_path = os.path.join(linux_bin_path, 'ShooterGameServer')
-                    if os.path.exists(executable_path):
-                        # Mover executável para o diretório principal para compatibilidade
-                        destination_path = os.path.join(server_path, 'ShooterGameServer')
-                        shutil.move(executable_path, destination_path)
-                        log_installation("Executável movido para diretório principal", server_id)
-                    
-                    # Criar arquivo de marcação de instalação bem sucedida
-                    marker_file = os.path.join(server_path, '.ark_installed')
-                    version_file = os.path.join(server_path, '.ark_version')
-                    try:
-                        with open(marker_file, 'w') as f:
-                            f.write(f"Installed successfully at: {datetime.now()}\nLinux version (branch: {branch})\n")
-                        with open(version_file, 'w') as f:
-                            f.write(f"Linux version installed at: {datetime.now()}\nBranch: {branch}\n")
-                        log_installation("Arquivos de marcação criados com sucesso!", server_id)
-                    except Exception as e:
-                        log_installation(f"ERRO ao criar arquivos de marcação: {e}", server_id)
-                    
-                    log_installation("Servidor instalado com sucesso para Linux!", server_id)
-                    return True
-                else:
-                    log_installation("ERRO: Pasta Linux não encontrada após instalação", server_id)
-                    log_installation("Provavelmente o SteamCMD baixou a versão Windows ou houve erro no download", server_id)
-                    return False
+        process = subprocess.Popen(
+            install_cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd='/tmp',
+            bufsize=1,
+            universal_newlines=True
+        )
+        if job_id:
+            record_job_process(job_id, process.pid)
+        
+        # Ler a saída em tempo real, escrever no log e acompanhar o progresso
+        progress = start_steamcmd_progress(server_id, 'install', job_id)
+        for line in process.stdout:
+            write_log(install_log_file, line)
+            # Também escrever no log geral para rastreamento
+            write_log(general_log_file, f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [SERVER_{server_id}] {line}")
+            track_steamcmd_line(progress, line)
+        
+        # Esperar o processo terminar
+        process.wait()
+        end_steamcmd_progress(progress, process.returncode == 0)
+        
+        if process.returncode == 0:
+            # Verificar se a instalação foi bem sucedida (pasta Linux existe)
+            linux_bin_path = os.path.join(server_path, 'ShooterGame', 'Binaries', 'Linux')
+            if os.path.exists(linux_bin_path):
+                executable_path = os.path.join(linux_bin_path, 'ShooterGameServer')
+                if os.path.exists(executable_path):
+                    # Mover executável para o diretório principal para compatibilidade
+                    destination_path = os.path.join(server_path, 'ShooterGameServer')
+                    shutil.move(executable_path, destination_path)
+                    log_installation("Executável movido para diretório principal", server_id)
+                
+                # Criar arquivo de marcação de instalação bem sucedida
+                marker_file = os.path.join(server_path, '.ark_installed')
+                version_file = os.path.join(server_path, '.ark_version')
+                try:
+                    with open(marker_file, 'w') as f:
+                        f.write(f"Installed successfully at: {datetime.now()}\nLinux version (branch: {branch})\n")
+                    with open(version_file, 'w') as f:
+                        f.write(f"Linux version installed at: {datetime.now()}\nBranch: {branch}\n")
+                    log_installation("Arquivos de marcação criados com sucesso!", server_id)
+                except Exception as e:
+                    log_installation(f"ERRO ao criar arquivos de marcação: {e}", server_id)
+                
+                log_installation("Servidor instalado com sucesso para Linux!", server_id)
+                return True
             else:
-                log_installation(f"ERRO na instalação do servidor (código {process.returncode})", server_id)
+                log_installation("ERRO: Pasta Linux não encontrada após instalação", server_id)
+                log_installation("Provavelmente o SteamCMD baixou a versão Windows ou houve erro no download", server_id)
                 return False
-            
+        else:
+            log_installation(f"ERRO na instalação do servidor (código {process.returncode})", server_id)
+            return False
+        
     except Exception as e:
         log_installation(f"EXCEÇÃO na instalação: {str(e)}", server_id)
         import traceback
         log_installation(f"Traceback: {traceback.format_exc()}", server_id)
         return False
-def update_server_steamcmd(server_path, server_id, app_id=376030, branch="preaquatica"):
-    """Atualizar servidor usando SteamCMD"""
+def update_server_steamcmd(server_path, server_id, app_id=376030, branch="preaquatica", job_id=None, validate=False):
+    """Atualizar servidor usando SteamCMD (validate=True apenas para reparo: re-hash de toda a instalação)"""
     try:
         log_installation(f"Iniciando atualização para: {server_path} (branch: {branch})", server_id)
         
+        # Sem reparo, comparar build IDs e pular o SteamCMD se já estiver na build mais recente
+        if not validate:
+            build = check_build_current(server_path, branch, app_id)
+            if build['up_to_date']:
+                log_installation(f"Servidor já está na build mais recente ({build['installed']}, branch: {branch}); nada a fazer", server_id)
+                return True
+            log_installation(f"Build instalada: {build['installed'] or 'desconhecida'} / mais recente: {build['latest'] or 'desconhecida'}", server_id)
+        
         # Verificar se SteamCMD existe
         steamcmd_path = '/home/arkserver/steamcmd/steamcmd.sh'
         if not os.path.exists(steamcmd_path):
@@ -482,53 +1904,309 @@ def update_server_steamcmd(server_path, server_id, app_id=376030, branch="preaqu
         log_installation(f"Atualizando servidor ARK (app_id: {app_id}) para Linux (branch: {branch})...", server_id)
         
         # Construir comando com branch
+        validate_arg = ' validate' if validate else ''
         if branch and branch != "public":
-            update_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} -beta {branch} validate +quit'
+            update_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} -beta {branch}{validate_arg} +quit'
         else:
             # Branch public (padrão)
-            update_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id} validate +quit'
+            update_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +@sSteamCmdForcePlatformType linux +force_install_dir {server_path} +login anonymous +app_update {app_id}{validate_arg} +quit'
         
         log_installation(f"Comando: {update_cmd}", server_id)
         
         # Criar arquivo de log específico para esta atualização
         update_log_file = os.path.join(LOGS_DIR, f'update_server_{server_id}.log')
+        general_log_file = os.path.join(LOGS_DIR, 'installation.log')
         
         # Executar o comando e capturar output em tempo real
-        with open(update_log_file, 'a') as log_f:
-            process = subprocess.Popen(
-                update_cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                cwd='/tmp',
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # Ler a saída em tempo real e escrever no log
-            for line in process.stdout:
-                log_f.write(line)
-                log_f.flush()
-                # Também escrever no log geral
-                with open(os.path.join(LOGS_DIR, 'installation.log'), 'a') as general_log:
-                    general_log.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [UPDATE_SERVER_{server_id}] {line}")
-            
-            # Esperar o processo terminar
-            process.wait()
+        process = subprocess.Popen(
+            update_cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd='/tmp',
+            bufsize=1,
+            universal_newlines=True
+        )
+        if job_id:
+            record_job_process(job_id, process.pid)
+        
+        # Ler a saída em tempo real, escrever no log e acompanhar o progresso
+        progress = start_steamcmd_progress(server_id, 'update', job_id)
+        for line in process.stdout:
+            write_log(update_log_file, line)
+            # Também escrever no log geral
+            write_log(general_log_file, f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [UPDATE_SERVER_{server_id}] {line}")
+            track_steamcmd_line(progress, line)
+        
+        # Esperar o processo terminar
+        process.wait()
+        end_steamcmd_progress(progress, process.returncode == 0)
+        
+        if process.returncode == 0:
+            log_installation("Servidor atualizado com sucesso!", server_id)
+            return True
+        else:
+            log_installation(f"ERRO na atualização do servidor (código {process.returncode})", server_id)
+            return False
             
-            if process.returncode == 0:
-                log_installation("Servidor atualizado com sucesso!", server_id)
-                return True
-            else:
-                log_installation(f"ERRO na atualização do servidor (código {process.returncode})", server_id)
-                return False
-                
     except Exception as e:
         log_installation(f"EXCEÇÃO na atualização: {str(e)}", server_id)
         import traceback
         log_installation(f"Traceback: {traceback.format_exc()}", server_id)
         return False
+# Atualização em lote: uma única sessão do SteamCMD (runscript) para vários force_install_dir + app_update
+def build_steamcmd_runscript(entries, app_id=376030):
+    """Gerar o runscript: bootstrap e login uma vez, depois um app_update por diretório"""
+    lines = [
+        '@ShutdownOnFailedCommand 0',  # Uma falha não interrompe os demais servidores
+        '@NoPromptForPassword 1',
+        '@sSteamCmdForcePlatformType linux',
+        'login anonymous'
+    ]
+    for entry in entries:
+        beta = f" -beta {entry['branch']}" if entry['branch'] and entry['branch'] != 'public' else ''
+        lines.append(f"force_install_dir {entry['path']}")
+        lines.append(f"app_update {app_id}{beta}")
+    lines.append('quit')
+    return '\n'.join(lines) + '\n'
+def consume_steamcmd_batch_output(lines, entries, job_id=None):
+    """Distribuir a saída de uma sessão em lote entre as entradas; retorna (resultados, entradas concluídas)
+
+    Os app_update rodam em sequência, então a saída é atribuída à entrada atual e avança a cada linha
+    de resultado (Success!/Error! App ... ou ERROR! Failed to install app ...; o bootstrap e o login
+    ficam no log da primeira). Com @ShutdownOnFailedCommand 0 a sessão continua após uma falha, então
+    toda falha precisa avançar a entrada, senão a saída seguinte seria atribuída ao servidor errado.
+    """
+    general_log_file = os.path.join(LOGS_DIR, 'installation.log')
+    results = [False] * len(entries)
+    current = 0
+    progress = start_steamcmd_progress(entries[0]['server_id'], 'update', job_id)
+    for line in lines:
+        entry = entries[current] if current < len(entries) else None
+        if entry is None:
+            write_log(general_log_file, f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [UPDATE_BATCH] {line}")
+            continue
+        write_log(os.path.join(LOGS_DIR, f"update_server_{entry['server_id']}.log"), line)
+        write_log(general_log_file, f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [UPDATE_SERVER_{entry['server_id']}] {line}")
+        event = parse_steamcmd_line(line)
+        if event is None:
+            continue
+        with _steamcmd_progress_lock:
+            apply_steamcmd_event(progress, event)
+        if event['event'] == 'result':
+            # Fim deste app_update: fechar o resumo e passar para o próximo diretório
+            results[current] = event['success']
+            end_steamcmd_progress(progress, event['success'])
+            current += 1
+            if current < len(entries):
+                progress = start_steamcmd_progress(entries[current]['server_id'], 'update', job_id)
+    if current < len(entries):
+        end_steamcmd_progress(progress, False)
+    return results, current
+def update_servers_steamcmd_batch(entries, app_id=376030, job_id=None):
+    """Atualizar vários diretórios numa única sessão do SteamCMD
+
+    entries: [{'server_id', 'path', 'branch'}]. A saída é distribuída por consume_steamcmd_batch_output().
+    Retorna a lista de resultados (True/False) na ordem das entradas.
+    """
+    steamcmd_path = '/home/arkserver/steamcmd/steamcmd.sh'
+    results = [False] * len(entries)
+    if not entries:
+        return results
+    if not os.path.exists(steamcmd_path):
+        log_installation("SteamCMD não encontrado!")
+        return results
+    # O SteamCMD roda como arkserver: o runscript precisa ser legível por ele
+    with tempfile.NamedTemporaryFile('w', prefix='steamcmd_batch_', suffix='.txt', dir='/tmp', delete=False) as f:
+        f.write(build_steamcmd_runscript(entries, app_id))
+        script_file = f.name
+    os.chmod(script_file, 0o644)
+    try:
+        batch_cmd = f'/usr/bin/sudo -u arkserver {steamcmd_path} +runscript {script_file}'
+        log_installation(f"Atualização em lote de {len(entries)} diretório(s): {batch_cmd}")
+        for entry in entries:
+            log_installation(f"Atualização em lote (sessão única do SteamCMD): {entry['path']} (branch: {entry['branch']})", entry['server_id'])
+        process = subprocess.Popen(
+            batch_cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd='/tmp',
+            bufsize=1,
+            universal_newlines=True
+        )
+        if job_id:
+            record_job_process(job_id, process.pid)
+        
+        results, current = consume_steamcmd_batch_output(process.stdout, entries, job_id)
+        process.wait()
+        if current < len(entries):
+            for entry in entries[current:]:
+                log_installation(f"ERRO: sessão do SteamCMD encerrada antes de atualizar este servidor (código {process.returncode})", entry['server_id'])
+        for entry, ok in zip(entries, results):
+            log_installation("Servidor atualizado com sucesso!" if ok else "ERRO na atualização do servidor (lote)", entry['server_id'])
+        return results
+    except Exception as e:
+        log_installation(f"EXCEÇÃO na atualização em lote: {str(e)}")
+        import traceback
+        log_installation(f"Traceback: {traceback.format_exc()}")
+        return results
+    finally:
+        os.remove(script_file)
+# Instalação compartilhada: baixar uma vez por branch e materializar cada mapa a partir da base
+FICLONE = 0x40049409  # ioctl de reflink (btrfs, XFS com reflink=1, bcachefs)
+SHARED_INSTALL_EXCLUDE = ('ShooterGame/Saved', 'steamapps/downloading', 'steamapps/temp', 'steamapps/workshop',
+                          '.ark_installed', '.ark_version', '.ark_clone_manifest', 'start_server.sh')
+SHARED_INSTALL_PRIVATE_SUFFIXES = ('.acf', '.ini', '.cfg', '.json', '.txt', '.sh')  # Pequenos e editáveis: cópia própria
+# Gravados pelo servidor em tempo de execução (mods baixados/atualizados no lugar): cópia ou reflink, nunca hardlink
+SHARED_INSTALL_PRIVATE_DIRS = ('ShooterGame/Content/Mods',)
+CLONE_MANIFEST_FILE = '.ark_clone_manifest'
+_shared_base_locks = {}
+_shared_base_locks_lock = threading.Lock()
+def get_shared_base_path(branch):
+    """Diretório da instalação base de um branch"""
+    return os.path.join(PANEL_SETTINGS['shared_install_root'], branch or 'public')
+def get_shared_base_lock(branch):
+    """Lock por branch: apenas uma tarefa instala/atualiza a mesma base por vez"""
+    with _shared_base_locks_lock:
+        return _shared_base_locks.setdefault(branch, threading.Lock())
+def is_clone_excluded(rel_path):
+    """Áreas graváveis por servidor (Saved, marcadores, script) não vêm da base"""
+    return any(rel_path == p or rel_path.startswith(p + '/') for p in SHARED_INSTALL_EXCLUDE)
+def is_clone_private(rel_path):
+    """Arquivos que o servidor pode alterar: cópia própria, para não alterar a base (e os outros mapas) via hardlink"""
+    return rel_path.endswith(SHARED_INSTALL_PRIVATE_SUFFIXES) or \
+        any(rel_path.startswith(p + '/') for p in SHARED_INSTALL_PRIVATE_DIRS)
+def reflink_file(src, dst):
+    """Clonar o conteúdo via reflink (compartilha blocos até alguém escrever)"""
+    with open(src, 'rb') as s_f, open(dst, 'wb') as d_f:
+        fcntl.ioctl(d_f.fileno(), FICLONE, s_f.fileno())
+def clone_file(src, dst, private, mode, capabilities):
+    """Materializar um arquivo da base; retorna o método usado (hardlink, reflink ou copy)
+
+    capabilities guarda o que já falhou neste sistema de arquivos para não tentar de novo a cada arquivo.
+    """
+    if mode == 'auto' and not private and capabilities.get('hardlink', True):
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            capabilities['hardlink'] = False
+    if mode in ('auto', 'reflink') and capabilities.get('reflink', True):
+        try:
+            reflink_file(src, dst)
+            shutil.copystat(src, dst)
+            return 'reflink'
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY):
+                raise
+            capabilities['reflink'] = False
+    shutil.copy2(src, dst)
+    return 'copy'
+def materialize_server_from_base(server, base_path, branch, mode=None):
+    """Criar/atualizar o diretório de um servidor a partir da instalação base
+
+    Arquivos já idênticos (mesmo inode ou mesmo tamanho/mtime) são mantidos; arquivos que saíram da
+    base são removidos usando o manifesto do clone anterior. Saved/ e marcadores continuam privados;
+    Content/Mods e arquivos editáveis são cópias próprias (um hardlink antigo para a base é substituído).
+    """
+    mode = mode or PANEL_SETTINGS['shared_install_link_mode']
+    server_path = server['path']
+    started = time.time()
+    stats = {'hardlink': 0, 'reflink': 0, 'copy': 0, 'unchanged': 0, 'removed': 0}
+    capabilities = {}
+    manifest_file = os.path.join(server_path, CLONE_MANIFEST_FILE)
+    try:
+        with open(manifest_file, 'r') as f:
+            previous = set(json.load(f))
+    except (OSError, ValueError):
+        previous = set()
+    cloned = set()
+    as_root = os.geteuid() == 0
+    os.makedirs(server_path, exist_ok=True)
+    for dirpath, dirnames, filenames in os.walk(base_path):
+        rel_dir = os.path.relpath(dirpath, base_path)
+        rel_dir = '' if rel_dir == '.' else rel_dir
+        dirnames[:] = [d for d in dirnames if not is_clone_excluded(os.path.join(rel_dir, d))]
+        dst_dir = os.path.join(server_path, rel_dir)
+        if not os.path.isdir(dst_dir):
+            os.makedirs(dst_dir)
+            if as_root:
+                dir_st = os.stat(dirpath)
+                os.chown(dst_dir, dir_st.st_uid, dir_st.st_gid)
+        for name in filenames:
+            rel = os.path.join(rel_dir, name)
+            if is_clone_excluded(rel):
+                continue
+            src = os.path.join(dirpath, name)
+            dst = os.path.join(server_path, rel)
+            cloned.add(rel)
+            src_st = os.lstat(src)
+            private = is_clone_private(rel)
+            try:
+                dst_st = os.lstat(dst)
+                same_inode = (dst_st.st_dev, dst_st.st_ino) == (src_st.st_dev, src_st.st_ino)
+                if (same_inode and not private) or (not same_inode and dst_st.st_size == src_st.st_size
+                                                    and int(dst_st.st_mtime) == int(src_st.st_mtime)):
+                    stats['unchanged'] += 1
+                    continue
+            except FileNotFoundError:
+                pass
+            # Clonar para um temporário e trocar atomicamente (servidores rodando mantêm o inode antigo)
+            tmp = dst + '.clone_tmp'
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), tmp)
+                method = 'copy'
+            else:
+                method = clone_file(src, tmp, private, mode, capabilities)
+                if as_root and method != 'hardlink':
+                    os.chown(tmp, src_st.st_uid, src_st.st_gid)
+            os.replace(tmp, dst)
+            stats[method] += 1
+    for rel in previous - cloned:
+        try:
+            os.remove(os.path.join(server_path, rel))
+            stats['removed'] += 1
+        except OSError:
+            pass
+    with open(manifest_file + '.tmp', 'w') as f:
+        json.dump(sorted(cloned), f)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    with open(os.path.join(server_path, '.ark_installed'), 'w') as f:
+        f.write(f"Installed successfully at: {datetime.now()}\nLinux version (branch: {branch})\nShared base: {base_path}\n")
+    with open(os.path.join(server_path, '.ark_version'), 'w') as f:
+        f.write(f"Linux version installed at: {datetime.now()}\nBranch: {branch}\n")
+    stats['seconds'] = round(time.time() - started, 2)
+    return stats
+def ensure_shared_base(branch, server_id, job_id=None, update=False, validate=False):
+    """Instalar a base do branch se ainda não existir (ou atualizá-la com update=True, validando com validate=True)"""
+    base_path = get_shared_base_path(branch)
+    with get_shared_base_lock(branch):
+        if os.path.exists(os.path.join(base_path, '.ark_installed')):
+            if not update:
+                return base_path
+            log_installation(f"Atualizando instalação base compartilhada: {base_path}", server_id)
+            ok = update_server_steamcmd(base_path, server_id, branch=branch, job_id=job_id, validate=validate)
+        else:
+            log_installation(f"Instalando base compartilhada do branch {branch} em {base_path}", server_id)
+            ok = install_server_steamcmd(base_path, server_id, branch=branch, job_id=job_id)
+    return base_path if ok else None
+def provision_shared_server(server, branch, job_id=None, update=False, validate=False):
+    """Provisionar um servidor a partir da base compartilhada; retorna (sucesso, mensagem)"""
+    base_path = ensure_shared_base(branch, server['id'], job_id, update, validate)
+    if not base_path:
+        return False, 'Erro na instalação base compartilhada. Verifique os logs.'
+    stats = materialize_server_from_base(server, base_path, branch)
+    log_installation(f"Servidor materializado a partir de {base_path} em {stats['seconds']}s "
+                     f"(hardlink: {stats['hardlink']}, reflink: {stats['reflink']}, cópia: {stats['copy']}, "
+                     f"inalterados: {stats['unchanged']}, removidos: {stats['removed']})", server['id'])
+    return True, None
 def uninstall_server(server_path, server_id):
     """Desinstalar servidor removendo diretório"""
     try:
@@ -540,6 +2218,7 @@ def uninstall_server(server_path, server_id):
             time.sleep(2)  # Esperar processo terminar
         except:
             pass
+        unregister_server_process(server_id)
         
         # Remover arquivos de marcação
         marker_files = [
@@ -566,40 +2245,1049 @@ def uninstall_server(server_path, server_id):
         for log_file in server_logs:
             if os.path.exists(log_file):
                 os.remove(log_file)
+            for archive in get_log_archives(log_file):
+                os.remove(archive)
         
         log_installation("Servidor desinstalado com sucesso!", server_id)
         return True
     except Exception as e:
         log_installation(f"ERRO na desinstalação: {str(e)}", server_id)
         return False
-def filter_log_lines(lines, search_term=None, start_date=None, end_date=None):
-    """Filtrar linhas de log por termo de busca e/ou data"""
-    filtered_lines = []
-    
-    for line in lines:
-        # Filtrar por termo de busca
-        if search_term and search_term.lower() not in line.lower():
+# Fila de tarefas: instalar/atualizar/desinstalar fora da requisição HTTP, com estado persistido
+JOBS_FILE = os.path.join(CONFIG_DIR, 'jobs.json')
+JOB_ACTIVE_STATES = ('queued', 'running')
+_jobs = {}
+_jobs_lock = threading.Lock()
+_job_start_lock = threading.Lock()
+_job_executor = None
+_job_next_id = 1
+def save_jobs():
+    """Gravar o estado das tarefas de forma atômica (chamar com _jobs_lock)"""
+    finished = sorted((j for j in _jobs.values() if j['status'] not in JOB_ACTIVE_STATES), key=lambda j: j['id'])
+    for job in finished[:max(0, len(finished) - int(PANEL_SETTINGS['job_history_limit']))]:
+        del _jobs[job['id']]
+    tmp_file = JOBS_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump({'next_id': _job_next_id, 'jobs': sorted(_jobs.values(), key=lambda j: j['id'])}, f, indent=2)
+    os.replace(tmp_file, JOBS_FILE)
+def record_job_process(job_id, pid):
+    """Registrar o SteamCMD da tarefa: PID e create_time, para reconhecer o mesmo processo após um reinício"""
+    try:
+        create_time = psutil.Process(pid).create_time()
+    except psutil.Error:
+        create_time = None
+    update_job(job_id, pid=pid, pid_create_time=create_time)
+def update_job(job_id, **fields):
+    """Atualizar campos de uma tarefa e persistir"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        save_jobs()
+        return dict(job)
+def sync_jobs_from_file():
+    """Processo seguidor: refletir o jobs.json gravado pelo líder (relido só quando muda)"""
+    global _job_next_id
+    try:
+        st = os.stat(JOBS_FILE)
+    except FileNotFoundError:
+        return
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if signature == _panel_role['jobs_signature']:
+        return
+    try:
+        with open(JOBS_FILE, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    with _jobs_lock:
+        _jobs.clear()
+        _jobs.update({job['id']: job for job in data.get('jobs', [])})
+        _job_next_id = data.get('next_id', 1)
+    _panel_role['jobs_signature'] = signature
+def get_job(job_id):
+    """Cópia de uma tarefa (ou None)"""
+    if _panel_role['started'] and not _panel_role['leader']:
+        sync_jobs_from_file()
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+def list_jobs(server_id=None, status=None):
+    """Tarefas (mais recentes primeiro), opcionalmente filtradas por servidor/estado"""
+    if _panel_role['started'] and not _panel_role['leader']:
+        sync_jobs_from_file()
+    with _jobs_lock:
+        jobs = [dict(j) for j in _jobs.values()
+                if (server_id is None or j['server_id'] == server_id) and (status is None or j['status'] == status)]
+    return sorted(jobs, key=lambda j: j['id'], reverse=True)
+def submit_job(job_type, server_id, params=None):
+    """Enfileirar uma tarefa; retorna (tarefa, criada) — se o servidor já tem uma tarefa ativa, ela é retornada"""
+    global _job_next_id
+    start_status_collector()
+    if not _panel_role['leader']:
+        # Só o líder executa tarefas: o seguidor apenas encaminha
+        result = call_panel_leader('submit_job', job_type=job_type, server_id=server_id, params=params)
+        return result['job'], result['created']
+    # Tarefas em lote envolvem vários servidores: conflitam com tarefas ativas de qualquer um deles
+    targets = set((params or {}).get('server_ids', [])) or {server_id}
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job['status'] not in JOB_ACTIVE_STATES:
+                continue
+            if targets & (set(job['params'].get('server_ids', [])) or {job['server_id']}):
+                return dict(job), False
+        job = {
+            'id': _job_next_id,
+            'type': job_type,
+            'server_id': server_id,
+            'params': params or {},
+            'status': 'queued',
+            'message': None,
+            'pid': None,
+            'pid_create_time': None,
+            'attempts': 0,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'started_at': None,
+            'finished_at': None
+        }
+        _jobs[job['id']] = job
+        _job_next_id += 1
+        save_jobs()
+    _job_executor.submit(run_job, job['id'])
+    return dict(job), True
+def run_job(job_id):
+    """Executar uma tarefa no pool (limitado por job_max_workers)"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None or job['status'] != 'queued':
+            return
+        job.update(status='running', attempts=job['attempts'] + 1,
+                   started_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        save_jobs()
+        job = dict(job)
+    try:
+        success, message = execute_job(job)
+    except Exception as e:
+        import traceback
+        log_installation(f"EXCEÇÃO na tarefa {job_id} ({job['type']}): {str(e)}")
+        log_installation(f"Traceback: {traceback.format_exc()}")
+        success, message = False, f'Exceção: {str(e)}'
+    update_job(job_id, status='succeeded' if success else 'failed', message=message, pid=None, pid_create_time=None,
+               finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    request_status_refresh()
+def execute_job(job):
+    """Executar o trabalho de uma tarefa; retorna (sucesso, mensagem)"""
+    if job['type'] == 'batch_update':
+        return execute_batch_update_job(job)
+    if job['type'] == 'rolling_update':
+        return execute_rolling_update_job(job)
+    server_id = job['server_id']
+    server = get_server(server_id)
+    if not server:
+        return False, 'Servidor não encontrado'
+    branch = job['params'].get('branch', 'preaquatica')
+    if PANEL_SETTINGS['shared_install'] and job['type'] in ('install', 'force_install', 'update', 'repair'):
+        return execute_shared_job(job, server, branch)
+    if job['type'] == 'install':
+        os.makedirs(server['path'], exist_ok=True)
+        log_installation(f"Diretórios criados: {server['path']}")
+        if install_server_steamcmd(server['path'], server_id, branch=branch, job_id=job['id']):
+            log_installation(f"Servidor {server_id} instalado com sucesso!")
+            return True, 'Servidor instalado com sucesso!'
+        log_installation(f"Erro na instalação do servidor {server_id}")
+        return False, 'Erro na instalação do servidor. Verifique os logs de instalação específicos do servidor.'
+    if job['type'] == 'force_install':
+        # Retomada após reinício do painel: não apagar de novo o que já foi baixado
+        force_update = job['attempts'] <= 1
+        if install_server_steamcmd(server['path'], server_id, force_update=force_update, branch=branch, job_id=job['id']):
+            log_installation(f"Servidor {server_id} REINSTALADO com sucesso!")
+            return True, 'Servidor reinstalado com sucesso!'
+        log_installation(f"Erro na REINSTALAÇÃO do servidor {server_id}")
+        return False, 'Erro na reinstalação do servidor. Verifique os logs.'
+    if job['type'] == 'update':
+        if update_server_steamcmd(server['path'], server_id, branch=branch, job_id=job['id']):
+            return True, 'Servidor atualizado com sucesso!'
+        return False, 'Erro na atualização do servidor. Verifique os logs.'
+    if job['type'] == 'repair':
+        if update_server_steamcmd(server['path'], server_id, branch=branch, job_id=job['id'], validate=True):
+            return True, 'Servidor reparado (validado) com sucesso!'
+        return False, 'Erro no reparo do servidor. Verifique os logs.'
+    if job['type'] == 'uninstall':
+        if uninstall_server(server['path'], server_id):
+            return True, 'Servidor desinstalado com sucesso!'
+        return False, 'Erro na desinstalação do servidor.'
+    return False, f"Tipo de tarefa desconhecido: {job['type']}"
+def execute_batch_update_job(job):
+    """Atualizar vários servidores numa única sessão do SteamCMD"""
+    branch = job['params'].get('branch', 'preaquatica')
+    server_ids = job['params']['server_ids']
+    servers = get_servers_by_ids(server_ids)
+    if PANEL_SETTINGS['shared_install']:
+        # Modo compartilhado: a sessão atualiza a base do branch; depois cada servidor é rematerializado
+        base_path = get_shared_base_path(branch)
+        with get_shared_base_lock(branch):
+            if not servers:
+                base_ok = False
+            elif check_build_current(base_path, branch)['up_to_date']:
+                log_installation(f"Base compartilhada já está na build mais recente: {base_path}")
+                base_ok = True
+            else:
+                base_ok = update_servers_steamcmd_batch([{'server_id': servers[0]['id'], 'path': base_path, 'branch': branch}],
+                                                        job_id=job['id'])[0]
+        results = {}
+        for server in servers:
+            if base_ok:
+                stats = materialize_server_from_base(server, base_path, branch)
+                log_installation(f"Servidor rematerializado a partir de {base_path} em {stats['seconds']}s", server['id'])
+            results[server['id']] = base_ok
+    else:
+        # Servidores já na build mais recente ficam fora da sessão
+        results = {}
+        pending = []
+        for server in servers:
+            build = check_build_current(server['path'], branch)
+            if build['up_to_date']:
+                log_installation(f"Servidor já está na build mais recente ({build['installed']}, branch: {branch}); nada a fazer", server['id'])
+                results[server['id']] = True
+            else:
+                pending.append(server)
+        entries = [{'server_id': s['id'], 'path': s['path'], 'branch': branch} for s in pending]
+        results.update(zip([s['id'] for s in pending], update_servers_steamcmd_batch(entries, job_id=job['id'])))
+    update_job(job['id'], results={str(sid): ok for sid, ok in results.items()})
+    updated = sum(1 for ok in results.values() if ok)
+    return updated == len(server_ids), f'{updated} de {len(server_ids)} servidores atualizados'
+# Atualização gradual da frota: concorrência limitada, servidores vazios primeiro, espera pelo A2S
+def rolling_update_server(server, branch, was_running, job_id):
+    """Parar, atualizar, reiniciar e esperar o A2S de um servidor; retorna o resultado com tempos"""
+    poll_interval = float(PANEL_SETTINGS['rolling_update_poll_interval'])
+    result = {'status': 'updating', 'was_running': was_running}
+    started = time.time()
+    log_installation(f"Atualização gradual: iniciando (rodando: {'sim' if was_running else 'não'})", server['id'])
+    if was_running:
+        terminate_server(server)
+    stopped = time.time()
+    result['stop_seconds'] = round(stopped - started, 1)
+    if PANEL_SETTINGS['shared_install']:
+        ok, _ = provision_shared_server(server, branch, job_id, update=True)
+    else:
+        ok = update_server_steamcmd(server['path'], server['id'], branch=branch, job_id=job_id)
+    updated = time.time()
+    result['update_seconds'] = round(updated - stopped, 1)
+    if not ok:
+        result['status'] = 'failed'
+        result['error'] = 'Erro na atualização (veja o log de atualização)'
+    if was_running:
+        # Reiniciar mesmo após falha na atualização: manter o servidor no ar com a build anterior
+        launch_server(server)
+        deadline = time.time() + float(PANEL_SETTINGS['rolling_update_boot_timeout'])
+        online = False
+        while time.time() < deadline:
+            time.sleep(poll_interval)
+            if get_real_player_count(server)['state'] == 'ok':
+                online = True
+                break
+        result['boot_seconds'] = round(time.time() - updated, 1)
+        result['downtime_seconds'] = round(time.time() - started, 1)
+        if not online:
+            result['status'] = 'failed'
+            result['error'] = 'Servidor não voltou a responder A2S dentro do prazo'
+    if result['status'] == 'updating':
+        result['status'] = 'updated'
+    result['total_seconds'] = round(time.time() - started, 1)
+    log_installation(f"Atualização gradual: {result['status']} em {result['total_seconds']}s", server['id'])
+    return result
+def execute_rolling_update_job(job):
+    """Atualizar uma frota aos poucos, no máximo N servidores fora do ar por vez
+
+    Servidores parados ou sem jogadores são escolhidos primeiro; servidores com jogadores esperam até
+    rolling_update_drain_timeout (consultando o A2S) antes de serem atualizados mesmo assim. Servidores
+    já na build mais recente são ignorados. Uma falha interrompe o agendamento dos restantes.
+    """
+    branch = job['params'].get('branch', 'preaquatica')
+    concurrency = max(1, int(job['params'].get('concurrency') or PANEL_SETTINGS['rolling_update_concurrency']))
+    poll_interval = float(PANEL_SETTINGS['rolling_update_poll_interval'])
+    drain_deadline = time.time() + float(PANEL_SETTINGS['rolling_update_drain_timeout'])
+    servers = get_servers_by_ids(job['params']['server_ids'])
+    results = {}
+    pending = []
+    for server in servers:
+        check_path = get_shared_base_path(branch) if PANEL_SETTINGS['shared_install'] else server['path']
+        build = check_build_current(check_path, branch)
+        if build['up_to_date'] and get_installed_build(server['path']) == get_installed_build(check_path):
+            results[server['id']] = {'status': 'skipped', 'build': build['installed']}
+        else:
+            pending.append(server)
+    update_job(job['id'], results={str(k): v for k, v in results.items()})
+    halted = False
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='rolling-update') as executor:
+        running = {}
+        while (pending and not halted) or running:
+            # Escolher os próximos: parados primeiro, depois por número de jogadores
+            if pending and not halted and len(running) < concurrency:
+                index = get_server_processes(pending)
+                online = [s for s in pending if (s['map'], s['game_port']) in index]
+                player_info = query_players_concurrently(online)
+                players = {s['id']: player_info[s['id']]['player_count'] for s in online}
+                candidates = sorted(pending, key=lambda s: (s['id'] in players, players.get(s['id'], 0)))
+                for server in candidates:
+                    if len(running) >= concurrency:
+                        break
+                    count = players.get(server['id'], 0)
+                    if count > 0 and time.time() < drain_deadline:
+                        continue  # Ainda há jogadores: esperar esvaziar (até o prazo de drenagem)
+                    pending.remove(server)
+                    results[server['id']] = {'status': 'updating', 'players_at_start': count}
+                    future = executor.submit(rolling_update_server, server, branch, server['id'] in players, job['id'])
+                    running[future] = server
+                update_job(job['id'], results={str(k): v for k, v in results.items()})
+            if not running:
+                time.sleep(poll_interval)
+                continue
+            done, _ = wait(list(running), timeout=poll_interval, return_when='FIRST_COMPLETED')
+            for future in done:
+                server = running.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = {'status': 'failed', 'error': str(e)}
+                results[server['id']] = dict(results[server['id']], **outcome)
+                if outcome['status'] == 'failed':
+                    halted = True
+                    log_installation(f"Atualização gradual interrompida: falha no servidor {server['id']}")
+            if done:
+                update_job(job['id'], results={str(k): v for k, v in results.items()})
+    for server in pending:
+        results[server['id']] = {'status': 'not_started'}
+    update_job(job['id'], results={str(k): v for k, v in results.items()})
+    updated = sum(1 for r in results.values() if r['status'] in ('updated', 'skipped'))
+    downtime = sum(r.get('downtime_seconds', 0) for r in results.values())
+    return updated == len(servers), (f'{updated} de {len(servers)} servidores atualizados '
+                                     f'(indisponibilidade total: {round(downtime)}s)')
+def execute_shared_job(job, server, branch):
+    """Instalar/reinstalar/atualizar no modo de instalação compartilhada"""
+    server_id = server['id']
+    if job['type'] == 'force_install' and job['attempts'] <= 1 and os.path.exists(server['path']):
+        log_installation(f"Removendo diretório existente para force update...", server_id)
+        shutil.rmtree(server['path'])
+    # Reinstalar/atualizar também atualiza a base antes de materializar; reparar a valida
+    success, message = provision_shared_server(server, branch, job['id'], update=job['type'] != 'install',
+                                               validate=job['type'] == 'repair')
+    if not success:
+        return False, message
+    messages = {'install': 'Servidor instalado com sucesso!', 'force_install': 'Servidor reinstalado com sucesso!',
+                'update': 'Servidor atualizado com sucesso!', 'repair': 'Servidor reparado (validado) com sucesso!'}
+    log_installation(f"Servidor {server_id}: {messages[job['type']]} (instalação compartilhada)")
+    return True, messages[job['type']]
+def kill_job_process(pid, create_time):
+    """Encerrar um SteamCMD deixado por uma execução anterior do painel (shell e filhos)
+
+    Só encerra se o PID ainda for o mesmo processo: create_time igual ao registrado e cmdline do
+    SteamCMD. Após um reboot (ou se o systemd já encerrou o grupo) o PID pode ser de outro processo.
+    Retorna True se o processo foi encerrado.
+    """
+    if create_time is None:
+        return False
+    try:
+        proc = psutil.Process(pid)
+        if abs(proc.create_time() - create_time) > 0.01 or not any('steamcmd' in part for part in proc.cmdline()):
+            return False
+        procs = proc.children(recursive=True) + [proc]
+    except psutil.Error:
+        return False
+    for p in procs:
+        try:
+            p.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(procs, timeout=10)
+    return True
+def load_jobs():
+    """Carregar as tarefas persistidas e reenfileirar as que estavam ativas quando o painel parou"""
+    global _job_next_id
+    try:
+        with open(JOBS_FILE, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    resumed = []
+    with _jobs_lock:
+        _job_next_id = data.get('next_id', 1)
+        for job in data.get('jobs', []):
+            _jobs[job['id']] = job
+            if job['status'] == 'running':
+                if job.get('pid') and kill_job_process(job['pid'], job.get('pid_create_time')):
+                    log_installation(f"Tarefa {job['id']}: SteamCMD anterior (PID {job['pid']}) encerrado")
+                job.update(status='queued', pid=None, pid_create_time=None, message='Retomada após reinício do painel')
+            if job['status'] == 'queued':
+                resumed.append(job['id'])
+        save_jobs()
+    return resumed
+def start_job_workers():
+    """Criar o pool de tarefas (uma única vez) e retomar as tarefas persistidas"""
+    global _job_executor
+    if _job_executor is not None:
+        return
+    with _job_start_lock:
+        if _job_executor is not None:
+            return
+        resumed = load_jobs()
+        executor = ThreadPoolExecutor(max_workers=max(1, int(PANEL_SETTINGS['job_max_workers'])),
+                                      thread_name_prefix='job')
+        for job_id in resumed:
+            executor.submit(run_job, job_id)
+        _job_executor = executor
+# Leitura de logs a partir do fim: custo proporcional ao número de linhas pedidas, não ao tamanho do arquivo
+LOG_READ_BLOCK_SIZE = 64 * 1024
+def iter_log_lines_reverse(log_file, end=None, block_size=LOG_READ_BLOCK_SIZE):
+    """Percorrer as linhas de um log do fim para o início, gerando (offset, linha)"""
+    with open(log_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if end <= 0:
+            return
+        # Leitura com seek/read em blocos (sem mmap: um log truncado durante a leitura causaria SIGBUS)
+        # Buffer cobre os bytes [buf_start, buf_start + len(buf)); rel_end marca o fim da linha atual
+        buf = b''
+        buf_start = end
+        rel_end = 0
+        while buf_start + rel_end > 0:
+            idx = buf.rfind(b'\n', 0, rel_end - 1) if rel_end > 0 else -1
+            while idx == -1 and buf_start > 0:
+                read_start = max(0, buf_start - block_size)
+                f.seek(read_start)
+                chunk = f.read(buf_start - read_start)
+                if len(chunk) < buf_start - read_start:
+                    return  # Arquivo truncado durante a leitura (rotação): parar
+                buf = chunk + buf[:rel_end]
+                rel_end += len(chunk)
+                buf_start = read_start
+                idx = buf.rfind(b'\n', 0, rel_end - 1)
+            yield buf_start + idx + 1, buf[idx + 1:rel_end].decode('utf-8', errors='replace')
+            rel_end = idx + 1
+def tail_log_lines(log_file, lines_limit, line_filter=None, end=None):
+    """Obter as últimas N linhas (ou as últimas N que passam no filtro) de um log"""
+    result = []
+    if lines_limit <= 0:
+        return result
+    for _, line in iter_log_lines_reverse(log_file, end):
+        if line_filter is not None and not line_filter(line):
             continue
-            
+        result.append(line)
+        if len(result) >= lines_limit:
+            break
+    result.reverse()
+    return result
+# Cursores por offset de byte: seguir um log ("depois de X") ou paginar para trás ("antes de Y")
+LOG_CURSOR_MAX_BYTES = 1024 * 1024  # Bytes lidos no máximo por requisição com cursor "after"
+def is_log_cursor_stale(f, st, inode=None, size=None, offsets=()):
+    """Cursor que não vale mais para o arquivo aberto (f, com fstat st)
+
+    Arquivo substituído (inode diferente), truncado (menor que no cursor, ou offset além do fim) ou truncado e
+    crescido de novo: os offsets do cursor ficam sempre logo após um '\n'.
+    """
+    if (inode is not None and inode != st.st_ino) or (size is not None and st.st_size < size):
+        return True
+    for offset in offsets:
+        if offset is None:
+            continue
+        if offset > st.st_size:
+            return True
+        if offset:
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                return True
+    return False
+def read_log_window(log_file, lines_limit, line_filter=None, after=None, before=None, inode=None, size=None,
+                    bounds=None, search=None):
+    """Ler uma janela de linhas de um log e devolver as linhas com o cursor (offsets, inode, tamanho)
+
+    inode e size são os do cursor recebido: arquivo substituído, encolhido (copytruncate) ou com o
+    offset fora de um início de linha reinicia o cursor (reset=True) em vez de devolver um pedaço de outra linha.
+    bounds=(início, fim) restringe a leitura a uma região em bytes (ex.: vinda do índice de timestamps).
+    search é uma busca compilada por compile_log_search().
+    """
+    with open(log_file, 'rb') as f:
+        st = os.fstat(f.fileno())
+        reset = is_log_cursor_stale(f, st, inode, size, (after, before))
+        if reset:
+            after = before = None
+        region_start, region_end = bounds if bounds else (0, st.st_size)
+        lines = []
+        if after is not None:
+            # Leitura para frente a partir do offset, apenas linhas completas
+            after = max(after, region_start)
+            f.seek(after)
+            pos = after
+            while len(lines) < lines_limit and pos - after < LOG_CURSOR_MAX_BYTES and pos < region_end:
+                raw = f.readline()
+                if not raw.endswith(b'\n'):
+                    break
+                pos += len(raw)
+                if search is not None and not log_search_matches(search, raw):
+                    continue
+                line = raw.decode('utf-8', errors='replace')
+                if line_filter is None or line_filter(line):
+                    lines.append(line)
+            start, end = after, pos
+        else:
+            end = st.st_size if before is None else before
+            end = min(end, region_end)
+            if end == st.st_size and end > 0:
+                f.seek(end - 1)
+                if f.read(1) != b'\n':
+                    # Linha ainda sendo escrita: fica para a próxima leitura "after"
+                    end = next(iter_log_lines_reverse(log_file, end))[0]
+            start = end
+            exhausted = True
+            if lines_limit > 0:
+                if search is not None:
+                    candidates = iter_log_matches_reverse(log_file, search, end)
+                else:
+                    candidates = iter_log_lines_reverse(log_file, end)
+                for offset, line in candidates:
+                    if offset < region_start:
+                        break
+                    start = offset
+                    if line_filter is not None and not line_filter(line):
+                        continue
+                    lines.append(line)
+                    if len(lines) >= lines_limit:
+                        exhausted = False
+                        break
+            if exhausted:
+                # Nada mais a ler antes desta janela
+                start = min(start, region_start)
+            lines.reverse()
+    return {
+        'lines': lines,
+        'cursor': {'start': start, 'end': end, 'inode': st.st_ino, 'size': st.st_size},
+        'reset': reset
+    }
+def get_log_cursor_args(default_lines):
+    """Ler da requisição os parâmetros de cursor (lines, after, before, inode, size)"""
+    return {
+        'lines_limit': request.args.get('lines', default_lines, type=int),
+        'after': request.args.get('after', type=int),
+        'before': request.args.get('before', type=int),
+        'inode': request.args.get('inode', type=int),
+        'size': request.args.get('size', type=int)
+    }
+# Busca em logs: termos pré-compilados (case-insensitive), AND/OR, regex e filtro de nível
+LOG_SEARCH_BLOCK_SIZE = 1024 * 1024  # Blocos grandes: a busca varre o bloco inteiro em C antes de isolar linhas
+LOG_LEVEL_WORDS = {
+    'ERROR': ['ERROR', 'ERRO', 'FATAL', 'EXCEÇÃO'],
+    'WARN': ['WARNING', 'WARN', 'AVISO'],
+    'INFO': ['INFO']
+}
+def minimal_needles(needles):
+    """Remover needles redundantes numa alternativa OR (quem contém outro needle já é coberto por ele)"""
+    return [n for n in dict.fromkeys(needles) if not any(o != n and o in n for o in needles)]
+def compile_log_search(search_term=None, terms=None, match='all', regex=False, level=None):
+    """Compilar a busca em uma lista de termos; todos os termos devem casar na linha
+
+    match='all' exige todos os termos (AND), match='any' aceita qualquer um (OR).
+    Termos literais são comparados em minúsculas com bytes.find; regex=True usa re.IGNORECASE | re.MULTILINE
+    (^ e $ valem por linha, mesmo quando a regex é aplicada ao bloco inteiro).
+    Levanta re.error para regex inválida e ValueError para nível desconhecido.
+    """
+    raw_terms = [t for t in ([search_term] if search_term else []) + list(terms or []) if t]
+    search_terms = []
+    if raw_terms:
+        if regex:
+            expressions = raw_terms if match != 'any' else ['|'.join(f'(?:{t})' for t in raw_terms)]
+            for expression in expressions:
+                search_terms.append({'needles': [], 'regex': re.compile(expression.encode('utf-8'), re.IGNORECASE | re.MULTILINE), 'lowered_regex': False})
+        else:
+            needle_groups = [[t.encode('utf-8').lower()] for t in raw_terms] if match != 'any' \
+                else [minimal_needles([t.encode('utf-8').lower() for t in raw_terms])]
+            for needles in needle_groups:
+                search_terms.append({'needles': needles, 'regex': None, 'lowered_regex': False})
+    if level:
+        words = []
+        for name in level.upper().split(','):
+            name = name.strip()
+            if name not in LOG_LEVEL_WORDS:
+                raise ValueError(f"Nível de log desconhecido: {name}")
+            words.extend(w.encode('utf-8').lower() for w in LOG_LEVEL_WORDS[name])
+        # Palavra inteira: os needles localizam candidatos, a regex confirma os limites da palavra
+        word_regex = re.compile(rb'\b(?:' + b'|'.join(re.escape(w) for w in words) + rb')\b')
+        search_terms.append({'needles': minimal_needles(words), 'regex': word_regex, 'lowered_regex': True})
+    if not search_terms:
+        return None
+    return {'terms': search_terms}
+def get_log_search_args():
+    """Compilar a busca a partir da requisição (search, term, match, regex, level)"""
+    return compile_log_search(
+        request.args.get('search'),
+        request.args.getlist('term'),
+        match=request.args.get('match', 'all'),
+        regex=request.args.get('regex') in ('1', 'true'),
+        level=request.args.get('level')
+    )
+def log_term_matches(term, raw_line, lowered_line):
+    """Verificar um termo compilado contra uma linha (bytes original e em minúsculas)"""
+    if term['needles'] and not any(needle in lowered_line for needle in term['needles']):
+        return False
+    if term['regex'] is not None:
+        # Sem o terminador, a regex vê só a linha (com re.M, ^$ não casaria depois do '\n' final)
+        line = lowered_line if term['lowered_regex'] else raw_line
+        return term['regex'].search(line.rstrip(b'\r\n')) is not None
+    return True
+def log_search_matches(search, raw_line):
+    """Verificar uma linha (bytes) contra a busca compilada"""
+    lowered_line = raw_line.lower()
+    return all(log_term_matches(term, raw_line, lowered_line) for term in search['terms'])
+def iter_log_matches_reverse(log_file, search, end=None, block_size=LOG_SEARCH_BLOCK_SIZE):
+    """Percorrer do fim para o início apenas as linhas que casam com a busca, gerando (offset, linha)"""
+    terms = search['terms']
+    needle_terms = [t for t in terms if t['needles']]
+    with open(log_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        pos = size if end is None else min(end, size)
+        read_size = block_size
+        while pos > 0:
+            read_start = max(0, pos - read_size)
+            f.seek(read_start)
+            chunk = f.read(pos - read_start)
+            if len(chunk) < pos - read_start:
+                return  # Arquivo truncado durante a leitura (rotação): parar
+            block_offset = 0
+            if read_start > 0:
+                # Começar o bloco no início de uma linha; a linha cortada fica para o próximo bloco
+                newline = chunk.find(b'\n')
+                if newline == -1 or newline == len(chunk) - 1:
+                    read_size *= 2  # Linha maior que o bloco
+                    continue
+                block_offset = newline + 1
+            pos = read_start + block_offset
+            read_size = block_size
+            lowered = chunk.lower() if needle_terms else chunk
+            # Descartar o bloco inteiro se algum termo obrigatório não aparece nele
+            if any(all(lowered.find(n, block_offset) == -1 for n in t['needles']) for t in needle_terms):
+                continue
+            # O termo mais raro no bloco conduz a varredura; os demais são conferidos por linha
+            if len(needle_terms) > 1:
+                driver = min(needle_terms, key=lambda t: sum(lowered.count(n, block_offset) for n in t['needles']))
+            else:
+                driver = needle_terms[0] if needle_terms else terms[0]
+            others = [t for t in terms if t is not driver]
+            matched = []
+            p = block_offset
+            # Próxima ocorrência de cada needle: só é procurada de novo quando ficou para trás
+            # (senão um needle ausente faria cada linha encontrada varrer o resto do bloco)
+            next_hits = {n: lowered.find(n, p) for n in driver['needles']}
+            while True:
+                if driver['needles']:
+                    for n, h in next_hits.items():
+                        if h != -1 and h < p:
+                            next_hits[n] = lowered.find(n, p)
+                    hits = [h for h in next_hits.values() if h != -1]
+                    if not hits:
+                        break
+                    hit = min(hits)
+                else:
+                    m = driver['regex'].search(chunk, p)
+                    if m is None:
+                        break
+                    hit = m.start()
+                    if hit >= len(chunk):
+                        break  # Casamento vazio depois do último '\n'
+                line_start = chunk.rfind(b'\n', block_offset, hit) + 1 or block_offset
+                line_end = chunk.find(b'\n', hit)
+                line_end = len(chunk) if line_end == -1 else line_end + 1
+                raw = chunk[line_start:line_end]
+                lowered_line = lowered[line_start:line_end]
+                # A regex rodou sobre o bloco: confirmar na linha isolada (o casamento pode atravessar linhas)
+                if (driver['regex'] is None or log_term_matches(driver, raw, lowered_line)) \
+                        and all(log_term_matches(t, raw, lowered_line) for t in others):
+                    matched.append((read_start + line_start, raw))
+                p = line_end
+            for offset, raw in reversed(matched):
+                yield offset, raw.decode('utf-8', errors='replace')
+def parse_log_timestamp(line):
+    """Parser rápido de '[YYYY-MM-DD HH:MM:SS]' no início da linha; devolve YYYYMMDDHHMMSS como int (ou None)"""
+    if len(line) < 21 or line[0] != '[' or line[20] != ']' or line[5] != '-' or line[8] != '-' \
+            or line[11] != ' ' or line[14] != ':' or line[17] != ':':
+        return None
+    digits = line[1:5] + line[6:8] + line[9:11] + line[12:14] + line[15:17] + line[18:20]
+    if not digits.isdigit():
+        return None
+    return int(digits)
+def datetime_to_log_key(value):
+    """Converter datetime para a mesma chave inteira usada por parse_log_timestamp"""
+    return int(value.strftime('%Y%m%d%H%M%S'))
+def make_log_line_filter(search_term=None, start_date=None, end_date=None):
+    """Montar o filtro de linha por termo de busca e/ou data (None se não houver filtro)"""
+    if not search_term and not start_date and not end_date:
+        return None
+    search_lower = search_term.lower() if search_term else None
+    start_key = datetime_to_log_key(start_date) if start_date else None
+    end_key = datetime_to_log_key(end_date) if end_date else None
+    def line_filter(line):
+        # Filtrar por termo de busca
+        if search_lower and search_lower not in line.lower():
+            return False
         # Filtrar por data (se houver timestamp no formato [YYYY-MM-DD HH:MM:SS])
-        if start_date or end_date:
+        if start_key or end_key:
+            log_key = parse_log_timestamp(line)
+            # Se não conseguir parsear a data, incluir a linha
+            if log_key is not None:
+                if start_key and log_key < start_key:
+                    return False
+                if end_key and log_key > end_key:
+                    return False
+        return True
+    return line_filter
+# Índice esparso timestamp -> offset por arquivo de log, persistido e atualizado incrementalmente
+LOG_INDEX_INTERVAL = 256 * 1024  # Distância mínima (bytes) entre pontos do índice
+LOG_INDEX_PROBE_BYTES = 64 * 1024  # Bytes examinados após cada salto à procura de uma linha com timestamp
+_log_time_indexes = {}
+_log_time_indexes_lock = threading.Lock()
+def get_log_index_file(log_file):
+    """Caminho do arquivo de índice de um log"""
+    return os.path.join(LOG_INDEX_DIR, os.path.basename(log_file) + '.idx.json')
+def load_log_time_index(log_file):
+    """Carregar o índice do log (memória, depois disco)"""
+    index = _log_time_indexes.get(log_file)
+    if index is None:
+        try:
+            with open(get_log_index_file(log_file), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+    return index
+def save_log_time_index(log_file, index):
+    """Gravar o índice de forma atômica"""
+    index_file = get_log_index_file(log_file)
+    tmp_file = index_file + '.tmp'
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_file, index_file)
+    except OSError as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao gravar índice de {log_file}: {e}")
+def update_log_time_index(log_file):
+    """Estender o índice com a parte nova do arquivo (reconstrói se o arquivo foi truncado/substituído)"""
+    with _log_time_indexes_lock:
+        index = load_log_time_index(log_file)
+        with open(log_file, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if index is None or index['inode'] != st.st_ino or st.st_size < index['size']:
+                index = {'inode': st.st_ino, 'size': 0, 'next_offset': 0, 'checkpoints': []}
+            if st.st_size == index['size']:
+                _log_time_indexes[log_file] = index
+                return index
+            pos = index['next_offset']
+            checkpoints = index['checkpoints']
+            while pos < st.st_size:
+                f.seek(max(pos - 1, 0))
+                if pos > 0 and f.read(1) != b'\n':
+                    # Saltamos para o meio de uma linha: alinhar no início da próxima
+                    skipped = f.readline()
+                    if not skipped.endswith(b'\n'):
+                        break
+                    pos += len(skipped)
+                probed = 0
+                found = False
+                while probed < LOG_INDEX_PROBE_BYTES:
+                    raw = f.readline()
+                    if not raw.endswith(b'\n'):
+                        break
+                    key = parse_log_timestamp(raw[:21].decode('ascii', errors='replace'))
+                    if key is not None:
+                        if not checkpoints or key >= checkpoints[-1][0]:
+                            checkpoints.append([key, pos])
+                        found = True
+                        pos += LOG_INDEX_INTERVAL
+                        break
+                    pos += len(raw)
+                    probed += len(raw)
+                if not found and probed < LOG_INDEX_PROBE_BYTES:
+                    # Fim das linhas completas: continuar daqui na próxima atualização
+                    break
+            index['size'] = st.st_size
+            index['next_offset'] = pos
+        _log_time_indexes[log_file] = index
+        save_log_time_index(log_file, index)
+        return index
+def find_log_date_bounds(log_file, start_date=None, end_date=None):
+    """Usar o índice para obter a região (início, fim) em bytes que pode conter o intervalo de datas"""
+    index = update_log_time_index(log_file)
+    checkpoints = index['checkpoints']
+    keys = [c[0] for c in checkpoints]
+    region_start = 0
+    region_end = index['size']
+    if start_date:
+        # Último ponto estritamente anterior ao início da janela
+        i = bisect.bisect_left(keys, datetime_to_log_key(start_date))
+        if i > 0:
+            region_start = checkpoints[i - 1][1]
+    if end_date:
+        # Primeiro ponto posterior ao fim da janela
+        i = bisect.bisect_right(keys, datetime_to_log_key(end_date))
+        if i < len(checkpoints):
+            region_end = checkpoints[i][1]
+    return region_start, region_end
+def filter_log_lines(lines, search_term=None, start_date=None, end_date=None):
+    """Filtrar linhas de log por termo de busca e/ou data"""
+    line_filter = make_log_line_filter(search_term, start_date, end_date)
+    if line_filter is None:
+        return list(lines)
+    return [line for line in lines if line_filter(line)]
+# Acompanhamento de logs ao vivo: um leitor por arquivo compartilhado entre todos os assinantes
+LOG_FOLLOW_POLL_INTERVAL = 0.5  # Segundos entre verificações de crescimento do arquivo
+LOG_FOLLOW_MAX_READ = 1024 * 1024  # Bytes lidos no máximo por verificação
+LOG_STREAM_HEARTBEAT = 15  # Segundos entre keepalives enviados aos clientes SSE
+_log_followers = {}
+_log_followers_lock = threading.Lock()
+def subscribe_log(log_file):
+    """Assinar as novas linhas de um log; inicia o leitor do arquivo se necessário"""
+    subscriber = queue.Queue(maxsize=1000)
+    with _log_followers_lock:
+        follower = _log_followers.get(log_file)
+        if follower is None:
+            follower = {'subscribers': set()}
+            _log_followers[log_file] = follower
+            follower['subscribers'].add(subscriber)
+            thread = threading.Thread(target=log_follower_loop, args=(log_file, follower), name='log-follower', daemon=True)
+            thread.start()
+        else:
+            follower['subscribers'].add(subscriber)
+    return subscriber
+def unsubscribe_log(log_file, subscriber):
+    """Cancelar assinatura; o leitor encerra quando não houver mais assinantes"""
+    with _log_followers_lock:
+        follower = _log_followers.get(log_file)
+        if follower is not None:
+            follower['subscribers'].discard(subscriber)
+def publish_log_event(follower, event):
+    """Entregar um evento a todos os assinantes (assinantes lentos perdem eventos em vez de bloquear)"""
+    with _log_followers_lock:
+        subscribers = list(follower['subscribers'])
+    for subscriber in subscribers:
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            pass
+def read_log_chunk(log_file, offset, inode=None, size=None, aligned=True):
+    """Linhas completas a partir de offset (no máximo LOG_FOLLOW_MAX_READ bytes)
+
+    Devolve inode, início, dados (bytes), tamanho do arquivo e reset. Cursor inválido (ver is_log_cursor_stale)
+    recomeça do início do arquivo atual com reset=True; aligned=False pula a verificação do '\n' antes do offset
+    (leitura anterior cortada no meio de uma linha longa). Levanta FileNotFoundError se o log não existir.
+    """
+    with open(log_file, 'rb') as f:
+        st = os.fstat(f.fileno())
+        reset = is_log_cursor_stale(f, st, inode, size, (offset,) if aligned else ())
+        if reset:
+            offset = 0
+        f.seek(offset)
+        data = f.read(min(st.st_size - offset, LOG_FOLLOW_MAX_READ))
+    complete = data.rfind(b'\n') + 1
+    if complete:
+        data = data[:complete]
+    elif len(data) < LOG_FOLLOW_MAX_READ:
+        data = b''  # Linha ainda sendo escrita
+    # Sem '\n' no limite de leitura: linha maior que o limite, entregue como está
+    return {'inode': st.st_ino, 'start': offset, 'data': data, 'size': st.st_size, 'reset': reset}
+def log_follower_loop(log_file, follower):
+    """Leitor compartilhado: publica os bytes das linhas completas acrescentadas ao arquivo, com os offsets
+
+    Eventos: ('data', (inode, início, bytes)) e ('reset', inode) quando o arquivo é substituído ou truncado.
+    """
+    try:
+        st = os.stat(log_file)
+        inode, offset = st.st_ino, st.st_size
+    except FileNotFoundError:
+        inode, offset = None, 0
+    aligned = True
+    while True:
+        with _log_followers_lock:
+            if not follower['subscribers']:
+                del _log_followers[log_file]
+                return
+        try:
+            chunk = read_log_chunk(log_file, offset, inode, offset, aligned)
+        except FileNotFoundError:
+            chunk = None
+        if chunk is not None:
+            if chunk['reset']:
+                # Arquivo substituído ou truncado (ex.: servidor reiniciado): recomeçar do início
+                publish_log_event(follower, ('reset', chunk['inode']))
+            inode, offset = chunk['inode'], chunk['start']
+            if chunk['data']:
+                publish_log_event(follower, ('data', (inode, offset, chunk['data'])))
+                offset += len(chunk['data'])
+                aligned = chunk['data'].endswith(b'\n')
+                if offset < chunk['size']:
+                    continue
+        time.sleep(LOG_FOLLOW_POLL_INTERVAL)
+def get_server_log_filenames(server_id):
+    """Arquivos de log que podem ser lidos para um servidor"""
+    return [f'server_{server_id}.log', f'install_server_{server_id}.log', f'update_server_{server_id}.log']
+# Rotação de logs: segmentos compactados com gzip em segundo plano e política de retenção
+LOG_ARCHIVE_PATTERN = re.compile(r'^(?P<base>.+\.log)\.(?P<stamp>\d{8}-\d{6})(?:\.gz)?$')
+LOG_ROTATION_STATE_FILE = os.path.join(RUN_DIR, 'log_rotation.json')
+_log_rotation_lock = threading.Lock()
+_log_compress_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-compress')
+_log_compressing = set()
+_log_maintenance_thread = None
+def load_log_rotation_state():
+    """Momento da última rotação (ou da primeira observação) de cada log"""
+    try:
+        with open(LOG_ROTATION_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+def save_log_rotation_state(state):
+    """Gravar o estado de rotação de forma atômica"""
+    tmp_file = LOG_ROTATION_STATE_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, LOG_ROTATION_STATE_FILE)
+def get_log_archives(log_file):
+    """Arquivos rotacionados de um log, do mais recente para o mais antigo"""
+    directory, base = os.path.split(log_file)
+    archives = []
+    for name in os.listdir(directory):
+        m = LOG_ARCHIVE_PATTERN.match(name)
+        if m and m.group('base') == base:
+            archives.append((m.group('stamp'), os.path.join(directory, name)))
+    archives.sort(reverse=True)
+    return [path for _, path in archives]
+def rotate_log_file(log_file, copytruncate=True):
+    """Rotacionar um log para um segmento datado e agendar sua compactação
+
+    copytruncate mantém o mesmo arquivo (escritores com O_APPEND continuam funcionando);
+    sem copytruncate o arquivo é apenas renomeado (usar quando não há escritores).
+    """
+    with _log_rotation_lock:
+        if not os.path.exists(log_file) or os.path.getsize(log_file) == 0:
+            return None
+        segment = f"{log_file}.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        if os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            return None
+        if copytruncate:
+            shutil.copyfile(log_file, segment)
+            with open(log_file, 'r+b') as f:
+                f.truncate(0)
+        else:
+            os.rename(log_file, segment)
+        state = load_log_rotation_state()
+        state[os.path.basename(log_file)] = time.time()
+        save_log_rotation_state(state)
+    schedule_log_compression(segment)
+    return segment
+def schedule_log_compression(segment):
+    """Agendar a compactação de um segmento (uma única vez por segmento)"""
+    with _log_rotation_lock:
+        if segment in _log_compressing:
+            return
+        _log_compressing.add(segment)
+    _log_compress_executor.submit(compress_log_segment, segment)
+def compress_log_segment(segment):
+    """Compactar um segmento com gzip e aplicar a retenção do log de origem"""
+    try:
+        tmp_file = segment + '.gz.tmp'
+        with open(segment, 'rb') as src, gzip.open(tmp_file, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, LOG_SEARCH_BLOCK_SIZE)
+        os.replace(tmp_file, segment + '.gz')
+        os.remove(segment)
+        base = LOG_ARCHIVE_PATTERN.match(os.path.basename(segment)).group('base')
+        apply_log_retention(os.path.join(os.path.dirname(segment), base))
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao compactar {segment}: {e}")
+    finally:
+        with _log_rotation_lock:
+            _log_compressing.discard(segment)
+def apply_log_retention(log_file):
+    """Remover arquivos além da quantidade ou da idade máximas"""
+    keep = int(PANEL_SETTINGS['log_retention_count'])
+    oldest = datetime.now().timestamp() - float(PANEL_SETTINGS['log_retention_days']) * 86400
+    for i, archive in enumerate(get_log_archives(log_file)):
+        stamp = LOG_ARCHIVE_PATTERN.match(os.path.basename(archive)).group('stamp')
+        if i >= keep or datetime.strptime(stamp, '%Y%m%d-%H%M%S').timestamp() < oldest:
             try:
-                # Extrair timestamp da linha de log
-                if line.startswith('[') and ']' in line:
-                    timestamp_str = line[1:line.find(']')]
-                    log_timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-                    
-                    if start_date and log_timestamp < start_date:
-                        continue
-                    if end_date and log_timestamp > end_date:
-                        continue
-            except ValueError:
-                # Se não conseguir parsear a data, incluir a linha
+                os.remove(archive)
+            except OSError:
                 pass
-        
-        filtered_lines.append(line)
-    
-    return filtered_lines
+def check_log_rotation():
+    """Rotacionar logs grandes ou antigos e compactar segmentos pendentes"""
+    max_bytes = int(PANEL_SETTINGS['log_rotate_max_bytes'])
+    max_age = float(PANEL_SETTINGS['log_rotate_max_age_days']) * 86400
+    state = load_log_rotation_state()
+    state_changed = False
+    now = time.time()
+    for name in os.listdir(LOGS_DIR):
+        path = os.path.join(LOGS_DIR, name)
+        m = LOG_ARCHIVE_PATTERN.match(name)
+        if m and not name.endswith('.gz'):
+            # Segmento deixado sem compactar (ex.: painel reiniciado durante a compactação)
+            schedule_log_compression(path)
+            continue
+        if not name.endswith('.log') or not os.path.isfile(path):
+            continue
+        if name not in state:
+            state[name] = now
+            state_changed = True
+        size = os.path.getsize(path)
+        if size > 0 and (size >= max_bytes or now - state[name] >= max_age):
+            rotate_log_file(path)
+            state = load_log_rotation_state()
+    if state_changed:
+        save_log_rotation_state(state)
+def log_maintenance_loop():
+    """Loop de manutenção dos logs (rotação/retenção)"""
+    while True:
+        try:
+            check_log_rotation()
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro na rotação de logs: {e}")
+        time.sleep(max(10, float(PANEL_SETTINGS['log_rotate_check_interval'])))
+def start_log_maintenance():
+    """Iniciar a thread de manutenção dos logs (uma única vez)"""
+    global _log_maintenance_thread
+    with _log_rotation_lock:
+        if _log_maintenance_thread is not None and _log_maintenance_thread.is_alive():
+            return
+        _log_maintenance_thread = threading.Thread(target=log_maintenance_loop, name='log-maintenance', daemon=True)
+        _log_maintenance_thread.start()
+def tail_archive_lines(archive, lines_limit, search=None, line_filter=None):
+    """Últimas N linhas (filtradas) de um arquivo rotacionado, em memória constante"""
+    window = deque(maxlen=max(lines_limit, 0))
+    if lines_limit <= 0:
+        return []
+    opener = gzip.open if archive.endswith('.gz') else open
+    with opener(archive, 'rb') as f:
+        for raw in f:
+            if search is not None and not log_search_matches(search, raw):
+                continue
+            line = raw.decode('utf-8', errors='replace')
+            if line_filter is None or line_filter(line):
+                window.append(line)
+    return list(window)
+def extend_window_with_archives(log_file, window, lines_limit, search=None, line_filter=None, start_date=None):
+    """Completar uma janela do fim do log com linhas dos arquivos rotacionados (como um único fluxo)"""
+    searched = []
+    for archive in get_log_archives(log_file):
+        missing = lines_limit - len(window['lines'])
+        if missing <= 0:
+            break
+        stamp = LOG_ARCHIVE_PATTERN.match(os.path.basename(archive)).group('stamp')
+        if start_date and datetime.strptime(stamp, '%Y%m%d-%H%M%S') < start_date:
+            # Arquivo rotacionado antes do início da janela: ele e os anteriores são mais antigos
+            break
+        window['lines'] = tail_archive_lines(archive, missing, search, line_filter) + window['lines']
+        searched.append(os.path.basename(archive))
+    window['archives'] = searched
+    return window
+def is_allowed_log_file(server_id, filename):
+    """Validar nome de log (atual ou rotacionado) de um servidor"""
+    if filename in get_server_log_filenames(server_id):
+        return True
+    m = LOG_ARCHIVE_PATTERN.match(filename)
+    return bool(m) and m.group('base') in get_server_log_filenames(server_id)
 def get_available_log_files(server_id):
     """Obter lista de arquivos de log disponíveis para um servidor"""
     log_files = []
@@ -631,16 +3319,70 @@ def get_available_log_files(server_id):
             'type': 'update'
         })
     
+    # Logs rotacionados (compactados)
+    labels = {f'server_{server_id}.log': ('Execução', 'main'),
+              f'install_server_{server_id}.log': ('Instalação', 'install'),
+              f'update_server_{server_id}.log': ('Atualização', 'update')}
+    for base, (label, log_type) in labels.items():
+        for archive in get_log_archives(os.path.join(LOGS_DIR, base)):
+            stamp = LOG_ARCHIVE_PATTERN.match(os.path.basename(archive)).group('stamp')
+            rotated_at = datetime.strptime(stamp, '%Y%m%d-%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
+            log_files.append({
+                'name': f'{label} (até {rotated_at})',
+                'file': os.path.basename(archive),
+                'type': f'{log_type}_archive'
+            })
+    
     return log_files
+# Rotas longas (SSE, buscas em logs, históricos) têm vagas limitadas por processo para não ocupar
+# todas as threads do servidor: sem vaga dentro do prazo, a resposta é 503 e as rotas de status seguem livres
+REQUEST_SLOT_SETTINGS = {'stream': 'max_log_streams', 'heavy': 'heavy_request_slots'}
+_request_slots = {}
+_request_slots_lock = threading.Lock()
+def get_request_slots(kind):
+    with _request_slots_lock:
+        slots = _request_slots.get(kind)
+        if slots is None:
+            slots = _request_slots[kind] = threading.BoundedSemaphore(max(1, int(PANEL_SETTINGS[REQUEST_SLOT_SETTINGS[kind]])))
+        return slots
+def limit_concurrency(kind, when=None):
+    """Decorador: ocupar uma vaga do tipo `kind` durante a requisição (ou o stream); when() decide se a requisição é longa"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if when is not None and not when():
+                return view(*args, **kwargs)
+            slots = get_request_slots(kind)
+            if not slots.acquire(timeout=float(PANEL_SETTINGS['heavy_request_wait'])):
+                response = jsonify({'status': 'error', 'message': 'Painel ocupado com outras consultas longas, tente novamente em instantes'})
+                response.status_code = 503
+                response.headers['Retry-After'] = '5'
+                return response
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                slots.release()
+                raise
+            if response.is_streamed:
+                # Stream: a vaga só é liberada quando o cliente desconecta
+                response.call_on_close(slots.release)
+            else:
+                slots.release()
+            return response
+        return wrapper
+    return decorator
+def is_heavy_log_request():
+    """Busca, filtro de data ou arquivos rotacionados (o tail simples é barato e não ocupa vaga)"""
+    args = request.args
+    return any(args.get(key) for key in ('search', 'term', 'level', 'start_date', 'end_date', 'archives')) \
+        or bool(LOG_ARCHIVE_PATTERN.match(args.get('file') or ''))
+@app.errorhandler(PanelLeaderUnavailable)
+def panel_leader_unavailable(e):
+    return jsonify({'status': 'error', 'message': str(e)}), 503
 # Rotas web
 @app.route('/')
 def index():
-    servers_data = load_servers()
-    server_status = []
-    for server in servers_data['servers']:
-        metrics = get_server_metrics(server)
-        server_info = {**server, **metrics}
-        server_status.append(server_info)
+    server_status, _, snapshot_age = get_status_snapshot()
     total_servers = len(server_status)
     installed_servers = len([s for s in server_status if s['status'] != 'not_installed'])
     online_servers = len([s for s in server_status if s['status'] == 'online'])
@@ -650,26 +3392,31 @@ def index():
         'installed_servers': installed_servers,
         'online_servers': online_servers,
         'offline_servers': installed_servers - online_servers,
-        'total_players': total_players
+        'total_players': total_players,
+        'snapshot_age': snapshot_age
     }
-    return render_template('index.html', servers=server_status, stats=stats, server_ip=request.host.split(':')[0])
+    with timed_stage('render:index.html'):
+        return render_template('index.html', servers=server_status, stats=stats, server_ip=request.host.split(':')[0])
 @app.route('/server/<int:server_id>')
 def server_detail(server_id):
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
-    if not server:
-        return "Servidor não encontrado", 404
-    metrics = get_server_metrics(server)
-    server_info = {**server, **metrics}
+    _, status_by_id, snapshot_age = get_status_snapshot()
+    server_info = status_by_id.get(server_id)
+    if not server_info:
+        # Servidor adicionado após a última coleta
+        server = get_server(server_id)
+        if not server:
+            return "Servidor não encontrado", 404
+        server_info = {**server, **pending_server_metrics()}
+    server_info = {**server_info, 'snapshot_age': snapshot_age}
     
     # Obter lista de arquivos de log disponíveis
     log_files = get_available_log_files(server_id)
     
-    return render_template('server_detail.html', server=server_info, log_files=log_files)
+    with timed_stage('render:server_detail.html'):
+        return render_template('server_detail.html', server=server_info, log_files=log_files)
 @app.route('/server/<int:server_id>/config')
 def server_config(server_id):
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         return "Servidor não encontrado", 404
     # Carregar configurações existentes ou usar padrão
@@ -691,36 +3438,228 @@ def server_config(server_id):
             'PlayerResistanceMultiplier': 1.0,
             'DinoResistanceMultiplier': 1.0
         }
-    return render_template('server_config.html', server=server, config=config_settings)
+    with timed_stage('render:server_config.html'):
+        return render_template('server_config.html', server=server, config=config_settings)
 @app.route('/api/servers')
 def api_servers():
-    servers_data = load_servers()
-    status_list = []
-    for server in servers_data['servers']:
-        metrics = get_server_metrics(server)
-        status_list.append({**server, **metrics})
-    return jsonify(status_list)
+    server_status, _, snapshot_age = get_status_snapshot()
+    status_list = [{**s, 'snapshot_age': snapshot_age} for s in server_status]
+    response = jsonify(status_list)
+    response.headers['X-Snapshot-Age'] = str(snapshot_age)
+    return response
+# Exposição de métricas para o Prometheus: apenas valores já coletados, nenhuma E/S por scrape
+def format_metric_labels(labels):
+    """Formatar {chave: valor} como {chave="valor",...} com os escapes do formato de texto"""
+    if not labels:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+               for k, v in labels.items())
+    return '{' + ','.join(escaped) + '}'
+def render_metric(lines, name, metric_type, help_text, samples):
+    """Acrescentar uma métrica (HELP, TYPE e amostras [(labels, valor)])"""
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {metric_type}')
+    for labels, value in samples:
+        lines.append(f'{name}{format_metric_labels(labels)} {value}')
+def render_histograms(lines, snapshot):
+    """Acrescentar os histogramas (buckets cumulativos, _sum e _count)"""
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, series in sorted(snapshot[name].items()):
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(buckets, series['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_metric_labels({**labels, "le": bound})} {cumulative}')
+            lines.append(f'{name}_bucket{format_metric_labels({**labels, "le": "+Inf"})} {series["count"]}')
+            lines.append(f'{name}_sum{format_metric_labels(labels)} {round(series["sum"], 6)}')
+            lines.append(f'{name}_count{format_metric_labels(labels)} {series["count"]}')
+@app.before_request
+def start_request_timer():
+    request.environ['ark_panel.started'] = time.time()
+@app.after_request
+def observe_request_latency(response):
+    started = request.environ.get('ark_panel.started')
+    if started is not None and request.endpoint:
+        observe_histogram('ark_panel_http_request_seconds', time.time() - started, {'endpoint': request.endpoint})
+    return response
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas no formato de exposição de texto do Prometheus (só estado em memória: snapshot do coletor e histogramas)"""
+    start_status_collector()
+    if not _panel_role['leader']:
+        # Vários processos: quem responde é sempre o líder, senão os contadores pulariam entre os workers
+        try:
+            text = call_panel_leader('metrics')
+        except PanelLeaderUnavailable as e:
+            return Response(f'# {e}\n', status=503, content_type='text/plain; charset=utf-8')
+    else:
+        text = render_prometheus_metrics()
+    return Response(text, content_type='text/plain; version=0.0.4; charset=utf-8')
+def render_prometheus_metrics():
+    """Texto de /metrics: gauges do snapshot e histogramas somados de todos os processos do painel"""
+    servers, _, age = get_status_snapshot()
+    now = time.time()
+    lines = []
+    statuses = ('online', 'offline', 'not_installed', 'unknown', 'error')
+    render_metric(lines, 'ark_server_up', 'gauge', 'Servidor em execução (1) ou não (0)',
+                  [({'server_id': s['id'], 'map': s['map']}, 1 if s['status'] == 'online' else 0) for s in servers])
+    render_metric(lines, 'ark_server_status', 'gauge', 'Estado atual do servidor (um por estado)',
+                  [({'server_id': s['id'], 'status': st}, 1 if s['status'] == st else 0) for s in servers for st in statuses])
+    render_metric(lines, 'ark_server_players', 'gauge', 'Jogadores conectados (A2S)',
+                  [({'server_id': s['id']}, s['players']) for s in servers])
+    render_metric(lines, 'ark_server_max_players', 'gauge', 'Máximo de jogadores (A2S)',
+                  [({'server_id': s['id']}, s['max_players']) for s in servers])
+    render_metric(lines, 'ark_server_cpu_percent', 'gauge', 'Uso de CPU do processo do servidor',
+                  [({'server_id': s['id']}, s['cpu_percent']) for s in servers])
+    render_metric(lines, 'ark_server_resident_memory_bytes', 'gauge', 'Memória residente (RSS) do processo do servidor',
+                  [({'server_id': s['id']}, int(s['memory_mb'] * 1024 * 1024)) for s in servers])
+    render_metric(lines, 'ark_server_uptime_seconds', 'gauge', 'Tempo desde o início do processo do servidor',
+                  [({'server_id': s['id']}, round(now - s['started_at'], 1)) for s in servers if s.get('started_at')])
+    render_metric(lines, 'ark_server_build_info', 'gauge', 'Build instalada (appmanifest)',
+                  [({'server_id': s['id'], 'buildid': s['build']['buildid'], 'branch': s['build']['branch']}, 1)
+                   for s in servers if s.get('build')])
+    with _status_lock:
+        duration = _status_snapshot['duration']
+    render_metric(lines, 'ark_panel_status_snapshot_age_seconds', 'gauge', 'Idade do snapshot de status',
+                  [({}, age if age is not None else 'NaN')])
+    render_metric(lines, 'ark_panel_status_collection_last_seconds', 'gauge', 'Duração da última coleta de status',
+                  [({}, round(duration, 6))])
+    cache = get_a2s_cache_stats()
+    render_metric(lines, 'ark_panel_a2s_cache_lookups_total', 'counter', 'Consultas ao cache A2S por resultado',
+                  [({'result': 'hit'}, cache['hits']), ({'result': 'negative_hit'}, cache['negative_hits']),
+                   ({'result': 'miss'}, cache['misses'])])
+    writer = get_log_writer_stats()
+    render_metric(lines, 'ark_panel_log_writer_queue_depth', 'gauge', 'Linhas aguardando o escritor de logs',
+                  [({}, writer['queue_depth'])])
+    render_metric(lines, 'ark_panel_log_writer_bytes_total', 'counter', 'Bytes gravados pelo escritor de logs',
+                  [({}, writer['bytes_written'])])
+    job_counts = {}
+    for job in list_jobs():
+        job_counts[job['status']] = job_counts.get(job['status'], 0) + 1
+    render_metric(lines, 'ark_panel_jobs', 'gauge', 'Tarefas por estado',
+                  [({'status': st}, job_counts.get(st, 0)) for st in ('queued', 'running', 'succeeded', 'failed')])
+    render_histograms(lines, merge_published_histograms())
+    return '\n'.join(lines) + '\n'
+@app.route('/api/panel/stats')
+def api_panel_stats():
+    """Estatísticas internas do painel (coletor de status, cache A2S, escritor de logs)"""
+    with _status_lock:
+        updated_at = _status_snapshot['updated_at']
+        duration = _status_snapshot['duration']
+    return jsonify({
+        'status_snapshot': {
+            'age': round(time.time() - updated_at, 1) if updated_at else None,
+            'collection_duration': round(duration, 3)
+        },
+        'a2s_cache': get_a2s_cache_stats(),
+        'log_writer': get_log_writer_stats(),
+        'server_config_errors': [e['message'] for e in get_server_config_errors()],
+        'process': {'pid': os.getpid(), 'role': 'leader' if _panel_role['leader'] else 'follower',
+                    'server_mode': PANEL_SETTINGS['server_mode']},
+        'timings': get_timing_summary()
+    })
+# Profiler por amostragem (somente administradores)
+_profile_lock = threading.Lock()
+def check_admin_request():
+    """Autorizar rotas administrativas: token configurado em admin_token; sem token, negar
+
+    admin_allow_localhost libera requisições de 127.0.0.1/::1 sem token (só quando o painel não está atrás de um proxy).
+    """
+    token = PANEL_SETTINGS.get('admin_token') or ''
+    if token:
+        supplied = request.headers.get('X-Admin-Token') or ''
+        if not supplied and request.headers.get('Authorization', '').startswith('Bearer '):
+            supplied = request.headers['Authorization'][len('Bearer '):]
+        return hmac.compare_digest(supplied.encode(), token.encode())
+    return bool(PANEL_SETTINGS.get('admin_allow_localhost')) and request.remote_addr in ('127.0.0.1', '::1')
+def format_profile_frame(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+def sample_stacks(duration, interval, thread_filter=None):
+    """Amostrar as pilhas de todas as threads via sys._current_frames() e agregar em pilhas colapsadas"""
+    own_ident = threading.get_ident()
+    counts = {}
+    samples = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            thread_name = names.get(ident, f'thread-{ident}')
+            if thread_filter and thread_filter not in thread_name:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(format_profile_frame(frame))
+                frame = frame.f_back
+            stack.append(thread_name)
+            key = ';'.join(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+        samples += 1
+        time.sleep(interval)
+    return counts, samples
+@app.route('/api/panel/profile')
+def api_panel_profile():
+    """Amostrar o processo por N segundos e devolver pilhas colapsadas (formato do flamegraph.pl/speedscope)
+
+    Parâmetros: seconds (padrão 10), interval_ms (padrão 10), thread (filtro por nome da thread).
+    """
+    if not check_admin_request():
+        return jsonify({'status': 'error', 'message': 'Acesso restrito a administradores (configure admin_token)'}), 403
+    max_seconds = float(PANEL_SETTINGS['profile_max_seconds'])
+    seconds = min(max(request.args.get('seconds', 10, type=float), 0.1), max_seconds)
+    interval = min(max(request.args.get('interval_ms', 10, type=float), 1), 1000) / 1000
+    if not _profile_lock.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'Já existe uma sessão de profiling em andamento'}), 409
+    try:
+        counts, samples = sample_stacks(seconds, interval, request.args.get('thread'))
+    finally:
+        _profile_lock.release()
+    lines = [f'{stack} {count}' for stack, count in sorted(counts.items(), key=lambda item: -item[1])]
+    response = Response('\n'.join(lines) + '\n', content_type='text/plain; charset=utf-8')
+    response.headers['X-Profile-Samples'] = str(samples)
+    response.headers['X-Profile-Seconds'] = str(seconds)
+    return response
+@app.route('/api/server/<int:server_id>/metrics/history')
+@limit_concurrency('heavy')
+def server_metrics_history(server_id):
+    """Histórico de CPU, memória e jogadores (from/to em timestamp Unix ou AAAA-MM-DD[THH:MM], step em segundos)"""
+    if not get_server(server_id):
+        return jsonify({'status': 'error', 'message': 'Servidor não encontrado'}), 404
+    try:
+        end = parse_history_time(request.args.get('to'), int(time.time()))
+        start = parse_history_time(request.args.get('from'), end - 86400)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Parâmetros from/to inválidos'}), 400
+    if start >= end:
+        return jsonify({'status': 'error', 'message': 'from deve ser anterior a to'}), 400
+    try:
+        history = query_metrics_history(server_id, start, end, request.args.get('step', type=int))
+    except sqlite3.Error as e:
+        # Banco bloqueado ou corrompido: erro em JSON como nas demais rotas da API
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Erro ao consultar histórico de métricas: {e}")
+        return jsonify({'status': 'error', 'message': f'Histórico de métricas indisponível: {e}'}), 503
+    return jsonify({'status': 'success', 'server_id': server_id, **history})
 @app.route('/api/server/<int:server_id>/logs')
+@limit_concurrency('heavy', when=is_heavy_log_request)
 def get_server_logs(server_id):
     """Endpoint para obter logs do servidor com filtros"""
     log_file = os.path.join(LOGS_DIR, f'server_{server_id}.log')
     
     # Parâmetros de filtro
-    search_term = request.args.get('search')
+    try:
+        search = get_log_search_args()
+    except (re.error, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Busca inválida: {str(e)}'})
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
-    lines_limit = request.args.get('lines', 500)  # Padrão: 500 linhas
-    
-    try:
-        lines_limit = int(lines_limit)
-    except ValueError:
-        lines_limit = 500
+    cursor_args = get_log_cursor_args(500)  # Padrão: 500 linhas
     
     if os.path.exists(log_file):
         try:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()
-                
             # Aplicar filtros
             start_date = None
             end_date = None
@@ -737,30 +3676,141 @@ def get_server_logs(server_id):
                 except ValueError:
                     pass
             
-            filtered_lines = filter_log_lines(lines, search_term, start_date, end_date)
-            
-            # Limitar número de linhas
-            if len(filtered_lines) > lines_limit:
-                filtered_lines = filtered_lines[-lines_limit:]
+            # Ler do fim do arquivo (ou a partir do cursor) apenas as linhas que passam nos filtros
+            line_filter = make_log_line_filter(None, start_date, end_date)
+            # Com filtro de data, o índice de timestamps limita a leitura à região da janela
+            bounds = find_log_date_bounds(log_file, start_date, end_date) if (start_date or end_date) else None
+            window = read_log_window(log_file, line_filter=line_filter, bounds=bounds, search=search, **cursor_args)
+            # archives=1: continuar a busca nos arquivos rotacionados quando o log atual não bastar
+            if request.args.get('archives') in ('1', 'true') and cursor_args['after'] is None:
+                extend_window_with_archives(log_file, window, cursor_args['lines_limit'], search, line_filter, start_date)
             
-            log_content = ''.join(filtered_lines)
-            return jsonify({'status': 'success', 'logs': log_content})
+            log_content = ''.join(window['lines'])
+            return jsonify({'status': 'success', 'logs': log_content, 'cursor': window['cursor'], 'reset': window['reset'],
+                            'archives': window.get('archives', [])})
         except Exception as e:
             return jsonify({'status': 'error', 'message': f'Erro ao ler logs: {str(e)}'})
     else:
         return jsonify({'status': 'error', 'message': 'Arquivo de log não encontrado'})
+def get_log_stream_position():
+    """Posição de retomada do SSE: cabeçalho Last-Event-ID ("inode:offset", enviado pelo EventSource ao
+    reconectar) ou o cursor de uma leitura anterior (after, inode, size); None para começar do fim"""
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    inode, _, offset = last_event_id.partition(':')
+    if inode.isdigit() and offset.isdigit():
+        return {'inode': int(inode), 'after': int(offset), 'size': None}
+    after = request.args.get('after', type=int)
+    if after is None or after < 0:
+        return None
+    return {'inode': request.args.get('inode', type=int), 'after': after, 'size': request.args.get('size', type=int)}
+def new_log_stream(log_file, search, resume):
+    """Posição de um cliente SSE no log: cada byte é entregue uma única vez, na ordem, com "id: inode:offset"
+
+    Os eventos do leitor compartilhado podem repetir trechos já enviados (lidos do arquivo durante a retomada)
+    ou chegar com um buraco (assinante lento perdeu eventos): o trecho repetido é cortado e o buraco lido do arquivo.
+    """
+    stream = {'log_file': log_file, 'search': search, 'inode': None, 'position': 0, 'size': None}
+    if resume is not None:
+        stream.update(inode=resume['inode'], position=resume['after'], size=resume['size'])
+    else:
+        try:
+            st = os.stat(log_file)
+            stream.update(inode=st.st_ino, position=st.st_size)
+        except FileNotFoundError:
+            pass
+    return stream
+def log_stream_event_id(stream):
+    return f"id: {stream['inode'] or 0}:{stream['position']}\n"
+def log_stream_catch_up(stream):
+    """Enviar o que está no arquivo entre a posição do cliente e o fim"""
+    while True:
+        try:
+            chunk = read_log_chunk(stream['log_file'], stream['position'], stream['inode'], stream['size'])
+        except FileNotFoundError:
+            return
+        stream['size'] = None
+        if chunk['reset']:
+            yield from log_stream_reset(stream, chunk['inode'])
+        stream['inode'] = chunk['inode']
+        if not chunk['data']:
+            return
+        yield from log_stream_send(stream, chunk['data'])
+        if stream['position'] >= chunk['size']:
+            return
+def log_stream_reset(stream, inode):
+    """Arquivo substituído ou truncado: o cliente recarrega e a entrega recomeça do início"""
+    stream.update(inode=inode, position=0)
+    yield log_stream_event_id(stream) + 'event: reset\ndata: {}\n\n'
+def log_stream_deliver(stream, inode, start, data):
+    """Entregar um evento do leitor compartilhado a partir da posição do cliente"""
+    if stream['inode'] is None:
+        stream['inode'] = inode  # Log criado depois da conexão
+    elif inode != stream['inode']:
+        yield from log_stream_reset(stream, inode)
+    if start > stream['position']:
+        yield from log_stream_catch_up(stream)
+        if inode != stream['inode']:
+            return
+    position = stream['position']
+    if start + len(data) > position:
+        yield from log_stream_send(stream, data[position - start:] if start < position else data)
+def log_stream_send(stream, data):
+    stream['position'] += len(data)
+    search = stream['search']
+    lines = [raw.decode('utf-8', errors='replace') for raw in data.splitlines(keepends=True)
+             if search is None or log_search_matches(search, raw)]
+    if lines:
+        yield log_stream_event_id(stream) + f"data: {json.dumps(''.join(lines))}\n\n"
+    else:
+        # Nada passou pelo filtro: só avançar a posição de retomada
+        yield log_stream_event_id(stream) + '\n'
+@app.route('/api/server/<int:server_id>/logs/stream')
+@limit_concurrency('stream')
+def stream_server_logs(server_id):
+    """Endpoint SSE que envia apenas as linhas novas de um log à medida que são escritas"""
+    filename = request.args.get('file', f'server_{server_id}.log')
+    if filename not in get_server_log_filenames(server_id):
+        return jsonify({'status': 'error', 'message': 'Arquivo não permitido'}), 400
+    log_file = os.path.join(LOGS_DIR, filename)
+    try:
+        search = get_log_search_args()
+    except (re.error, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Busca inválida: {str(e)}'}), 400
+    resume = get_log_stream_position()
+    def generate():
+        subscriber = subscribe_log(log_file)
+        try:
+            yield 'retry: 3000\n\n'
+            stream = new_log_stream(log_file, search, resume)
+            yield from log_stream_catch_up(stream)
+            yield log_stream_event_id(stream) + '\n'  # Posição de retomada mesmo antes da primeira linha
+            while True:
+                try:
+                    event, payload = subscriber.get(timeout=LOG_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    # Keepalive também detecta clientes desconectados
+                    yield ': keepalive\n\n'
+                    continue
+                if event == 'reset':
+                    yield from log_stream_reset(stream, payload)
+                else:
+                    yield from log_stream_deliver(stream, *payload)
+        finally:
+            unsubscribe_log(log_file, subscriber)
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 @app.route('/api/server/<int:server_id>/install_logs')
 def get_server_install_logs(server_id):
     """Endpoint para obter logs específicos de instalação de um servidor"""
     log_file = os.path.join(LOGS_DIR, f'install_server_{server_id}.log')
     if os.path.exists(log_file):
         try:
-            with open(log_file, 'r') as f:
-                # Lê as últimas 500 linhas para mais contexto
-                lines = f.readlines()
-                last_lines = lines[-500:] if len(lines) > 500 else lines
-                log_content = ''.join(last_lines)
-            return jsonify({'status': 'success', 'logs': log_content})
+            # Lê as últimas 500 linhas para mais contexto (ou a janela pedida pelo cursor)
+            window = read_log_window(log_file, **get_log_cursor_args(500))
+            log_content = ''.join(window['lines'])
+            return jsonify({'status': 'success', 'logs': log_content, 'cursor': window['cursor'], 'reset': window['reset']})
         except Exception as e:
             return jsonify({'status': 'error', 'message': f'Erro ao ler logs de instalação: {str(e)}'})
     else:
@@ -771,17 +3821,16 @@ def get_server_update_logs(server_id):
     log_file = os.path.join(LOGS_DIR, f'update_server_{server_id}.log')
     if os.path.exists(log_file):
         try:
-            with open(log_file, 'r') as f:
-                # Lê as últimas 500 linhas para mais contexto
-                lines = f.readlines()
-                last_lines = lines[-500:] if len(lines) > 500 else lines
-                log_content = ''.join(last_lines)
-            return jsonify({'status': 'success', 'logs': log_content})
+            # Lê as últimas 500 linhas para mais contexto (ou a janela pedida pelo cursor)
+            window = read_log_window(log_file, **get_log_cursor_args(500))
+            log_content = ''.join(window['lines'])
+            return jsonify({'status': 'success', 'logs': log_content, 'cursor': window['cursor'], 'reset': window['reset']})
         except Exception as e:
             return jsonify({'status': 'error', 'message': f'Erro ao ler logs de atualização: {str(e)}'})
     else:
         return jsonify({'status': 'error', 'message': 'Arquivo de log de atualização não encontrado'})
 @app.route('/api/server/<int:server_id>/specific_log')
+@limit_concurrency('heavy', when=is_heavy_log_request)
 def get_specific_log(server_id):
     """Endpoint para obter conteúdo de um arquivo de log específico"""
     filename = request.args.get('file')
@@ -789,21 +3838,25 @@ def get_specific_log(server_id):
         return jsonify({'status': 'error', 'message': 'Nome do arquivo não especificado'})
     
     # Validar nome do arquivo para segurança
-    allowed_files = [f'server_{server_id}.log', f'install_server_{server_id}.log', f'update_server_{server_id}.log']
-    
-    if filename not in allowed_files:
+    if not is_allowed_log_file(server_id, filename):
         return jsonify({'status': 'error', 'message': 'Arquivo não permitido'})
     
     log_file = os.path.join(LOGS_DIR, filename)
     if os.path.exists(log_file):
         try:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()
-                # Limitar a 1000 linhas para performance
-                if len(lines) > 1000:
-                    lines = lines[-1000:]
-                log_content = ''.join(lines)
-            return jsonify({'status': 'success', 'logs': log_content, 'filename': filename})
+            if LOG_ARCHIVE_PATTERN.match(filename):
+                # Arquivo rotacionado (gzip): sem cursor, apenas as últimas linhas
+                lines = tail_archive_lines(log_file, request.args.get('lines', 1000, type=int), get_log_search_args())
+                return jsonify({'status': 'success', 'logs': ''.join(lines), 'filename': filename})
+            # Limitar a 1000 linhas para performance (ou a janela pedida pelo cursor)
+            search = get_log_search_args()
+            cursor_args = get_log_cursor_args(1000)
+            window = read_log_window(log_file, search=search, **cursor_args)
+            if request.args.get('archives') in ('1', 'true') and cursor_args['after'] is None:
+                extend_window_with_archives(log_file, window, cursor_args['lines_limit'], search)
+            log_content = ''.join(window['lines'])
+            return jsonify({'status': 'success', 'logs': log_content, 'filename': filename, 'cursor': window['cursor'], 'reset': window['reset'],
+                            'archives': window.get('archives', [])})
         except Exception as e:
             return jsonify({'status': 'error', 'message': f'Erro ao ler log: {str(e)}'})
     else:
@@ -813,20 +3866,23 @@ def get_installation_logs():
     log_file = os.path.join(LOGS_DIR, 'installation.log')
     if os.path.exists(log_file):
         try:
-            with open(log_file, 'r') as f:
-                # Lê as últimas 500 linhas para mais contexto
-                lines = f.readlines()
-                last_lines = lines[-500:] if len(lines) > 500 else lines
-                log_content = ''.join(last_lines)
-            return jsonify({'status': 'success', 'logs': log_content})
+            # Lê as últimas 500 linhas para mais contexto (ou a janela pedida pelo cursor)
+            window = read_log_window(log_file, **get_log_cursor_args(500))
+            log_content = ''.join(window['lines'])
+            return jsonify({'status': 'success', 'logs': log_content, 'cursor': window['cursor'], 'reset': window['reset']})
         except Exception as e:
             return jsonify({'status': 'error', 'message': f'Erro ao ler logs: {str(e)}'})
     else:
         return jsonify({'status': 'error', 'message': 'Arquivo de log não encontrado'})
+def job_response(job, created, message):
+    """Resposta padrão ao enfileirar uma tarefa (202) ou ao encontrar uma já ativa (409)"""
+    if not created:
+        return jsonify({'status': 'error', 'message': f"Já existe uma tarefa em andamento para este servidor ({job['type']})",
+                        'job_id': job['id'], 'job': job}), 409
+    return jsonify({'status': 'success', 'message': message, 'job_id': job['id'], 'job': job}), 202
 @app.route('/api/server/<int:server_id>/install', methods=['POST'])
 def install_server(server_id):
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         log_installation(f"Servidor ID {server_id} não encontrado!")
         return jsonify({'error': 'Servidor não encontrado'}), 404
@@ -836,63 +3892,31 @@ def install_server(server_id):
         return jsonify({'status': 'error', 'message': 'Servidor já está instalado! Use "Forçar Atualização" para reinstalar.'}), 400
     
     # Obter parâmetros da requisição
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     branch = data.get('branch', 'preaquatica')  # Padrão é preaquatica para contornar bug
     
     log_installation(f"Recebida solicitação de instalação para servidor ID: {server_id} (branch: {branch})")
-    
-    try:
-        # Criar diretórios
-        os.makedirs(server['path'], exist_ok=True)
-        log_installation(f"Diretórios criados: {server['path']}")
-        
-        # Instalar servidor
-        success = install_server_steamcmd(server['path'], server_id, branch=branch)
-        if success:
-            log_installation(f"Servidor {server_id} instalado com sucesso!")
-            return jsonify({'status': 'success', 'message': 'Servidor instalado com sucesso!'})
-        else:
-            log_installation(f"Erro na instalação do servidor {server_id}")
-            return jsonify({'status': 'error', 'message': 'Erro na instalação do servidor. Verifique os logs de instalação específicos do servidor.'}), 500
-    except Exception as e:
-        log_installation(f"EXCEÇÃO na instalação do servidor {server_id}: {str(e)}")
-        import traceback
-        log_installation(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'status': 'error', 'message': f'Exceção: {str(e)}'}), 500
+    job, created = submit_job('install', server_id, {'branch': branch})
+    return job_response(job, created, 'Instalação enfileirada')
 @app.route('/api/server/<int:server_id>/force_install', methods=['POST'])
 def force_install_server(server_id):
     """Forçar reinstalação do servidor"""
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         log_installation(f"Servidor ID {server_id} não encontrado!")
         return jsonify({'error': 'Servidor não encontrado'}), 404
     
     # Obter parâmetros da requisição
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     branch = data.get('branch', 'preaquatica')  # Padrão é preaquatica
     
     log_installation(f"Recebida solicitação de FORCE INSTALL para servidor ID: {server_id} (branch: {branch})")
-    
-    try:
-        # Forçar reinstalação
-        success = install_server_steamcmd(server['path'], server_id, force_update=True, branch=branch)
-        if success:
-            log_installation(f"Servidor {server_id} REINSTALADO com sucesso!")
-            return jsonify({'status': 'success', 'message': 'Servidor reinstalado com sucesso!'})
-        else:
-            log_installation(f"Erro na REINSTALAÇÃO do servidor {server_id}")
-            return jsonify({'status': 'error', 'message': 'Erro na reinstalação do servidor. Verifique os logs.'}), 500
-    except Exception as e:
-        log_installation(f"EXCEÇÃO na REINSTALAÇÃO do servidor {server_id}: {str(e)}")
-        import traceback
-        log_installation(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'status': 'error', 'message': f'Exceção: {str(e)}'}), 500
+    job, created = submit_job('force_install', server_id, {'branch': branch})
+    return job_response(job, created, 'Reinstalação enfileirada')
 @app.route('/api/server/<int:server_id>/update', methods=['POST'])
 def update_server(server_id):
     """Atualizar servidor existente"""
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         return jsonify({'error': 'Servidor não encontrado'}), 404
     
@@ -901,68 +3925,134 @@ def update_server(server_id):
         return jsonify({'error': 'Servidor não instalado! Instale primeiro.'}), 400
     
     # Obter parâmetros da requisição
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     branch = data.get('branch', 'preaquatica')  # Padrão é preaquatica
     
-    try:
-        success = update_server_steamcmd(server['path'], server_id, branch=branch)
-        if success:
-            return jsonify({'status': 'success', 'message': 'Servidor atualizado com sucesso!'})
-        else:
-            return jsonify({'status': 'error', 'message': 'Erro na atualização do servidor. Verifique os logs.'}), 500
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    job, created = submit_job('update', server_id, {'branch': branch})
+    return job_response(job, created, 'Atualização enfileirada')
+@app.route('/api/server/<int:server_id>/repair', methods=['POST'])
+def repair_server(server_id):
+    """Reparar servidor: app_update com validate (re-hash completo da instalação)"""
+    server = get_server(server_id)
+    if not server:
+        return jsonify({'error': 'Servidor não encontrado'}), 404
+    if not check_server_installed(server):
+        return jsonify({'error': 'Servidor não instalado! Instale primeiro.'}), 400
+    data = request.get_json(silent=True) or {}
+    branch = data.get('branch', 'preaquatica')  # Padrão é preaquatica
+    job, created = submit_job('repair', server_id, {'branch': branch})
+    return job_response(job, created, 'Reparo enfileirado')
+@app.route('/api/server/<int:server_id>/build')
+def server_build_status(server_id):
+    """Build instalada x build mais recente do branch"""
+    server = get_server(server_id)
+    if not server:
+        return jsonify({'error': 'Servidor não encontrado'}), 404
+    branch = request.args.get('branch', 'preaquatica')
+    return jsonify({'status': 'success', 'branch': branch, 'build': check_build_current(server['path'], branch)})
 @app.route('/api/server/<int:server_id>/uninstall', methods=['POST'])
 def uninstall_server_api(server_id):
     """Desinstalar servidor"""
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         return jsonify({'error': 'Servidor não encontrado'}), 404
     
-    try:
-        success = uninstall_server(server['path'], server_id)
-        if success:
-            return jsonify({'status': 'success', 'message': 'Servidor desinstalado com sucesso!'})
-        else:
-            return jsonify({'status': 'error', 'message': 'Erro na desinstalação do servidor.'}), 500
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    job, created = submit_job('uninstall', server_id)
+    return job_response(job, created, 'Desinstalação enfileirada')
+@app.route('/api/servers/update', methods=['POST'])
+def update_servers_batch():
+    """Atualizar vários servidores (padrão: todos os instalados) numa única sessão do SteamCMD"""
+    data = request.get_json(silent=True) or {}
+    branch = data.get('branch', 'preaquatica')  # Padrão é preaquatica
+    servers = [s for s in load_servers()['servers'] if check_server_installed(s)]
+    if data.get('server_ids'):
+        servers = [s for s in servers if s['id'] in data['server_ids']]
+    if not servers:
+        return jsonify({'status': 'error', 'message': 'Nenhum servidor instalado para atualizar'}), 400
+    server_ids = [s['id'] for s in servers]
+    log_installation(f"Recebida solicitação de atualização em lote para servidores: {server_ids} (branch: {branch})")
+    job, created = submit_job('batch_update', None, {'server_ids': server_ids, 'branch': branch})
+    return job_response(job, created, f'Atualização em lote de {len(server_ids)} servidores enfileirada')
+@app.route('/api/servers/rolling_update', methods=['POST'])
+def rolling_update_servers():
+    """Atualização gradual: parar/atualizar/reiniciar poucos servidores por vez, vazios primeiro"""
+    data = request.get_json(silent=True) or {}
+    branch = data.get('branch', 'preaquatica')  # Padrão é preaquatica
+    servers = [s for s in load_servers()['servers'] if check_server_installed(s)]
+    if data.get('server_ids'):
+        servers = [s for s in servers if s['id'] in data['server_ids']]
+    if not servers:
+        return jsonify({'status': 'error', 'message': 'Nenhum servidor instalado para atualizar'}), 400
+    server_ids = [s['id'] for s in servers]
+    params = {'server_ids': server_ids, 'branch': branch, 'concurrency': data.get('concurrency')}
+    log_installation(f"Recebida solicitação de atualização gradual para servidores: {server_ids} (branch: {branch})")
+    job, created = submit_job('rolling_update', None, params)
+    return job_response(job, created, f'Atualização gradual de {len(server_ids)} servidores enfileirada')
+@app.route('/api/jobs')
+def api_jobs():
+    """Listar tarefas (filtros opcionais: server_id, status)"""
+    jobs = list_jobs(request.args.get('server_id', type=int), request.args.get('status'))
+    return jsonify({'status': 'success', 'jobs': jobs})
+@app.route('/api/jobs/<int:job_id>')
+def api_job(job_id):
+    """Estado de uma tarefa"""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Tarefa não encontrada'}), 404
+    if job['server_id'] is None:
+        # Tarefa em lote: progresso de cada servidor desta sessão
+        job['progress'] = {sid: p for sid, p in get_steamcmd_progress().items() if p['job_id'] == job_id}
+    else:
+        progress = get_steamcmd_progress(job['server_id'])
+        if progress and progress['job_id'] == job_id:
+            job['progress'] = progress
+    return jsonify({'status': 'success', 'job': job})
+@app.route('/api/server/<int:server_id>/steamcmd/progress')
+def api_steamcmd_progress(server_id):
+    """Progresso estruturado da última execução do SteamCMD do servidor"""
+    progress = get_steamcmd_progress(server_id)
+    if not progress:
+        return jsonify({'status': 'error', 'message': 'Nenhuma execução do SteamCMD registrada'}), 404
+    return jsonify({'status': 'success', 'progress': progress})
+@app.route('/api/steamcmd/progress')
+def api_all_steamcmd_progress():
+    """Progresso atual de todas as execuções do SteamCMD"""
+    return jsonify({'status': 'success', 'progress': get_steamcmd_progress()})
+@app.route('/api/steamcmd/runs')
+def api_steamcmd_runs():
+    """Resumos das execuções anteriores (pico/média de MB/s, tempo por fase)"""
+    runs = load_steamcmd_runs(request.args.get('server_id', type=int), request.args.get('limit', 50, type=int))
+    return jsonify({'status': 'success', 'runs': runs})
 @app.route('/api/server/<int:server_id>/start', methods=['POST'])
 def start_server(server_id):
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         return jsonify({'error': 'Servidor não encontrado'}), 404
     # Verificar se está instalado
     if not check_server_installed(server):
         return jsonify({'error': 'Servidor não instalado! Instale primeiro.'}), 400
+    # Portas em conflito com outro servidor: o ARK falharia ao abrir a porta (ou responderia pelo outro)
+    conflicts = get_server_config_errors(server_id)
+    if conflicts:
+        return jsonify({'status': 'error', 'message': '; '.join(e['message'] for e in conflicts)}), 409
     try:
-        # Criar diretórios necessários
-        os.makedirs(server['path'], exist_ok=True)
-        os.makedirs(os.path.join(server['path'], 'ShooterGame/Saved/Config/LinuxServer'), exist_ok=True)
-        # Criar script de inicialização
-        create_start_script(server)
-        # Iniciar servidor
-        script_path = os.path.join(server['path'], 'start_server.sh')
-        subprocess.Popen(['/usr/bin/nohup', '/bin/bash', script_path], 
-                        stdout=open(f"{LOGS_DIR}/server_{server_id}.log", 'w'),
-                        stderr=subprocess.STDOUT,
-                        start_new_session=True)
-        return jsonify({'status': 'success', 'message': 'Servidor iniciado'})
+        pid = launch_server(server)
+        return jsonify({'status': 'success', 'message': 'Servidor iniciado', 'pid': pid})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 @app.route('/api/server/<int:server_id>/stop', methods=['POST'])
 def stop_server(server_id):
+    server = get_server(server_id)
+    if not server:
+        return jsonify({'error': 'Servidor não encontrado'}), 404
     try:
-        subprocess.run(['/usr/bin/pkill', '-f', f"ShooterGameServer.*Port={7777 + (server_id-1)*10}"])
+        terminate_server(server)
         return jsonify({'status': 'success', 'message': 'Servidor parado'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 @app.route('/api/server/<int:server_id>/config', methods=['POST'])
 def update_server_config(server_id):
-    servers_data = load_servers()
-    server = next((s for s in servers_data['servers'] if s['id'] == server_id), None)
+    server = get_server(server_id)
     if not server:
         return jsonify({'error': 'Servidor não encontrado'}), 404
     try:
@@ -994,5 +4084,55 @@ bAllowUnlimitedRespecs=true
         return jsonify({'status': 'success', 'message': 'Configurações salvas com sucesso!'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
+def start_gunicorn_worker(worker):
+    start_metrics_publisher()
+    start_status_collector()
+def run_gunicorn(base_application, host, port, threads):
+    """Vários processos (gthread): cada worker inicia os serviços após o fork e disputa a liderança"""
+    # Histogramas publicados por uma execução anterior: o novo master começa do zero (reset dos contadores)
+    shutil.rmtree(PANEL_METRICS_DIR, ignore_errors=True)
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': max(1, int(PANEL_SETTINGS['server_workers'])),
+        'threads': threads,
+        'worker_class': 'gthread',
+        'timeout': 120,
+        'graceful_timeout': 30,
+        'post_worker_init': start_gunicorn_worker
+    }
+    class PanelApplication(base_application):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+        def load(self):
+            return app
+    PanelApplication().run()
+def run_panel():
+    """Servir o painel conforme server_mode: dev (servidor do Flask), waitress ou gunicorn"""
+    mode = PANEL_SETTINGS['server_mode']
+    host = PANEL_SETTINGS['server_host']
+    port = int(PANEL_SETTINGS['server_port'])
+    threads = max(1, int(PANEL_SETTINGS['server_threads']))
+    if mode == 'waitress':
+        try:
+            from waitress import serve
+        except ImportError:
+            print("waitress não instalado (pip install waitress); usando o servidor de desenvolvimento")
+        else:
+            start_status_collector()
+            serve(app, host=host, port=port, threads=threads, ident='ark-panel')
+            return
+    elif mode == 'gunicorn':
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            print("gunicorn não instalado (pip install gunicorn); usando o servidor de desenvolvimento")
+        else:
+            run_gunicorn(BaseApplication, host, port, threads)
+            return
+    elif mode != 'dev':
+        print(f"server_mode desconhecido: {mode}; usando o servidor de desenvolvimento")
+    start_status_collector()
+    app.run(host=host, port=port, debug=False, threaded=True)
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    run_panel()
@@ -0,0 +1,15 @@
+"""
+Benchmarks dos caminhos quentes do painel
+
+Executar a partir de ark-panel/projeto:
+
+    python -m bench                              # tudo, logs de 1M a 1G
+    python -m bench --quick                      # rodada curta (logs de 1M e 16M)
+    python -m bench --only logs --log-sizes 1G   # filtrar benchmarks pelo nome
+    python -m bench --compare antes.json depois.json
+    python -m bench.simulate --fleet-sizes 12,50,100,200   # teste de carga com frota simulada
+
+Tudo roda localmente: tabela de processos falsa, respondedor A2S em UDP local e logs sintéticos
+(guardados em --cache-dir para reaproveitar entre execuções). Os resultados vão para um JSON
+(--output) com os metadados da máquina e do commit, para comparar execuções.
+"""
@@ -0,0 +1,312 @@
+"""
+Executor dos benchmarks: python -m bench [opções] (ver bench/__init__.py)
+"""
+import os
+import sys
+import json
+import gc
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, timedelta
+from bench.fixtures import (PROJECT_DIR, A2SResponder, build_fleet, install_fake_server, prepare_workspace, load_panel,
+                            build_fake_process_table, fake_process_table, ensure_synthetic_log, link_or_copy,
+                            parse_size, format_size)
+DEFAULT_LOG_SIZES = '1M,32M,256M,1G'
+QUICK_LOG_SIZES = '1M,16M'
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmarks dos caminhos quentes do painel')
+    parser.add_argument('--quick', action='store_true', help='rodada curta: logs pequenos e menos tempo por benchmark')
+    parser.add_argument('--servers', type=int, default=9, help='servidores na frota simulada')
+    parser.add_argument('--processes', type=int, default=5000, help='processos na tabela falsa')
+    parser.add_argument('--log-sizes', default=None, help=f'tamanhos dos logs sintéticos (padrão {DEFAULT_LOG_SIZES})')
+    parser.add_argument('--log-days', type=int, default=14, help='dias cobertos por cada log sintético')
+    parser.add_argument('--a2s-latency', type=float, default=5.0, help='latência do respondedor A2S (ms)')
+    parser.add_argument('--a2s-jitter', type=float, default=2.0, help='latência extra aleatória do respondedor A2S (ms)')
+    parser.add_argument('--a2s-loss', type=float, default=0.0, help='fração de consultas A2S descartadas (0-1)')
+    parser.add_argument('--a2s-timeout', type=float, default=1.0, help='timeout A2S do painel (s)')
+    parser.add_argument('--min-time', type=float, default=None, help='tempo mínimo por benchmark (s)')
+    parser.add_argument('--max-iterations', type=int, default=1000)
+    parser.add_argument('--gc', action='store_true', help='manter o coletor de lixo ativo durante as medições (como timeit, o padrão é desativá-lo)')
+    parser.add_argument('--only', action='append', default=[], help='executar só benchmarks cujo nome contém o texto')
+    parser.add_argument('--cache-dir', default=os.path.join(os.path.expanduser('~'), '.cache', 'ark-panel-bench'),
+                        help='onde guardar os logs sintéticos entre execuções')
+    parser.add_argument('--output', default=None, help='arquivo JSON de resultados (padrão bench_results_<data>.json)')
+    parser.add_argument('--keep-workspace', action='store_true', help='não apagar o diretório temporário do painel')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DEPOIS'), help='comparar dois JSON de resultados')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regressão (%% na mediana) que faz --compare falhar')
+    return parser.parse_args(argv)
+def git_revision():
+    """Commit atual e se há alterações locais (para saber o que foi medido)"""
+    try:
+        rev = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', '.'], cwd=PROJECT_DIR, capture_output=True,
+                               text=True, timeout=30).stdout.strip() != ''
+        return {'commit': rev or None, 'dirty': dirty}
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'dirty': None}
+def summarize(name, params, samples, first):
+    """Estatísticas em milissegundos (a primeira chamada, fria, é reportada à parte)"""
+    ordered = sorted(samples)
+    return {
+        'name': name,
+        'params': params,
+        'iterations': len(samples),
+        'first_ms': round(first * 1000, 4),
+        'min_ms': round(ordered[0] * 1000, 4),
+        'median_ms': round(statistics.median(ordered) * 1000, 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'ops_per_sec': round(len(ordered) / sum(ordered), 2) if sum(ordered) else None
+    }
+class Runner:
+    """Executa cada benchmark por pelo menos min_time (e min_iterations), guardando os resultados"""
+    def __init__(self, args):
+        self.only = args.only
+        self.min_time = args.min_time
+        self.max_iterations = args.max_iterations
+        self.min_iterations = 3
+        self.keep_gc = args.gc
+        self.results = []
+    def selected(self, name):
+        return not self.only or any(text in name for text in self.only)
+    def measure(self, name, fn, params=None, setup=None, min_time=None, max_iterations=None):
+        if not self.selected(name):
+            return None
+        min_time = self.min_time if min_time is None else min_time
+        max_iterations = max_iterations or self.max_iterations
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        first = time.perf_counter() - started
+        samples = []
+        gc.collect()
+        if not self.keep_gc:
+            gc.disable()
+        try:
+            deadline = time.perf_counter() + min_time
+            while len(samples) < max_iterations and (len(samples) < self.min_iterations or time.perf_counter() < deadline):
+                if setup:
+                    setup()
+                started = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+        result = summarize(name, params or {}, samples, first)
+        self.results.append(result)
+        print(f"  {name:<44} {format_params(params):<28} median {result['median_ms']:>10.3f} ms"
+              f"  p95 {result['p95_ms']:>10.3f} ms  n={result['iterations']}", flush=True)
+        return result
+def format_params(params):
+    return ' '.join(f'{k}={v}' for k, v in (params or {}).items())
+def check_json(response):
+    """Falhar cedo se um endpoint medido estiver devolvendo erro (o benchmark não mediria nada útil)"""
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.request.path}: HTTP {response.status_code}')
+    data = response.get_json(silent=True)
+    if data is not None and isinstance(data, dict) and data.get('status') == 'error':
+        raise RuntimeError(f"{response.request.path}: {data.get('message')}")
+    return data
+def bench_collection(runner, panel, client, context, running):
+    """Varredura de processos, métricas por servidor, A2S, coleta completa, /api/servers e index"""
+    print('processos / A2S / coleta', flush=True)
+    runner.measure('process_scan', panel.build_process_index, {'processes': len(context['table'])})
+    index = panel.build_process_index()
+    online = running[0]
+    not_installed = context['not_installed']
+    info = panel.get_real_player_count(online)
+    runner.measure('get_server_metrics.online', lambda: panel.get_server_metrics(online, index, info))
+    if not_installed:
+        runner.measure('get_server_metrics.not_installed', lambda: panel.get_server_metrics(not_installed, index, None))
+    runner.measure('a2s_query', lambda: panel.get_real_player_count(online), context['a2s_params'])
+    runner.measure('a2s_fleet_query', lambda: panel.query_players_concurrently(running),
+                   {**context['a2s_params'], 'servers': len(running)}, setup=panel._a2s_cache.clear)
+    runner.measure('status_collection.cold_a2s', panel.refresh_status_snapshot,
+                   {**context['a2s_params'], 'servers': len(context['servers'])}, setup=panel._a2s_cache.clear)
+    runner.measure('status_collection.warm_a2s', panel.refresh_status_snapshot, {'servers': len(context['servers'])})
+    runner.measure('api_servers', lambda: check_json(client.get('/api/servers')), {'servers': len(context['servers'])})
+    runner.measure('index_render', lambda: client.get('/').get_data(), {'servers': len(context['servers'])})
+    runner.measure('server_detail_render', lambda: client.get(f"/server/{online['id']}").get_data())
+def bench_filter(runner, panel, log_path, meta):
+    """filter_log_lines sobre as linhas de um log já em memória"""
+    print('filter_log_lines', flush=True)
+    with open(log_path, encoding='utf-8') as f:
+        lines = f.readlines()
+    end = datetime.fromisoformat(meta['end'])
+    day = (end - timedelta(days=meta['days'] // 2)).replace(hour=0, minute=0, second=0)
+    params = {'lines': len(lines)}
+    runner.measure('filter_log_lines.none', lambda: panel.filter_log_lines(lines), params)
+    runner.measure('filter_log_lines.search', lambda: panel.filter_log_lines(lines, 'joined'), params)
+    runner.measure('filter_log_lines.date', lambda: panel.filter_log_lines(lines, None, day, day.replace(hour=23, minute=59, second=59)), params)
+    runner.measure('filter_log_lines.search_date', lambda: panel.filter_log_lines(lines, 'rex', day, day.replace(hour=23, minute=59, second=59)), params)
+def bench_log_endpoints(runner, panel, client, server_id, size, meta, min_time):
+    """Todos os endpoints de leitura de log sobre um log de `size` bytes"""
+    print(f'endpoints de log ({format_size(size)})', flush=True)
+    params = {'size': format_size(size), 'lines': meta['lines']}
+    end = datetime.fromisoformat(meta['end'])
+    day = (end - timedelta(days=meta['days'] // 2)).strftime('%Y-%m-%d')
+    base = f'/api/server/{server_id}'
+    def get(url):
+        return lambda: check_json(client.get(url))
+    measure = lambda name, url: runner.measure(name, get(url), params, min_time=min_time)
+    measure('logs.tail', f'{base}/logs')
+    measure('logs.tail_5000', f'{base}/logs?lines=5000')
+    measure('logs.page_back', f'{base}/logs?before={size // 2}&lines=500')
+    measure('logs.search_rare', f'{base}/logs?search=RareNeedle')
+    measure('logs.search_common', f'{base}/logs?search=joined')
+    measure('logs.search_regex', f'{base}/logs?search=Lvl%201[0-9]{{2}}&regex=1')
+    measure('logs.level_error', f'{base}/logs?level=ERROR')
+    measure('logs.date_window', f'{base}/logs?start_date={day}&end_date={day}')
+    measure('logs.date_search', f'{base}/logs?start_date={day}&end_date={day}&search=rex')
+    measure('install_logs', f'{base}/install_logs')
+    measure('update_logs', f'{base}/update_logs')
+    measure('specific_log', f'{base}/specific_log?file=server_{server_id}.log')
+    measure('specific_log.search', f'{base}/specific_log?file=server_{server_id}.log&search=RareNeedle')
+    measure('installation_logs', '/api/installation/logs')
+def bench_stream(runner, panel, client, server_id):
+    """Latência do SSE num log próprio (os logs sintéticos são compartilhados com o cache e não podem crescer)"""
+    if not runner.selected('logs.stream'):
+        return
+    print('stream de log', flush=True)
+    log_file = os.path.join(panel.LOGS_DIR, f'server_{server_id}.log')
+    with open(log_file, 'w') as f:
+        f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] bench stream start\n")
+    runner.measure('logs.stream_latency', lambda: stream_latency(client, f'/api/server/{server_id}', log_file),
+                   {'poll_interval_ms': panel.LOG_FOLLOW_POLL_INTERVAL * 1000}, min_time=0, max_iterations=5)
+def stream_latency(client, base, log_file):
+    """Tempo entre acrescentar uma linha ao log e recebê-la pelo SSE (inclui o intervalo de polling)"""
+    response = client.get(f'{base}/logs/stream', buffered=False)
+    chunks = iter(response.response)
+    try:
+        next(chunks)  # retry:
+        # Dar tempo ao leitor compartilhado de registrar o tamanho atual antes de escrever
+        time.sleep(0.05)
+        with open(log_file, 'a') as f:
+            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] bench stream probe\n")
+        for chunk in chunks:
+            text = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if text.startswith('data:'):
+                return
+    finally:
+        response.close()
+def prepare_logs(panel, args, fleet):
+    """Gerar (ou reaproveitar) os logs sintéticos e expô-los nos nomes que o painel lê"""
+    sizes = [parse_size(s) for s in args.log_sizes.split(',') if s.strip()]
+    logs = []
+    for i, size in enumerate(sizes):
+        server = fleet['servers'][i % max(1, len(fleet['servers']) - 1)]  # O último fica para o teste de stream
+        print(f'log sintético {format_size(size)}...', end=' ', flush=True)
+        path, meta = ensure_synthetic_log(args.cache_dir, size, days=args.log_days)
+        print(f"{meta['lines']} linhas (gerado em {meta['generated_in']} s)", flush=True)
+        for name in (f"server_{server['id']}.log", f"install_server_{server['id']}.log", f"update_server_{server['id']}.log"):
+            link_or_copy(path, os.path.join(panel.LOGS_DIR, name))
+        logs.append((server['id'], size, path, meta))
+    if logs:
+        link_or_copy(logs[-1][2], os.path.join(panel.LOGS_DIR, 'installation.log'))
+    return logs
+def run(args):
+    workspace = tempfile.mkdtemp(prefix='ark-bench-')
+    responder = A2SResponder(latency=args.a2s_latency / 1000, jitter=args.a2s_jitter / 1000, loss=args.a2s_loss)
+    try:
+        fleet = build_fleet(args.servers, workspace)
+        servers = fleet['servers']
+        for server in servers:
+            server['query_port'] = responder.add_server(0, server['name'], server['map'], players=12, game_port=server['game_port'])
+        # O último servidor fica não instalado para cobrir esse ramo; os demais ficam "rodando"
+        installed = servers[:-1] if len(servers) > 1 else servers
+        for server in installed:
+            install_fake_server(server)
+        responder.start()
+        prepare_workspace(workspace, fleet, {
+            'a2s_timeout': args.a2s_timeout,
+            'status_refresh_interval': 3600,  # Coletas só quando medidas, sem o coletor concorrendo em segundo plano
+            'log_rotate_max_bytes': 1 << 62,  # Logs sintéticos compartilhados por hardlink: nunca rotacionar
+            'log_rotate_max_age_days': 36500,
+            'log_retention_days': 36500
+        })
+        table = build_fake_process_table(args.processes, installed)
+        with fake_process_table(__import__('psutil'), table):
+            panel = load_panel(workspace)
+            client = panel.app.test_client()
+            context = {
+                'servers': servers,
+                'table': table,
+                'not_installed': servers[-1] if len(servers) > 1 else None,
+                'a2s_params': {'latency_ms': args.a2s_latency, 'jitter_ms': args.a2s_jitter, 'loss': args.a2s_loss}
+            }
+            runner = Runner(args)
+            panel.get_status_snapshot()  # Iniciar o coletor fora das medições
+            bench_collection(runner, panel, client, context, installed)
+            logs = prepare_logs(panel, args, fleet)
+            if logs and runner.selected('filter_log_lines'):
+                # Linhas em memória: limitar ao menor log que tenha pelo menos ~16 MB (ou ao maior disponível)
+                candidates = [log for log in logs if log[1] <= 16 * 1024 ** 2] or logs[:1]
+                bench_filter(runner, panel, candidates[-1][2], candidates[-1][3])
+            for server_id, size, path, meta in logs:
+                # Logs grandes: menos repetições, o custo está no volume lido
+                min_time = args.min_time if size <= 64 * 1024 ** 2 else args.min_time / 2
+                bench_log_endpoints(runner, panel, client, server_id, size, meta, min_time)
+            bench_stream(runner, panel, client, servers[-1]['id'])
+        return {
+            'meta': {
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'git': git_revision(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'args': {k: v for k, v in vars(args).items() if k not in ('compare', 'output')},
+                'a2s_responder': dict(responder.stats)
+            },
+            'results': runner.results
+        }
+    finally:
+        responder.stop()
+        if args.keep_workspace:
+            print(f'workspace mantido em {workspace}')
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+def compare(before_path, after_path, threshold):
+    """Comparar medianas entre duas execuções; devolve 1 se alguma piorou mais que threshold %"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    key = lambda r: (r['name'], json.dumps(r['params'], sort_keys=True))
+    old = {key(r): r for r in before['results']}
+    regressions = 0
+    print(f"{'benchmark':<44} {'parâmetros':<28} {'antes (ms)':>12} {'depois (ms)':>12} {'delta':>9}")
+    for result in after['results']:
+        previous = old.get(key(result))
+        if previous is None:
+            continue
+        delta = (result['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100 if previous['median_ms'] else 0.0
+        flag = ''
+        if delta > threshold:
+            flag = '  REGRESSÃO'
+            regressions += 1
+        print(f"{result['name']:<44} {format_params(result['params']):<28} {previous['median_ms']:>12.3f} "
+              f"{result['median_ms']:>12.3f} {delta:>+8.1f}%{flag}")
+    return 1 if regressions else 0
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.threshold)
+    if args.log_sizes is None:
+        args.log_sizes = QUICK_LOG_SIZES if args.quick else DEFAULT_LOG_SIZES
+    if args.min_time is None:
+        args.min_time = 0.2 if args.quick else 1.0
+    output = args.output or f"bench_results_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    report = run(args)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'resultados gravados em {output}')
+    return 0
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Fixtures sintéticas para benchmarks e simulações do painel (sem rede externa, sem servidores ARK reais)
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import socket
+import struct
+import selectors
+import threading
+import importlib.util
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mapas usados para gerar frotas de qualquer tamanho (repetidos com sufixo quando necessário)
+FLEET_MAPS = ['TheIsland', 'TheCenter', 'Ragnarok', 'Aberration_P', 'Extinction', 'Genesis', 'Gen2',
+              'LostIsland', 'Fjordur', 'ScorchedEarth_P', 'Valguero_P', 'CrystalIsles']
+def build_fleet(count, base_dir, game_port=7777, query_port=27015, rcon_port=32330):
+    """Configuração de servidores no formato do servers.json (portas sequenciais, um diretório por mapa)"""
+    servers = []
+    for i in range(count):
+        map_name = FLEET_MAPS[i % len(FLEET_MAPS)]
+        if i >= len(FLEET_MAPS):
+            map_name = f'{map_name}{i // len(FLEET_MAPS)}'
+        servers.append({
+            'id': i + 1,
+            'name': f'ARK - {map_name}',
+            'map': map_name,
+            'ip': '127.0.0.1',
+            'game_port': game_port + i * 2,
+            'query_port': query_port + i,
+            'rcon_port': rcon_port + i,
+            'path': os.path.join(base_dir, 'servers', map_name.lower()),
+            'enabled': True,
+            'status': 'offline',
+            'players': 0
+        })
+    return {'servers': servers}
+def install_fake_server(server, buildid=12345678, branch='public'):
+    """Marcar um servidor como instalado (marcador + appmanifest), sem baixar nada"""
+    os.makedirs(os.path.join(server['path'], 'steamapps'), exist_ok=True)
+    with open(os.path.join(server['path'], '.ark_installed'), 'w') as f:
+        f.write(f"Installed at: {datetime.now()}\n")
+    with open(os.path.join(server['path'], 'steamapps', 'appmanifest_376030.acf'), 'w') as f:
+        f.write('"AppState"\n{\n\t"appid"\t\t"376030"\n'
+                f'\t"buildid"\t\t"{buildid}"\n'
+                f'\t"UserConfig"\n\t{{\n\t\t"betakey"\t\t"{"" if branch == "public" else branch}"\n\t}}\n}}\n')
+def prepare_workspace(workspace, servers_data, panel_settings=None):
+    """Montar um diretório do painel isolado (app.py e templates por link simbólico, config própria)
+
+    O painel calcula BASE_DIR a partir do caminho do módulo, então logs, config, data e run
+    ficam todos dentro do workspace.
+    """
+    os.makedirs(os.path.join(workspace, 'config'), exist_ok=True)
+    for name in ('app.py', 'templates'):
+        link = os.path.join(workspace, name)
+        if not os.path.lexists(link):
+            os.symlink(os.path.join(PROJECT_DIR, name), link)
+    with open(os.path.join(workspace, 'config', 'servers.json'), 'w') as f:
+        json.dump(servers_data, f, indent=2)
+    if panel_settings:
+        with open(os.path.join(workspace, 'config', 'panel.json'), 'w') as f:
+            json.dump(panel_settings, f, indent=2)
+    return workspace
+def load_panel(workspace):
+    """Importar o app.py do workspace como módulo 'app'"""
+    path = os.path.join(workspace, 'app.py')
+    spec = importlib.util.spec_from_file_location('app', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['app'] = module
+    spec.loader.exec_module(module)
+    return module
+# Tabela de processos falsa: substitui psutil.process_iter com milhares de processos em memória
+class FakeMemoryInfo:
+    def __init__(self, rss):
+        self.rss = rss
+        self.vms = rss * 2
+class FakeProcess:
+    """Processo em memória com a parte da API do psutil usada pelo painel"""
+    def __init__(self, pid, name, cmdline, rss=50 * 1024 * 1024, cpu=0.5):
+        self.pid = pid
+        self.info = {'name': name}
+        self._name = name
+        self._cmdline = cmdline
+        self._rss = rss
+        self._cpu = cpu
+        self._create_time = time.time() - random.uniform(60, 86400)
+    def name(self):
+        return self._name
+    def cmdline(self):
+        return list(self._cmdline)
+    def is_running(self):
+        return True
+    def status(self):
+        return 'sleeping'
+    def oneshot(self):
+        return nullcontext()
+    def cpu_percent(self, interval=None):
+        return self._cpu
+    def memory_info(self):
+        return FakeMemoryInfo(self._rss)
+    def create_time(self):
+        return self._create_time
+FAKE_PROCESS_NAMES = ['systemd', 'kworker/0:1', 'sshd', 'bash', 'python3', 'nginx', 'postgres', 'cron',
+                      'rsyslogd', 'dbus-daemon', 'containerd', 'node', 'java', 'redis-server']
+def server_cmdline(server, executable='ShooterGameServer'):
+    """Linha de comando no formato usado pelo painel para iniciar o servidor"""
+    return [os.path.join(server['path'], 'ShooterGame', 'Binaries', 'Linux', executable),
+            f"{server['map']}?listen?SessionName={server['name']}?Port={server['game_port']}"
+            f"?QueryPort={server['query_port']}?RCONPort={server['rcon_port']}",
+            '-server', '-log']
+def build_fake_process_table(total, servers, seed=1):
+    """Lista de processos falsos: os servidores dados (como ShooterGameServer) e o restante genérico"""
+    rng = random.Random(seed)
+    table = []
+    for i, server in enumerate(servers):
+        table.append(FakeProcess(100000 + i, 'ShooterGameServer', server_cmdline(server),
+                                 rss=rng.randint(6, 14) * 1024 ** 3, cpu=rng.uniform(20, 180)))
+    for pid in range(2, 2 + max(0, total - len(servers))):
+        name = rng.choice(FAKE_PROCESS_NAMES)
+        table.append(FakeProcess(pid, name, [f'/usr/bin/{name}', '--flag', str(pid)],
+                                 rss=rng.randint(1, 500) * 1024 * 1024, cpu=rng.uniform(0, 5)))
+    rng.shuffle(table)
+    return table
+@contextmanager
+def fake_process_table(psutil_module, table):
+    """Substituir psutil.process_iter pela tabela falsa enquanto o bloco estiver ativo"""
+    original = psutil_module.process_iter
+    def process_iter(attrs=None, ad_value=None):
+        return iter(table)
+    psutil_module.process_iter = process_iter
+    try:
+        yield table
+    finally:
+        psutil_module.process_iter = original
+# Respondedor A2S local (UDP) com latência e perda configuráveis
+def encode_a2s_info(info):
+    """Resposta A2S_INFO (0x49) no formato Source"""
+    def cstring(value):
+        return value.encode('utf-8') + b'\0'
+    return (b'\xFF\xFF\xFF\xFF\x49' + bytes([17]) + cstring(info['name']) + cstring(info['map'])
+            + cstring('ark_survival_evolved') + cstring('ARK: Survival Evolved')
+            + struct.pack('<H', 0) + bytes([min(255, info['players']), min(255, info['max_players']), 0])
+            + b'dl' + bytes([0, 0]) + cstring(info.get('version', '1.0.0.0')) + bytes([0x80])
+            + struct.pack('<H', info.get('game_port', 0)))
+class A2SResponder:
+    """Atender A2S_INFO em várias portas UDP numa única thread
+
+    latency: atraso fixo (s) antes de responder; jitter: atraso extra aleatório até este valor;
+    loss: fração de requisições descartadas; challenge: exigir o desafio (como servidores atuais).
+    O estado de cada porta (name, map, players, max_players) pode ser alterado durante a execução.
+    """
+    def __init__(self, host='127.0.0.1', latency=0.0, jitter=0.0, loss=0.0, challenge=False, seed=1):
+        self.host = host
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.challenge = challenge
+        self.servers = {}
+        self.stats = {'requests': 0, 'dropped': 0, 'responses': 0, 'challenges': 0}
+        self._rng = random.Random(seed)
+        self._selector = selectors.DefaultSelector()
+        self._sockets = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+    def add_server(self, port, name, map_name, players=0, max_players=70, game_port=0):
+        """Abrir uma porta (0 = escolhida pelo sistema) e devolver o número efetivo"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((self.host, port))
+        sock.setblocking(False)
+        port = sock.getsockname()[1]
+        with self._lock:
+            self.servers[port] = {'name': name, 'map': map_name, 'players': players,
+                                  'max_players': max_players, 'game_port': game_port, 'online': True}
+            self._sockets[port] = sock
+            self._selector.register(sock, selectors.EVENT_READ, port)
+        return port
+    def set_players(self, port, players):
+        with self._lock:
+            self.servers[port]['players'] = players
+    def set_online(self, port, online):
+        """Simular um servidor parado (sem resposta) sem fechar a porta"""
+        with self._lock:
+            self.servers[port]['online'] = online
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='a2s-responder', daemon=True)
+        self._thread.start()
+        return self
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        for sock in self._sockets.values():
+            sock.close()
+        self._selector.close()
+    def _reply(self, port, data, addr):
+        with self._lock:
+            info = dict(self.servers[port])
+            self.stats['requests'] += 1
+        if not info['online'] or self._rng.random() < self.loss:
+            self.stats['dropped'] += 1
+            return None
+        if not data.startswith(b'\xFF\xFF\xFF\xFFTSource Engine Query\0'):
+            return None
+        if self.challenge and len(data) < 29:
+            self.stats['challenges'] += 1
+            return b'\xFF\xFF\xFF\xFF\x41' + struct.pack('<I', self._rng.getrandbits(32))
+        self.stats['responses'] += 1
+        return encode_a2s_info(info)
+    def _loop(self):
+        while self._running:
+            now = time.monotonic()
+            timeout = 0.1
+            while self._pending and self._pending[0][0] <= now:
+                _, _, port, payload, addr = heapq.heappop(self._pending)
+                try:
+                    self._sockets[port].sendto(payload, addr)
+                except OSError:
+                    pass
+            if self._pending:
+                timeout = min(timeout, max(0.0, self._pending[0][0] - now))
+            for key, _ in self._selector.select(timeout):
+                port = key.data
+                try:
+                    data, addr = key.fileobj.recvfrom(1400)
+                except (BlockingIOError, OSError):
+                    continue
+                payload = self._reply(port, data, addr)
+                if payload is None:
+                    continue
+                delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+                if delay <= 0:
+                    key.fileobj.sendto(payload, addr)
+                else:
+                    heapq.heappush(self._pending, (time.monotonic() + delay, id(payload), port, payload, addr))
+# Logs sintéticos no formato do painel ([YYYY-MM-DD HH:MM:SS] mensagem)
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+LOG_MESSAGES = [
+    'Server: "{name}" has successfully started!',
+    'Player {player} joined this ARK!',
+    'Player {player} left this ARK.',
+    'Saving world...',
+    'World Save Complete (took {ms} ms)',
+    'WARNING: Tick took {ms} ms (hitch)',
+    'ERROR: Failed to replicate actor Dino_{n} (channel {ms})',
+    '{player} was killed by a Rex - Lvl {n} (Rex)!',
+    'Tribe {tribe}: Day {n}, {ms}: {player} demolished a Stone Wall',
+    'Setting breakpad minidump AppID = 346110',
+    'Commandline: TheIsland?listen?Port=7777 -server -log',
+    'Steamworks heartbeat ok ({ms} ms)'
+]
+RARE_LOG_MESSAGE = 'FATAL: RareNeedle assertion failed in PrimalWorld'
+def parse_size(value):
+    """'16M' -> bytes"""
+    value = value.strip().upper()
+    if value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f'{size // SIZE_UNITS[unit]}{unit}'
+    return str(size)
+def write_synthetic_log(path, size, days=14, end=None, seed=1, rare_every=50000):
+    """Gerar um log cronológico de ~size bytes cobrindo os últimos `days` dias
+
+    Uma linha a cada `rare_every` contém RARE_LOG_MESSAGE (busca seletiva). Devolve o número de linhas.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    written = 0
+    lines = 0
+    chunk = []
+    chunk_bytes = 0
+    second = start.timestamp()
+    cached_second = None
+    cached_prefix = None
+    cached_minute = None
+    minute_prefix = None
+    # Mensagens pré-formatadas: formatar cada linha tornaria a geração de 1 GB lenta demais
+    messages = [rng.choice(LOG_MESSAGES).format(
+        name='ARK Bench', player=f'Survivor{rng.randint(1, 500)}', ms=rng.randint(1, 900),
+        n=rng.randint(1, 150), tribe=f'Tribe{rng.randint(1, 40)}') for _ in range(4096)]
+    average_line = sum(len(m) for m in messages) / len(messages) + len('[YYYY-MM-DD HH:MM:SS] \n')
+    step = (end - start).total_seconds() / max(1, size / average_line)
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < size:
+            second += step
+            whole = int(second)
+            if whole != cached_second:
+                cached_second = whole
+                minute = whole - whole % 60
+                if minute != cached_minute:
+                    # strftime só uma vez por minuto; os segundos são concatenados
+                    cached_minute = minute
+                    minute_prefix = datetime.fromtimestamp(minute).strftime('[%Y-%m-%d %H:%M:')
+                cached_prefix = f'{minute_prefix}{whole - minute:02d}] '
+            if rare_every and lines % rare_every == rare_every // 2:
+                message = RARE_LOG_MESSAGE
+            else:
+                message = messages[int(rng.random() * len(messages))]
+            line = f'{cached_prefix}{message}\n'
+            chunk.append(line)
+            chunk_bytes += len(line)
+            lines += 1
+            if chunk_bytes >= 1024 * 1024:
+                f.write(''.join(chunk))
+                written += chunk_bytes
+                chunk = []
+                chunk_bytes = 0
+        if chunk:
+            f.write(''.join(chunk))
+    return lines
+def ensure_synthetic_log(cache_dir, size, days=14):
+    """Reaproveitar o log gerado para este tamanho entre execuções (geração de 1 GB leva dezenas de segundos)"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'synthetic_{format_size(size)}_{days}d.log')
+    meta_path = path + '.json'
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('size') == size and os.path.getsize(path) >= size:
+            return path, meta
+    started = time.time()
+    end = datetime.now().replace(microsecond=0)
+    lines = write_synthetic_log(path, size, days=days, end=end)
+    meta = {'size': size, 'lines': lines, 'days': days, 'end': end.isoformat(), 'generated_in': round(time.time() - started, 2)}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return path, meta
+def link_or_copy(src, dst):
+    """Expor o mesmo log com outro nome sem duplicar espaço em disco"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        os.symlink(os.path.abspath(src), dst)
@@ -0,0 +1,326 @@
+"""
+Simulador de frota: python -m bench.simulate --fleet-sizes 12,50,100,200
+
+Para cada tamanho N: gera um servers.json com N instâncias, inicia um processo substituto por
+instância (script ShooterGameServer com a mesma linha de comando que o painel procura), responde
+A2S em todas as portas de consulta, escreve em server_{id}.log no ritmo pedido e sobe o painel
+real em outro processo. Um gerador de carga concorrente acessa dashboard, API e logs e reporta
+vazão, p50/p99 por rota e o RSS do painel conforme N cresce.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+import psutil
+from bench.fixtures import (A2SResponder, build_fleet, install_fake_server, prepare_workspace,
+                            server_cmdline, LOG_MESSAGES)
+# Processo substituto: só dorme (sem imports além do essencial, -S evita o site-packages)
+STAND_IN_SCRIPT = '''#!{python} -S
+import os, sys, time
+parent = int(os.environ.get('ARK_SIM_PARENT', '0'))
+while True:
+    time.sleep(2)
+    if parent and os.getppid() != parent:
+        sys.exit(0)
+'''
+# Rotas exercitadas pelo gerador de carga e seus pesos
+LOAD_MIX = [
+    ('dashboard', 4, lambda sid: '/'),
+    ('api_servers', 6, lambda sid: '/api/servers'),
+    ('server_detail', 2, lambda sid: f'/server/{sid}'),
+    ('logs_tail', 4, lambda sid: f'/api/server/{sid}/logs'),
+    ('logs_search', 2, lambda sid: f'/api/server/{sid}/logs?search=joined'),
+    ('metrics', 1, lambda sid: '/metrics'),
+    ('metrics_history', 1, lambda sid: f'/api/server/{sid}/metrics/history')
+]
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.simulate', description='Teste de carga do painel com uma frota simulada')
+    parser.add_argument('--fleet-sizes', default='12,50,100,200', help='tamanhos de frota, em ordem')
+    parser.add_argument('--duration', type=float, default=30, help='segundos de carga por tamanho de frota')
+    parser.add_argument('--concurrency', type=int, default=16, help='clientes HTTP simultâneos')
+    parser.add_argument('--log-rate', type=float, default=5, help='linhas por segundo escritas em cada server_{id}.log')
+    parser.add_argument('--a2s-latency', type=float, default=5.0, help='latência do respondedor A2S (ms)')
+    parser.add_argument('--a2s-jitter', type=float, default=5.0, help='latência extra aleatória (ms)')
+    parser.add_argument('--a2s-loss', type=float, default=0.0, help='fração de consultas A2S descartadas')
+    parser.add_argument('--offline', type=float, default=0.0, help='fração de instâncias sem processo (servidores parados)')
+    parser.add_argument('--ready-timeout', type=float, default=120, help='segundos esperando o painel enxergar a frota')
+    parser.add_argument('--panel-settings', default=None, help='JSON com configurações extras para o panel.json')
+    parser.add_argument('--output', default=None, help='arquivo JSON de resultados (padrão simulate_results_<data>.json)')
+    parser.add_argument('--keep-workspace', action='store_true')
+    return parser.parse_args(argv)
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+def spawn_stand_ins(servers):
+    """Criar e iniciar o ShooterGameServer substituto de cada instância"""
+    processes = []
+    env = dict(os.environ, ARK_SIM_PARENT=str(os.getpid()))
+    for server in servers:
+        cmdline = server_cmdline(server)
+        os.makedirs(os.path.dirname(cmdline[0]), exist_ok=True)
+        with open(cmdline[0], 'w') as f:
+            f.write(STAND_IN_SCRIPT.format(python=sys.executable))
+        os.chmod(cmdline[0], 0o755)
+        processes.append(subprocess.Popen(cmdline, env=env, stdin=subprocess.DEVNULL,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    return processes
+class LogWriter:
+    """Uma thread acrescentando linhas a todos os server_{id}.log no ritmo configurado"""
+    def __init__(self, logs_dir, server_ids, rate):
+        self.paths = [os.path.join(logs_dir, f'server_{sid}.log') for sid in server_ids]
+        self.rate = rate
+        self.lines_written = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='sim-log-writer', daemon=True)
+        self._rng = random.Random(7)
+    def start(self):
+        if self.rate > 0:
+            self._thread.start()
+        return self
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+    def _loop(self):
+        interval = 0.25
+        debt = 0.0
+        while not self._stop.wait(interval):
+            debt += self.rate * interval
+            count = int(debt)
+            if not count:
+                continue
+            debt -= count
+            stamp = datetime.now().strftime('[%Y-%m-%d %H:%M:%S] ')
+            for path in self.paths:
+                text = ''.join(stamp + self._rng.choice(LOG_MESSAGES).format(
+                    name='ARK Sim', player=f'Survivor{self._rng.randint(1, 500)}', ms=self._rng.randint(1, 900),
+                    n=self._rng.randint(1, 150), tribe=f'Tribe{self._rng.randint(1, 40)}') + '\n' for _ in range(count))
+                with open(path, 'a') as f:
+                    f.write(text)
+                self.lines_written += count
+def start_panel(workspace, port):
+    """Subir o painel real (servidor de desenvolvimento do Flask, com threads) a partir do workspace"""
+    code = ('import sys; sys.path.insert(0, sys.argv[1]); import app; app.start_status_collector(); '
+            'app.app.run(host="127.0.0.1", port=int(sys.argv[2]), debug=False, threaded=True)')
+    log = open(os.path.join(workspace, 'panel_stdout.log'), 'w')
+    return subprocess.Popen([sys.executable, '-c', code, workspace, str(port)], cwd=workspace,
+                            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+def http_get_json(port, path, timeout=10):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read()
+        return response.status, json.loads(body) if body else None
+    finally:
+        conn.close()
+def wait_for_fleet(port, panel, expected_online, timeout):
+    """Esperar o painel responder e enxergar as instâncias em execução; devolve os segundos gastos"""
+    started = time.time()
+    while time.time() - started < timeout:
+        if panel.poll() is not None:
+            raise RuntimeError('o painel terminou durante a inicialização (ver panel_stdout.log no workspace)')
+        try:
+            status, servers = http_get_json(port, '/api/servers')
+            if status == 200 and sum(1 for s in servers if s['status'] == 'online') >= expected_online:
+                return time.time() - started
+        except (OSError, ValueError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'o painel não enxergou {expected_online} servidores online em {timeout} s')
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+def load_worker(port, server_ids, deadline, seed, records, errors):
+    """Cliente HTTP com keep-alive escolhendo rotas pelo peso de LOAD_MIX"""
+    rng = random.Random(seed)
+    names = [name for name, _, _ in LOAD_MIX]
+    weights = [weight for _, weight, _ in LOAD_MIX]
+    builders = {name: build for name, _, build in LOAD_MIX}
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        path = builders[name](rng.choice(server_ids))
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - started
+            if response.status >= 400:
+                errors.append((name, response.status))
+            else:
+                records.append((name, elapsed))
+        except (OSError, http.client.HTTPException) as e:
+            errors.append((name, type(e).__name__))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.close()
+def sample_panel(panel_proc, stop, samples):
+    """Amostrar RSS (inclui filhos) e CPU do painel a cada 0,5 s durante a carga"""
+    proc = psutil.Process(panel_proc.pid)
+    proc.cpu_percent()
+    while not stop.wait(0.5):
+        try:
+            samples.append({'rss': proc.memory_info().rss, 'cpu_percent': proc.cpu_percent(), 'threads': proc.num_threads()})
+        except psutil.NoSuchProcess:
+            return
+def run_load(port, panel_proc, server_ids, duration, concurrency):
+    """Executar o gerador de carga e resumir por rota"""
+    records = []
+    errors = []
+    samples = []
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_panel, args=(panel_proc, stop, samples), daemon=True)
+    sampler.start()
+    deadline = time.time() + duration
+    workers = [threading.Thread(target=load_worker, args=(port, server_ids, deadline, i, records, errors), daemon=True)
+               for i in range(concurrency)]
+    started = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - started
+    stop.set()
+    sampler.join()
+    routes = {}
+    for name, latency in records:
+        routes.setdefault(name, []).append(latency)
+    summary = {}
+    for name, latencies in sorted(routes.items()):
+        latencies.sort()
+        summary[name] = {
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2)
+        }
+    everything = sorted(latency for _, latency in records)
+    return {
+        'duration': round(elapsed, 2),
+        'requests': len(records),
+        'errors': len(errors),
+        'error_kinds': sorted({f'{name}:{kind}' for name, kind in errors}),
+        'rps': round(len(records) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(everything, 0.5) * 1000, 2) if everything else None,
+        'p99_ms': round(percentile(everything, 0.99) * 1000, 2) if everything else None,
+        'routes': summary,
+        'panel_rss_max_mb': round(max(s['rss'] for s in samples) / 1024 ** 2, 1) if samples else None,
+        'panel_rss_end_mb': round(samples[-1]['rss'] / 1024 ** 2, 1) if samples else None,
+        'panel_cpu_avg': round(sum(s['cpu_percent'] for s in samples) / len(samples), 1) if samples else None,
+        'panel_threads_max': max(s['threads'] for s in samples) if samples else None
+    }
+def stop_process(proc, timeout=10):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+def simulate_fleet(args, size):
+    """Uma rodada completa para uma frota de `size` instâncias"""
+    workspace = tempfile.mkdtemp(prefix=f'ark-sim-{size}-')
+    responder = A2SResponder(latency=args.a2s_latency / 1000, jitter=args.a2s_jitter / 1000, loss=args.a2s_loss)
+    stand_ins = []
+    panel = None
+    writer = None
+    try:
+        fleet = build_fleet(size, workspace)
+        servers = fleet['servers']
+        rng = random.Random(size)
+        offline = set(rng.sample(range(size), int(size * args.offline)))
+        for i, server in enumerate(servers):
+            server['query_port'] = responder.add_server(0, server['name'], server['map'], players=rng.randint(0, 70),
+                                                        game_port=server['game_port'])
+            if i in offline:
+                responder.set_online(server['query_port'], False)
+            install_fake_server(server)
+        settings = {'log_rotate_max_bytes': 1 << 40}
+        if args.panel_settings:
+            settings.update(json.loads(args.panel_settings))
+        prepare_workspace(workspace, fleet, settings)
+        os.makedirs(os.path.join(workspace, 'logs'), exist_ok=True)
+        responder.start()
+        running = [s for i, s in enumerate(servers) if i not in offline]
+        stand_ins = spawn_stand_ins(running)
+        writer = LogWriter(os.path.join(workspace, 'logs'), [s['id'] for s in servers], args.log_rate).start()
+        port = free_port()
+        panel = start_panel(workspace, port)
+        ready_in = wait_for_fleet(port, panel, len(running), args.ready_timeout)
+        print(f'  painel pronto em {ready_in:.1f} s ({len(running)} de {size} instâncias online)', flush=True)
+        result = run_load(port, panel, [s['id'] for s in servers], args.duration, args.concurrency)
+        _, stats = http_get_json(port, '/api/panel/stats')
+        result.update({
+            'fleet_size': size,
+            'running': len(running),
+            'ready_seconds': round(ready_in, 2),
+            'log_lines_written': writer.lines_written,
+            'a2s_responder': dict(responder.stats),
+            'status_snapshot': stats.get('status_snapshot') if stats else None
+        })
+        return result
+    finally:
+        if writer:
+            writer.stop()
+        if panel is not None:
+            stop_process(panel)
+        for proc in stand_ins:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        for proc in stand_ins:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        responder.stop()
+        if args.keep_workspace:
+            print(f'  workspace mantido em {workspace}')
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+def print_summary(results):
+    print(f"\n{'N':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'erros':>7} {'RSS máx MB':>11} {'CPU %':>7} {'coleta s':>9}")
+    for r in results:
+        collection = (r.get('status_snapshot') or {}).get('collection_duration')
+        print(f"{r['fleet_size']:>5} {r['rps']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7} "
+              f"{r['panel_rss_max_mb']:>11} {r['panel_cpu_avg']:>7} {collection if collection is not None else '-':>9}")
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.fleet_sizes.split(',') if s.strip()]
+    results = []
+    for size in sizes:
+        print(f'frota de {size} instâncias', flush=True)
+        try:
+            results.append(simulate_fleet(args, size))
+        except RuntimeError as e:
+            # Registrar onde o painel deixou de dar conta e parar de crescer a frota
+            print(f'  falhou: {e}', flush=True)
+            results.append({'fleet_size': size, 'failed': str(e)})
+            break
+        r = results[-1]
+        print(f"  {r['requests']} requisições, {r['rps']} req/s, p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms, "
+              f"{r['errors']} erros, RSS máx {r['panel_rss_max_mb']} MB", flush=True)
+    print_summary([r for r in results if 'failed' not in r])
+    output = args.output or f"simulate_results_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump({'meta': {'started_at': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                            'cpu_count': os.cpu_count(), 'args': vars(args)},
+                   'results': results}, f, indent=2)
+    print(f'resultados gravados em {output}')
+    return 0
+if __name__ == '__main__':
+    sys.exit(main())
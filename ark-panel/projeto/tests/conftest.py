@@ -0,0 +1,35 @@
+"""
+Fixtures dos testes do painel
+
+Executar a partir de ark-panel/projeto:
+
+    python -m pytest -q tests
+
+O app.py é carregado num workspace temporário (app.py e templates por link simbólico), então
+config, logs e run criados pelo import ficam fora da árvore real.
+"""
+import importlib.util
+import os
+import sys
+import pytest
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+@pytest.fixture(scope='session')
+def panel(tmp_path_factory):
+    """Módulo app.py importado num workspace isolado"""
+    workspace = tmp_path_factory.mktemp('panel')
+    for name in ('app.py', 'templates'):
+        os.symlink(os.path.join(PROJECT_DIR, name), workspace / name)
+    spec = importlib.util.spec_from_file_location('app', workspace / 'app.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['app'] = module
+    spec.loader.exec_module(module)
+    return module
+@pytest.fixture
+def write_log(tmp_path):
+    """Gravar linhas (str) num arquivo de log temporário e devolver o caminho"""
+    def write(lines, name='server.log'):
+        path = tmp_path / name
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lines)
+        return str(path)
+    return write
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+import pytest
+SERVER = {'id': 1, 'name': 'Servidor 1', 'map': 'TheIsland', 'ip': '127.0.0.1', 'query_port': 27015}
+OK = {'state': 'ok', 'player_count': 5, 'max_players': 70, 'map_name': 'TheIsland', 'server_name': 'ARK'}
+FAILED = {'state': 'timeout', 'player_count': 0, 'max_players': 0, 'map_name': 'TheIsland',
+          'server_name': 'Servidor 1', 'error': 'timed out'}
+@pytest.fixture
+def cache(panel, monkeypatch):
+    """Cache A2S vazio, com TTL e backoff conhecidos"""
+    monkeypatch.setattr(panel, '_a2s_cache', {})
+    monkeypatch.setattr(panel, '_a2s_cache_stats', {key: 0 for key in panel._a2s_cache_stats})
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'a2s_cache_ttl', 5)
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'a2s_backoff_base', 2)
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'a2s_backoff_max', 10)
+    return panel
+def expire(panel, server=SERVER):
+    panel._a2s_cache[(server['ip'], server['query_port'])]['expires_at'] = 0
+def ttl(panel, server=SERVER):
+    entry = panel._a2s_cache[(server['ip'], server['query_port'])]
+    return entry['expires_at'] - panel.time.time()
+def test_success_is_reused_until_ttl(cache):
+    assert cache.get_cached_player_count(SERVER) is None
+    cache.store_player_count(SERVER, OK)
+    assert cache.get_cached_player_count(SERVER) == OK
+    assert 4 < ttl(cache) <= 5
+    expire(cache)
+    assert cache.get_cached_player_count(SERVER) is None
+    stats = cache.get_a2s_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 1)
+def test_failures_back_off_exponentially_up_to_max(cache):
+    waits = []
+    for _ in range(5):
+        cache.store_player_count(SERVER, FAILED)
+        waits.append(round(ttl(cache)))
+    assert waits == [2, 4, 8, 10, 10]
+    assert cache.get_cached_player_count(SERVER)['state'] == 'timeout'
+    assert cache.get_a2s_cache_stats()['negative_hits'] == 1
+    assert cache.get_a2s_cache_stats()['backing_off'] == 1
+    cache.store_player_count(SERVER, OK)  # Um sucesso zera a sequência de falhas
+    assert cache._a2s_cache[('127.0.0.1', 27015)]['failures'] == 0
+    cache.store_player_count(SERVER, FAILED)
+    assert round(ttl(cache)) == 2
+def test_invalidate_forces_new_query(cache):
+    cache.store_player_count(SERVER, OK)
+    cache.invalidate_player_count(SERVER)
+    cache.invalidate_player_count(SERVER)  # Sem entrada: não conta
+    assert cache.get_cached_player_count(SERVER) is None
+    assert cache.get_a2s_cache_stats()['invalidations'] == 1
+def test_concurrent_queries_use_the_cache(cache, monkeypatch):
+    calls = []
+    def fake_info(address, timeout):
+        calls.append(address)
+        if address[1] == 27016:
+            raise ConnectionRefusedError('Connection refused')
+        return SimpleNamespace(player_count=5, max_players=70, map_name='TheIsland', server_name='ARK')
+    monkeypatch.setattr(cache.a2s, 'info', fake_info)
+    down = dict(SERVER, id=2, query_port=27016)
+    first = cache.query_players_concurrently([SERVER, down], timeout=0.2)
+    second = cache.query_players_concurrently([SERVER, down], timeout=0.2)
+    assert len(calls) == 2  # Segunda rodada: sucesso no TTL e falha em backoff
+    assert second == first
+    assert second[2]['state'] == 'error'
+    expire(cache)
+    cache.query_players_concurrently([SERVER, down], timeout=0.2)
+    assert calls[2:] == [('127.0.0.1', 27015)]
@@ -0,0 +1,50 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+def make_server(server_id, query_port):
+    return {'id': server_id, 'name': f'Servidor {server_id}', 'map': 'TheIsland', 'ip': '127.0.0.1',
+            'query_port': query_port}
+@pytest.fixture
+def a2s_replies(panel, monkeypatch):
+    """Trocar a2s.info por respostas definidas por porta: número de jogadores, 'hang', 'timeout' ou 'error'"""
+    replies = {}
+    calls = []
+    release = threading.Event()
+    def fake_info(address, timeout):
+        calls.append(address)
+        reply = replies[address[1]]
+        if reply == 'hang':  # Servidor que ignora o timeout do socket
+            release.wait(10)
+            raise socket.timeout()
+        if reply == 'timeout':
+            time.sleep(timeout)
+            raise socket.timeout()
+        if reply == 'error':
+            raise ConnectionRefusedError('Connection refused')
+        return SimpleNamespace(player_count=reply, max_players=70, map_name='TheIsland', server_name='ARK')
+    monkeypatch.setattr(panel.a2s, 'info', fake_info)
+    yield SimpleNamespace(replies=replies, calls=calls)
+    release.set()
+def test_queries_run_in_parallel(panel, a2s_replies):
+    servers = [make_server(n, 28001 + n) for n in range(6)]
+    for server in servers:
+        a2s_replies.replies[server['query_port']] = 'timeout'
+    started = time.time()
+    results = panel.query_players_concurrently(servers, timeout=0.3)
+    assert time.time() - started < 0.3 * 3  # Em série seriam 6 x 0.3s
+    assert {r['state'] for r in results.values()} == {'timeout'}
+def test_hard_deadline_for_hung_server(panel, a2s_replies):
+    servers = [make_server(1, 28101), make_server(2, 28102), make_server(3, 28103)]
+    a2s_replies.replies.update({28101: 12, 28102: 'hang', 28103: 'error'})
+    started = time.time()
+    results = panel.query_players_concurrently(servers, timeout=0.2)
+    assert time.time() - started < 1.5
+    assert results[1]['state'] == 'ok' and results[1]['player_count'] == 12
+    assert results[2]['state'] == 'timeout' and results[2]['player_count'] == 0
+    assert results[3]['state'] == 'error' and 'refused' in results[3]['error']
+    assert results[3]['server_name'] == 'Servidor 3'
+def test_no_servers(panel, a2s_replies):
+    assert panel.query_players_concurrently([], timeout=0.2) == {}
+    assert a2s_replies.calls == []
@@ -0,0 +1,25 @@
+import pytest
+@pytest.fixture
+def client(panel, monkeypatch):
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'admin_token', '')
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'admin_allow_localhost', False)
+    return panel.app.test_client()
+def profile(client, headers=None, remote_addr='127.0.0.1'):
+    return client.get('/api/panel/profile?seconds=0.1&interval_ms=10', headers=headers or {},
+                      environ_base={'REMOTE_ADDR': remote_addr})
+def test_denied_without_token_even_from_localhost(client):
+    # Atrás de um proxy reverso toda requisição chega de 127.0.0.1
+    assert profile(client).status_code == 403
+    assert profile(client, remote_addr='::1').status_code == 403
+def test_localhost_only_with_explicit_opt_in(panel, client, monkeypatch):
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'admin_allow_localhost', True)
+    response = profile(client)
+    assert response.status_code == 200
+    assert int(response.headers['X-Profile-Samples']) >= 1
+    assert profile(client, remote_addr='10.0.0.5').status_code == 403
+def test_token(panel, client, monkeypatch):
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'admin_token', 'segredo')
+    assert profile(client, {'X-Admin-Token': 'segredo'}, remote_addr='10.0.0.5').status_code == 200
+    assert profile(client, {'Authorization': 'Bearer segredo'}, remote_addr='10.0.0.5').status_code == 200
+    assert profile(client, {'X-Admin-Token': 'errado'}).status_code == 403
+    assert profile(client).status_code == 403
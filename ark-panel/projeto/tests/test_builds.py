@@ -0,0 +1,63 @@
+import os
+import time
+import pytest
+APP_INFO = '''"376030"
+{
+	"common"
+	{
+		"name"		"ARK: Survival Evolved Dedicated Server"
+	}
+	"depots"
+	{
+		"Branches"
+		{
+			"public"
+			{
+				"BuildID"		"11111111"
+			}
+			"preaquatica"
+			{
+				"buildid"		"22222222"
+				"description"		"Antes de \\"Aquatica\\""
+			}
+		}
+	}
+}
+'''
+def write_manifest(server_path, text):
+    os.makedirs(os.path.join(server_path, 'steamapps'), exist_ok=True)
+    path = os.path.join(server_path, 'steamapps', 'appmanifest_376030.acf')
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+def test_parse_vdf_nested_and_case_insensitive(panel):
+    data = panel.parse_vdf(APP_INFO)
+    branches = data['376030']['depots']['branches']
+    assert branches['public'] == {'buildid': '11111111'}
+    assert branches['preaquatica']['buildid'] == '22222222'
+    assert branches['preaquatica']['description'] == 'Antes de \\"Aquatica\\"'
+    assert data['376030']['common']['name'] == 'ARK: Survival Evolved Dedicated Server'
+@pytest.mark.parametrize('manifest, expected', [
+    # Formato gravado pelo SteamCMD atual (chaves em minúsculas no UserConfig)
+    ('"AppState"\n{\n\t"buildid"\t\t"22222222"\n\t"UserConfig"\n\t{\n\t\t"betakey"\t\t"preaquatica"\n\t}\n}\n',
+     {'buildid': '22222222', 'branch': 'preaquatica'}),
+    ('"AppState"\n{\n\t"buildid"\t\t"22222222"\n\t"MountedConfig"\n\t{\n\t\t"BetaKey"\t\t"preaquatica"\n\t}\n}\n',
+     {'buildid': '22222222', 'branch': 'preaquatica'}),
+    ('"appstate"\n{\n\t"BuildID"\t\t"11111111"\n\t"UserConfig"\n\t{\n\t\t"betakey"\t\t""\n\t}\n}\n',
+     {'buildid': '11111111', 'branch': 'public'}),
+])
+def test_get_installed_build_reads_manifest(panel, tmp_path, manifest, expected):
+    server_path = str(tmp_path / 'server')
+    write_manifest(server_path, manifest)
+    assert panel.get_installed_build(server_path) == expected
+def test_get_installed_build_without_manifest(panel, tmp_path):
+    assert panel.get_installed_build(str(tmp_path / 'nada')) is None
+def test_check_build_current_preaquatica(panel, tmp_path, monkeypatch):
+    server_path = str(tmp_path / 'server')
+    write_manifest(server_path, '"AppState"\n{\n\t"buildid"\t\t"22222222"\n'
+                                '\t"UserConfig"\n\t{\n\t\t"betakey"\t\t"preaquatica"\n\t}\n}\n')
+    builds = {name: b['buildid'] for name, b in panel.parse_vdf(APP_INFO)['376030']['depots']['branches'].items()}
+    monkeypatch.setattr(panel, '_latest_builds', {'builds': builds, 'fetched_at': time.time()})
+    assert panel.check_build_current(server_path, 'preaquatica') == {
+        'installed': '22222222', 'installed_branch': 'preaquatica', 'latest': '22222222', 'up_to_date': True}
+    assert panel.check_build_current(server_path, 'public')['up_to_date'] is False
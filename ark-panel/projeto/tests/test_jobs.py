@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+import psutil
+import pytest
+@pytest.fixture
+def spawn():
+    """Processos de teste (encerrados no fim); argumentos extras aparecem na cmdline"""
+    procs = []
+    def start(*args):
+        proc = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)', *args])
+        procs.append(proc)
+        return proc
+    yield start
+    for proc in procs:
+        proc.kill()
+        proc.wait()
+def create_time(pid):
+    return psutil.Process(pid).create_time()
+def test_kill_job_process_kills_matching_steamcmd(panel, spawn):
+    proc = spawn('steamcmd.sh')
+    assert panel.kill_job_process(proc.pid, create_time(proc.pid))
+    assert proc.wait(timeout=10) is not None
+def test_kill_job_process_spares_reused_pid(panel, spawn):
+    proc = spawn('steamcmd.sh')
+    # Mesmo PID, outro processo (create_time diferente)
+    assert not panel.kill_job_process(proc.pid, create_time(proc.pid) - 60)
+    # Processo sem SteamCMD na cmdline
+    other = spawn('qualquer')
+    assert not panel.kill_job_process(other.pid, create_time(other.pid))
+    # Tarefa gravada sem create_time: nunca encerrar
+    assert not panel.kill_job_process(proc.pid, None)
+    assert proc.poll() is None and other.poll() is None
+def test_load_jobs_requeues_without_killing_unrelated_pid(panel, spawn, tmp_path, monkeypatch):
+    unrelated = spawn('outro-programa')
+    jobs_file = tmp_path / 'jobs.json'
+    jobs_file.write_text(json.dumps({'next_id': 3, 'jobs': [
+        {'id': 1, 'type': 'install', 'server_id': 1, 'params': {}, 'status': 'running', 'message': None,
+         'pid': unrelated.pid, 'pid_create_time': create_time(unrelated.pid), 'attempts': 1},
+        {'id': 2, 'type': 'update', 'server_id': 2, 'params': {}, 'status': 'succeeded', 'message': 'ok',
+         'pid': None, 'attempts': 1},
+    ]}))
+    monkeypatch.setattr(panel, 'JOBS_FILE', str(jobs_file))
+    monkeypatch.setattr(panel, '_jobs', {})
+    assert panel.load_jobs() == [1]
+    assert unrelated.poll() is None
+    saved = {job['id']: job for job in json.loads(jobs_file.read_text())['jobs']}
+    assert saved[1]['status'] == 'queued' and saved[1]['pid'] is None
+    assert saved[2]['status'] == 'succeeded'
@@ -0,0 +1,73 @@
+import os
+def make_lines(first, count):
+    return [f'[2026-01-01 00:00:00] linha {i}\n' for i in range(first, first + count)]
+def append(path, lines):
+    with open(path, 'a') as f:
+        f.writelines(lines)
+def test_tail_then_follow(panel, write_log):
+    log_file = write_log(make_lines(0, 100))
+    window = panel.read_log_window(log_file, 10)
+    assert window['lines'] == make_lines(90, 10)
+    assert not window['reset']
+    cursor = window['cursor']
+    assert cursor['end'] == cursor['size'] == os.path.getsize(log_file)
+    append(log_file, make_lines(100, 5))
+    window = panel.read_log_window(log_file, 100, after=cursor['end'], inode=cursor['inode'], size=cursor['size'])
+    assert window['lines'] == make_lines(100, 5)
+    assert not window['reset']
+def test_partial_last_line_waits_for_newline(panel, write_log):
+    log_file = write_log(make_lines(0, 3) + ['escrevendo...'])
+    window = panel.read_log_window(log_file, 10)
+    assert window['lines'] == make_lines(0, 3)
+    append(log_file, [' pronto\n'])
+    window = panel.read_log_window(log_file, 10, after=window['cursor']['end'])
+    assert window['lines'] == ['escrevendo... pronto\n']
+def test_page_backwards_until_start(panel, write_log):
+    lines = make_lines(0, 25)
+    log_file = write_log(lines)
+    collected = []
+    before = None
+    while True:
+        window = panel.read_log_window(log_file, 10, before=before)
+        collected = window['lines'] + collected
+        before = window['cursor']['start']
+        if before == 0:
+            break
+    assert collected == lines
+def test_reset_when_file_replaced(panel, write_log, tmp_path):
+    log_file = write_log(make_lines(0, 10))
+    cursor = panel.read_log_window(log_file, 5)['cursor']
+    replacement = tmp_path / 'novo.log'
+    replacement.write_text(''.join(make_lines(500, 20)))
+    os.replace(replacement, log_file)
+    window = panel.read_log_window(log_file, 5, after=cursor['end'], inode=cursor['inode'], size=cursor['size'])
+    assert window['reset']
+    assert window['lines'] == make_lines(515, 5)
+def test_reset_after_copytruncate_and_regrowth(panel, write_log):
+    log_file = write_log(make_lines(0, 50))
+    cursor = panel.read_log_window(log_file, 5)['cursor']
+    # Mesmo inode, truncado e com novo conteúdo maior que o offset antigo
+    with open(log_file, 'r+b') as f:
+        f.truncate(0)
+    append(log_file, ['x' * 37 + '\n' for _ in range(200)])
+    assert os.path.getsize(log_file) > cursor['end']
+    window = panel.read_log_window(log_file, 5, after=cursor['end'], inode=cursor['inode'], size=cursor['size'])
+    assert window['reset']
+    assert all(line == 'x' * 37 + '\n' for line in window['lines'])
+def test_reset_when_shrunk_below_cursor_size(panel, write_log):
+    log_file = write_log(make_lines(0, 50))
+    cursor = panel.read_log_window(log_file, 5)['cursor']
+    with open(log_file, 'r+b') as f:
+        f.truncate(0)
+    append(log_file, make_lines(0, 10))
+    # Offset ainda cai num início de linha, mas o arquivo ficou menor que no cursor
+    size = os.path.getsize(log_file)
+    window = panel.read_log_window(log_file, 5, after=size, inode=cursor['inode'], size=cursor['size'])
+    assert window['reset']
+    assert window['lines'] == make_lines(5, 5)
+def test_search_window(panel, write_log):
+    lines = make_lines(0, 300)
+    log_file = write_log(lines)
+    search = panel.compile_log_search('linha 1')
+    window = panel.read_log_window(log_file, 3, search=search)
+    assert window['lines'] == [l for l in lines if 'linha 1' in l][-3:]
@@ -0,0 +1,92 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+START = datetime(2026, 3, 1, 12, 0, 0)
+@pytest.fixture
+def index(panel, tmp_path, monkeypatch):
+    """Índice de timestamps com pontos densos e diretório próprio do teste"""
+    monkeypatch.setattr(panel, 'LOG_INDEX_DIR', str(tmp_path / 'index'))
+    monkeypatch.setattr(panel, '_log_time_indexes', {})
+    monkeypatch.setattr(panel, 'LOG_INDEX_INTERVAL', 2048)
+    monkeypatch.setattr(panel, 'LOG_INDEX_PROBE_BYTES', 512)
+    os.makedirs(panel.LOG_INDEX_DIR)
+    return panel
+def make_lines(first, count):
+    """Uma linha por segundo; a cada 7 linhas uma continuação sem timestamp"""
+    lines = []
+    for i in range(first, first + count):
+        ts = (START + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S')
+        lines.append(f'[{ts}] [INFO] evento {i}\n')
+        if i % 7 == 0:
+            lines.append(f'    continuação do evento {i}\n')
+    return lines
+def timestamped_offsets(path):
+    """Referência: (chave, offset) de cada linha com timestamp"""
+    result = []
+    offset = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            head = raw[:21].decode('ascii', errors='replace')
+            if head.startswith('[') and head[20:21] == ']':
+                result.append((int(''.join(ch for ch in head[1:20] if ch.isdigit())), offset))
+            offset += len(raw)
+    return result
+@pytest.mark.parametrize('line, expected', [
+    ('[2026-03-01 12:00:05] texto', 20260301120005),
+    ('[2026-03-01 12:00:05]', 20260301120005),
+    ('2026-03-01 12:00:05 sem colchetes', None),
+    ('[2026/03/01 12:00:05] separador', None),
+    ('[2026-03-01 12:0x:05] letra', None),
+    ('[curto]', None),
+    ('', None),
+])
+def test_parse_log_timestamp(panel, line, expected):
+    assert panel.parse_log_timestamp(line) == expected
+def assert_bounds_cover(panel, path, start, end):
+    region_start, region_end = panel.find_log_date_bounds(path, start, end)
+    start_key = panel.datetime_to_log_key(start) if start else None
+    end_key = panel.datetime_to_log_key(end) if end else None
+    for key, offset in timestamped_offsets(path):
+        if (start_key is None or key >= start_key) and (end_key is None or key <= end_key):
+            assert region_start <= offset < region_end, (key, offset)
+    return region_start, region_end
+def test_bounds_cover_every_line_in_window(index, write_log):
+    path = write_log(make_lines(0, 3000))
+    size = os.path.getsize(path)
+    for first, last in ((0, 10), (1000, 1100), (2990, 3000), (1500, 1500), (-50, 20)):
+        region = assert_bounds_cover(index, path, START + timedelta(seconds=first), START + timedelta(seconds=last))
+        # A região fica restrita a poucos intervalos do índice em vez do arquivo inteiro
+        assert region[1] - region[0] < size / 4
+    assert assert_bounds_cover(index, path, None, None) == (0, size)
+def test_index_is_incremental(index, write_log):
+    path = write_log(make_lines(0, 1000))
+    first = index.update_log_time_index(path)
+    checkpoints = [list(c) for c in first['checkpoints']]
+    with open(path, 'a') as f:
+        f.writelines(make_lines(1000, 1000))
+    extended = index.update_log_time_index(path)
+    assert extended['checkpoints'][:len(checkpoints)] == checkpoints
+    assert extended['size'] == os.path.getsize(path)
+    # Pontos válidos: cada um aponta para o início de uma linha com o timestamp registrado
+    reference = dict((offset, key) for key, offset in timestamped_offsets(path))
+    assert all(reference.get(offset) == key for key, offset in extended['checkpoints'])
+    # Índice persistido: outra instância (sem cache em memória) parte dele
+    index._log_time_indexes.clear()
+    assert index.load_log_time_index(path) == extended
+    assert_bounds_cover(index, path, START + timedelta(seconds=1500), START + timedelta(seconds=1600))
+def test_index_rebuilt_after_truncation(index, write_log):
+    path = write_log(make_lines(0, 2000))
+    index.update_log_time_index(path)
+    with open(path, 'r+b') as f:
+        f.truncate(0)
+    with open(path, 'a') as f:
+        f.writelines(make_lines(5000, 100))
+    rebuilt = index.update_log_time_index(path)
+    assert rebuilt['checkpoints'][0] == [index.datetime_to_log_key(START + timedelta(seconds=5000)), 0]
+    assert_bounds_cover(index, path, START + timedelta(seconds=5050), START + timedelta(seconds=5060))
+def test_partial_last_line_is_indexed_later(index, write_log):
+    path = write_log(['[2026-03-01 12:00:00] escrevendo'])
+    assert index.update_log_time_index(path)['checkpoints'] == []
+    with open(path, 'a') as f:
+        f.write(' pronto\n')
+    assert index.update_log_time_index(path)['checkpoints'] == [[20260301120000, 0]]
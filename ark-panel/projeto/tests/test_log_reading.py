@@ -0,0 +1,35 @@
+import os
+import pytest
+def make_lines(count):
+    return [f'[2026-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}] linha {i} ' + 'x' * (i % 37) + '\n' for i in range(count)]
+@pytest.mark.parametrize('block_size', [7, 64, 4096])
+def test_iter_log_lines_reverse_matches_readlines(panel, write_log, block_size):
+    lines = make_lines(500)
+    log_file = write_log(lines)
+    result = list(panel.iter_log_lines_reverse(log_file, block_size=block_size))
+    assert [line for _, line in result] == lines[::-1]
+    offsets = [0]
+    for line in lines[:-1]:
+        offsets.append(offsets[-1] + len(line.encode('utf-8')))
+    assert [offset for offset, _ in result] == offsets[::-1]
+def test_iter_log_lines_reverse_partial_last_line_and_end(panel, write_log):
+    log_file = write_log(['a\n', 'b\n', 'sem fim'])
+    assert [line for _, line in panel.iter_log_lines_reverse(log_file)] == ['sem fim', 'b\n', 'a\n']
+    assert [line for _, line in panel.iter_log_lines_reverse(log_file, end=4)] == ['b\n', 'a\n']
+    assert list(panel.iter_log_lines_reverse(write_log([], name='vazio.log'))) == []
+def test_iter_log_lines_reverse_survives_truncation(panel, write_log):
+    # Rotação por copytruncate durante a leitura não pode derrubar o processo (antes: SIGBUS via mmap)
+    log_file = write_log(make_lines(20000))
+    seen = 0
+    for _ in panel.iter_log_lines_reverse(log_file, block_size=4096):
+        seen += 1
+        if seen == 100:
+            os.truncate(log_file, 1000)
+    assert seen < 20000
+def test_tail_log_lines_with_filter(panel, write_log):
+    lines = make_lines(300)
+    log_file = write_log(lines)
+    assert panel.tail_log_lines(log_file, 5) == lines[-5:]
+    only_even = lambda line: int(line.split()[3]) % 2 == 0
+    assert panel.tail_log_lines(log_file, 3, only_even) == [l for l in lines if only_even(l)][-3:]
+    assert panel.tail_log_lines(log_file, 0) == []
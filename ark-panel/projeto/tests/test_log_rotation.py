@@ -0,0 +1,66 @@
+import gzip
+import os
+from datetime import datetime
+import pytest
+@pytest.fixture
+def rotation(panel, tmp_path, monkeypatch):
+    """Estado de rotação próprio do teste"""
+    monkeypatch.setattr(panel, 'LOG_ROTATION_STATE_FILE', str(tmp_path / 'log_rotation.json'))
+    return panel
+def wait_compression(panel):
+    """Esperar a fila de compactação (um único worker) esvaziar"""
+    panel._log_compress_executor.submit(lambda: None).result()
+def write_archive(path, lines):
+    with gzip.open(path, 'wb') as f:
+        f.write(''.join(lines).encode())
+def test_rotate_copytruncate_and_compress(rotation, write_log):
+    lines = [f'linha {i}\n' for i in range(100)]
+    log_file = write_log(lines, 'server_1.log')
+    inode = os.stat(log_file).st_ino
+    segment = rotation.rotate_log_file(log_file)
+    wait_compression(rotation)
+    # Mesmo arquivo (escritores com O_APPEND continuam nele), agora vazio
+    assert os.stat(log_file).st_ino == inode
+    assert os.path.getsize(log_file) == 0
+    assert not os.path.exists(segment)
+    assert rotation.get_log_archives(log_file) == [segment + '.gz']
+    with gzip.open(segment + '.gz', 'rt') as f:
+        assert f.readlines() == lines
+    assert rotation.rotate_log_file(log_file) is None  # Nada a rotacionar
+def test_archives_newest_first_and_retention(rotation, write_log, monkeypatch):
+    log_file = write_log(['atual\n'], 'server_1.log')
+    directory = os.path.dirname(log_file)
+    stamps = ['20260101-000000', '20260301-000000', '20260201-000000']
+    for stamp in stamps:
+        write_archive(os.path.join(directory, f'server_1.log.{stamp}.gz'), [f'{stamp}\n'])
+    write_archive(os.path.join(directory, 'server_10.log.20260401-000000.gz'), ['outro servidor\n'])
+    assert [os.path.basename(a) for a in rotation.get_log_archives(log_file)] == [
+        'server_1.log.20260301-000000.gz', 'server_1.log.20260201-000000.gz', 'server_1.log.20260101-000000.gz']
+    monkeypatch.setitem(rotation.PANEL_SETTINGS, 'log_retention_count', 2)
+    monkeypatch.setitem(rotation.PANEL_SETTINGS, 'log_retention_days', 100000)
+    rotation.apply_log_retention(log_file)
+    assert [os.path.basename(a) for a in rotation.get_log_archives(log_file)] == [
+        'server_1.log.20260301-000000.gz', 'server_1.log.20260201-000000.gz']
+    assert os.path.exists(os.path.join(directory, 'server_10.log.20260401-000000.gz'))
+def test_window_continues_into_archives(rotation, write_log):
+    log_file = write_log(['[2026-03-02 00:00:00] atual 0\n', '[2026-03-02 00:00:01] atual 1\n'], 'server_1.log')
+    directory = os.path.dirname(log_file)
+    write_archive(os.path.join(directory, 'server_1.log.20260302-000000.gz'),
+                  [f'[2026-03-01 00:00:0{i}] recente {i}\n' for i in range(5)])
+    write_archive(os.path.join(directory, 'server_1.log.20260201-000000.gz'),
+                  [f'[2026-02-01 00:00:0{i}] antigo {i}\n' for i in range(5)])
+    window = rotation.extend_window_with_archives(log_file, rotation.read_log_window(log_file, 8), 8)
+    assert [line.split('] ')[1].strip() for line in window['lines']] == [
+        'antigo 4', 'recente 0', 'recente 1', 'recente 2', 'recente 3', 'recente 4', 'atual 0', 'atual 1']
+    assert window['archives'] == ['server_1.log.20260302-000000.gz', 'server_1.log.20260201-000000.gz']
+    # Busca atravessando os arquivos, parando nos rotacionados antes do início da janela
+    search = rotation.compile_log_search(terms=['antigo', 'recente 2'], match='any')
+    window = rotation.extend_window_with_archives(log_file, rotation.read_log_window(log_file, 10, search=search), 10,
+                                                  search=search, start_date=datetime(2026, 2, 15))
+    assert [line.split('] ')[1].strip() for line in window['lines']] == ['recente 2']
+    assert window['archives'] == ['server_1.log.20260302-000000.gz']
+def test_allowed_log_files(rotation):
+    assert rotation.is_allowed_log_file(1, 'server_1.log')
+    assert rotation.is_allowed_log_file(1, 'install_server_1.log.20260101-000000.gz')
+    assert not rotation.is_allowed_log_file(1, 'server_10.log.20260101-000000.gz')
+    assert not rotation.is_allowed_log_file(1, '../server_1.log')
@@ -0,0 +1,77 @@
+import random
+import re
+import pytest
+LEVELS = ['INFO', 'WARNING', 'ERROR', 'AVISO', 'FATAL', 'DEBUG']
+def make_lines(count, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        level = rng.choice(LEVELS)
+        word = rng.choice(['foo', 'bar', 'Foo', 'baz', 'errors', 'player joined', 'ServerERROR'])
+        lines.append(f'[2026-01-01 00:00:{i % 60:02d}] {level}: {word} linha {i}' + ' [x]' * (i % 3) + '\n')
+    return lines
+def naive_scan(panel, lines, search):
+    """Referência: testar cada linha isolada com log_search_matches"""
+    matched = []
+    offset = 0
+    for line in lines:
+        raw = line.encode('utf-8')
+        if panel.log_search_matches(search, raw):
+            matched.append((offset, line))
+        offset += len(raw)
+    return matched[::-1]
+QUERIES = [
+    dict(search_term='foo'),
+    dict(terms=['foo', 'linha 1']),
+    dict(terms=['foo', 'bar'], match='any'),
+    dict(terms=['nunca aparece', 'foo'], match='any'),
+    dict(level='ERROR'),
+    dict(level='ERROR,WARN'),
+    dict(search_term='baz', level='INFO'),
+    dict(search_term=r'^\[2026', regex=True),
+    dict(search_term=r'\]$', regex=True),
+    dict(search_term=r'foo\s+\[', regex=True),
+    dict(search_term=r'linha \d+5$', regex=True),
+    dict(terms=[r'^x', r'baz'], match='any', regex=True),
+    dict(search_term='foo', level='ERROR'),
+]
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('block_size', [256, 4096, 1024 * 1024])
+def test_iter_log_matches_reverse_equals_naive_scan(panel, write_log, query, block_size):
+    lines = make_lines(3000)
+    log_file = write_log(lines)
+    search = panel.compile_log_search(**query)
+    found = list(panel.iter_log_matches_reverse(log_file, search, block_size=block_size))
+    assert found == naive_scan(panel, lines, search)
+def test_regex_anchors_are_per_line(panel, write_log):
+    lines = [f'linha {i} foo\n' if i % 2000 else f'linha {i}\n' for i in range(20000)]
+    log_file = write_log(lines)
+    def count(pattern):
+        search = panel.compile_log_search(pattern, regex=True)
+        return sum(1 for _ in panel.iter_log_matches_reverse(log_file, search))
+    assert count('^') == 20000
+    assert count(r'\d$') == 10
+    # Casamento que atravessa a quebra de linha não conta
+    assert count(r'foo\s+l') == 0
+def test_regex_per_line_check_ignores_terminator(panel):
+    search = panel.compile_log_search('^$', regex=True)
+    assert not panel.log_search_matches(search, b'abc\n')
+    assert panel.log_search_matches(search, b'\n')
+    search = panel.compile_log_search(r'abc$', regex=True)
+    assert panel.log_search_matches(search, b'xabc\r\n')
+def test_level_matches_whole_words(panel):
+    search = panel.compile_log_search(level='ERROR')
+    assert panel.log_search_matches(search, b'[x] ERROR: falhou\n')
+    assert panel.log_search_matches(search, b'[x] erro ao salvar\n')
+    assert not panel.log_search_matches(search, b'[x] ServerERRORS\n')
+    with pytest.raises(ValueError):
+        panel.compile_log_search(level='NADA')
+    with pytest.raises(re.error):
+        panel.compile_log_search('(', regex=True)
+def test_search_respects_end_offset(panel, write_log):
+    lines = make_lines(500)
+    log_file = write_log(lines)
+    end = sum(len(l.encode('utf-8')) for l in lines[:200])
+    search = panel.compile_log_search('foo')
+    found = list(panel.iter_log_matches_reverse(log_file, search, end=end, block_size=512))
+    assert found == naive_scan(panel, lines[:200], search)
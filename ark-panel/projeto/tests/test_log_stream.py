@@ -0,0 +1,124 @@
+import json
+import os
+import time
+import pytest
+def make_lines(first, count):
+    return [f'[2026-01-01 00:00:00] linha {i}\n' for i in range(first, first + count)]
+def append(path, lines):
+    with open(path, 'a') as f:
+        f.writelines(lines)
+def parse_events(chunks):
+    """Converter a saída SSE em [(id, evento, dados)] (keepalives e 'retry' ignorados)"""
+    events = []
+    for block in ''.join(chunks).split('\n\n'):
+        fields = {}
+        for line in block.split('\n'):
+            name, sep, value = line.partition(': ')
+            if sep and name in ('id', 'event', 'data'):
+                fields[name] = value
+        if 'id' in fields:
+            events.append((fields['id'], fields.get('event', 'message'),
+                           json.loads(fields['data']) if 'data' in fields else None))
+    return events
+def delivered_text(events):
+    return ''.join(data for _, event, data in events if event == 'message' and data)
+def test_read_log_chunk_complete_lines_only(panel, write_log):
+    log_file = write_log(make_lines(0, 3) + ['escrevendo'])
+    chunk = panel.read_log_chunk(log_file, 0)
+    assert chunk['data'] == ''.join(make_lines(0, 3)).encode()
+    assert chunk['size'] == os.path.getsize(log_file) and not chunk['reset']
+    # Offset no meio de uma linha: cursor inválido, recomeça do início
+    assert panel.read_log_chunk(log_file, 5)['reset']
+    assert panel.read_log_chunk(log_file, 5, aligned=False)['data'] == chunk['data'][5:]
+    assert panel.read_log_chunk(log_file, 0, inode=os.stat(log_file).st_ino + 1)['reset']
+def test_resume_replays_lines_written_since_cursor(panel, write_log):
+    log_file = write_log(make_lines(0, 10))
+    cursor = panel.read_log_window(log_file, 5)['cursor']
+    append(log_file, make_lines(10, 3))  # Escritas entre a leitura inicial e a assinatura
+    stream = panel.new_log_stream(log_file, None, {'inode': cursor['inode'], 'after': cursor['end'], 'size': cursor['size']})
+    events = parse_events(panel.log_stream_catch_up(stream))
+    assert delivered_text(events) == ''.join(make_lines(10, 3))
+    assert events[-1][0] == f"{cursor['inode']}:{os.path.getsize(log_file)}"
+def test_deliver_trims_overlap_and_fills_gaps(panel, write_log):
+    lines = make_lines(0, 20)
+    log_file = write_log(lines)
+    inode = os.stat(log_file).st_ino
+    data = ''.join(lines).encode()
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    stream = panel.new_log_stream(log_file, None, {'inode': inode, 'after': offsets[5], 'size': None})
+    sent = list(panel.log_stream_catch_up(stream))
+    # Evento do leitor compartilhado com trecho já enviado pela retomada: nada repetido
+    sent += panel.log_stream_deliver(stream, inode, offsets[3], data[offsets[3]:offsets[20]])
+    assert delivered_text(parse_events(sent)) == ''.join(lines[5:])
+    # Buraco (eventos perdidos): lido do arquivo antes do evento
+    append(log_file, make_lines(20, 5))
+    more = make_lines(25, 2)
+    append(log_file, more)
+    start = os.path.getsize(log_file) - len(''.join(more))
+    events = parse_events(panel.log_stream_deliver(stream, inode, start, ''.join(more).encode()))
+    assert delivered_text(events) == ''.join(make_lines(20, 7))
+    assert events[-1][0] == f'{inode}:{os.path.getsize(log_file)}'
+def test_replaced_file_resets_and_restarts(panel, write_log, tmp_path):
+    log_file = write_log(make_lines(0, 10))
+    cursor = panel.read_log_window(log_file, 5)['cursor']
+    replacement = tmp_path / 'novo.log'
+    replacement.write_text(''.join(make_lines(100, 2)))
+    os.replace(replacement, log_file)
+    stream = panel.new_log_stream(log_file, None, {'inode': cursor['inode'], 'after': cursor['end'], 'size': cursor['size']})
+    events = parse_events(panel.log_stream_catch_up(stream))
+    new_inode = os.stat(log_file).st_ino
+    assert events[0] == (f'{new_inode}:0', 'reset', {})
+    assert delivered_text(events) == ''.join(make_lines(100, 2))
+def test_filtered_stream_still_advances_position(panel, write_log):
+    log_file = write_log([])
+    stream = panel.new_log_stream(log_file, panel.compile_log_search('linha 3'), None)
+    append(log_file, make_lines(0, 5))
+    events = parse_events(panel.log_stream_catch_up(stream))
+    assert delivered_text(events) == make_lines(3, 1)[0]
+    assert events[-1][0].endswith(f':{os.path.getsize(log_file)}')
+def test_follower_publishes_offsets(panel, write_log, monkeypatch):
+    monkeypatch.setattr(panel, 'LOG_FOLLOW_POLL_INTERVAL', 0.01)
+    log_file = write_log(make_lines(0, 2))
+    subscriber = panel.subscribe_log(log_file)
+    try:
+        size = os.path.getsize(log_file)
+        time.sleep(0.2)  # O leitor começa no fim do arquivo que encontrar ao iniciar
+        append(log_file, make_lines(2, 3))
+        event, (inode, start, data) = subscriber.get(timeout=5)
+        assert event == 'data' and inode == os.stat(log_file).st_ino
+        assert start == size and data == ''.join(make_lines(2, 3)).encode()
+        with open(log_file, 'r+b') as f:
+            f.truncate(0)
+        append(log_file, make_lines(50, 1))
+        assert subscriber.get(timeout=5) == ('reset', inode)
+        assert subscriber.get(timeout=5) == ('data', (inode, 0, make_lines(50, 1)[0].encode()))
+    finally:
+        panel.unsubscribe_log(log_file, subscriber)
+def test_endpoint_resumes_from_last_event_id(panel, tmp_path, monkeypatch):
+    monkeypatch.setattr(panel, 'LOGS_DIR', str(tmp_path))
+    log_file = tmp_path / 'server_7.log'
+    log_file.write_text(''.join(make_lines(0, 4)))
+    inode = os.stat(log_file).st_ino
+    after = len(''.join(make_lines(0, 2)))
+    response = panel.app.test_client().get('/api/server/7/logs/stream', headers={'Last-Event-ID': f'{inode}:{after}'},
+                                           buffered=False)
+    try:
+        chunks = []
+        for chunk in response.response:
+            chunks.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+            if len(parse_events(chunks)) >= 2:
+                break
+    finally:
+        response.close()
+    events = parse_events(chunks)
+    assert delivered_text(events) == ''.join(make_lines(2, 2))
+    assert events[-1][0] == f'{inode}:{os.path.getsize(log_file)}'
+def test_stream_position_from_request(panel):
+    with panel.app.test_request_context('/?after=120&inode=5&size=300', headers={'Last-Event-ID': '9:40'}):
+        assert panel.get_log_stream_position() == {'inode': 9, 'after': 40, 'size': None}
+    with panel.app.test_request_context('/?after=120&inode=5&size=300', headers={'Last-Event-ID': 'lixo'}):
+        assert panel.get_log_stream_position() == {'inode': 5, 'after': 120, 'size': 300}
+    with panel.app.test_request_context('/'):
+        assert panel.get_log_stream_position() is None
@@ -0,0 +1,52 @@
+import os
+import threading
+def read(path):
+    with open(path) as f:
+        return f.read()
+def test_flush_waits_for_everything_queued_in_order(panel, tmp_path):
+    first, second = str(tmp_path / 'a.log'), str(tmp_path / 'b.log')
+    for i in range(200):
+        panel.write_log(first, f'a {i}\n')
+        panel.write_log(second, f'b {i}\n')
+    assert panel.flush_log_writes()  # Sem esperar o intervalo do escritor
+    assert read(first) == ''.join(f'a {i}\n' for i in range(200))
+    assert read(second) == ''.join(f'b {i}\n' for i in range(200))
+def test_installation_messages_keep_order_with_steamcmd_output(panel, tmp_path, monkeypatch):
+    monkeypatch.setattr(panel, 'LOGS_DIR', str(tmp_path))
+    log_file = str(tmp_path / 'install_server_7.log')
+    panel.log_installation('Iniciando instalação', 7)
+    panel.write_log(log_file, 'Update state (0x61) downloading, progress: 10.00 (1 / 10)\n')
+    panel.log_installation('Instalação concluída', 7)
+    assert panel.flush_log_writes()
+    lines = read(log_file).splitlines()
+    assert lines[0].endswith('Iniciando instalação')
+    assert lines[1].startswith('Update state')
+    assert lines[2].endswith('Instalação concluída')
+def test_concurrent_producers_keep_their_own_order(panel, tmp_path):
+    log_file = str(tmp_path / 'server.log')
+    def produce(name):
+        for i in range(500):
+            panel.write_log(log_file, f'{name} {i}\n')
+    threads = [threading.Thread(target=produce, args=(f't{n}',)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert panel.flush_log_writes()
+    lines = read(log_file).splitlines()
+    assert len(lines) == 2000
+    for n in range(4):
+        assert [int(line.split()[1]) for line in lines if line.startswith(f't{n} ')] == list(range(500))
+def test_replaced_file_is_reopened(panel, tmp_path):
+    log_file = str(tmp_path / 'server.log')
+    panel.write_log(log_file, 'antes\n')
+    assert panel.flush_log_writes()
+    os.replace(log_file, str(tmp_path / 'server.log.1'))  # Rotação por fora do painel
+    panel.write_log(log_file, 'depois\n')
+    assert panel.flush_log_writes()
+    assert read(str(tmp_path / 'server.log.1')) == 'antes\n'
+    assert read(log_file) == 'depois\n'
+    os.remove(log_file)
+    panel.write_log(log_file, 'recriado\n')
+    assert panel.flush_log_writes()
+    assert read(log_file) == 'recriado\n'
@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+@pytest.fixture
+def metrics(panel, tmp_path, monkeypatch):
+    """Banco de métricas vazio e próprio do teste"""
+    monkeypatch.setattr(panel, 'METRICS_DB_FILE', str(tmp_path / 'metrics.db'))
+    monkeypatch.setattr(panel, '_metrics_db', None)
+    monkeypatch.setattr(panel, '_metrics_readers', threading.local())
+    monkeypatch.setattr(panel, '_metrics_last_maintenance', float('inf'))  # Agregar só quando o teste pedir
+    yield panel
+    if panel._metrics_db is not None:
+        panel._metrics_db.close()
+def record(panel, start, end, interval=10):
+    """Amostras de um servidor a cada interval segundos; cpu = minuto da amostra, jogadores alternam"""
+    samples = []
+    for ts in range(start, end, interval):
+        sample = {'id': 1, 'status': 'online', 'cpu_percent': float(ts // 60 % 100),
+                  'memory_mb': 1000.0 + ts % 7, 'players': ts // interval % 3}
+        panel.record_metrics_samples([sample], ts)
+        samples.append((ts, sample))
+    return samples
+def expected_points(samples, start, end, step):
+    """Referência: agrupar as amostras brutas por passo (médias com a tolerância do arredondamento da API)"""
+    groups = {}
+    for ts, sample in samples:
+        if start <= ts < end:
+            groups.setdefault(ts - ts % step, []).append(sample)
+    points = []
+    for t in sorted(groups):
+        cpu = [s['cpu_percent'] for s in groups[t]]
+        players = [s['players'] for s in groups[t]]
+        points.append({'t': t, 'samples': len(cpu), 'cpu_min': min(cpu), 'cpu_max': max(cpu),
+                       'cpu_avg': pytest.approx(sum(cpu) / len(cpu), abs=0.006), 'players_max': max(players),
+                       'players_avg': pytest.approx(sum(players) / len(players), abs=0.006)})
+    return points
+def summarize(points):
+    keys = ('t', 'samples', 'cpu_min', 'cpu_max', 'cpu_avg', 'players_max', 'players_avg')
+    return [{k: p[k] for k in keys} for p in points]
+@pytest.mark.parametrize('step, resolution', [(60, 60), (900, 900), (3600, 3600)])
+def test_history_includes_open_tail(metrics, step, resolution):
+    now = int(time.time())
+    start = now - 6 * 3600
+    start -= start % 3600
+    samples = record(metrics, start, now + 1)
+    # Agregação no meio do bucket atual: o último bucket de cada nível ainda está aberto
+    metrics.maintain_metrics_history(now)
+    history = metrics.query_metrics_history(1, start, now + 1, step)
+    assert history['resolution'] == resolution
+    assert history['step'] == step
+    assert summarize(history['points']) == expected_points(samples, start, now + 1, step)
+    assert history['points'][-1]['t'] == now - now % step
+def test_history_before_any_rollup_uses_raw_samples(metrics):
+    now = int(time.time())
+    start = now - 2 * 3600
+    start -= start % 900
+    samples = record(metrics, start, now + 1, interval=30)
+    history = metrics.query_metrics_history(1, start, now + 1, 900)
+    assert history['resolution'] == 900
+    assert summarize(history['points']) == expected_points(samples, start, now + 1, 900)
+def test_rollup_is_idempotent(metrics):
+    now = int(time.time())
+    start = now - 3 * 3600
+    start -= start % 3600
+    samples = record(metrics, start, now + 1)
+    metrics.maintain_metrics_history(now - 1800)
+    metrics.maintain_metrics_history(now)
+    metrics.maintain_metrics_history(now)
+    history = metrics.query_metrics_history(1, start, now + 1, 900)
+    assert summarize(history['points']) == expected_points(samples, start, now + 1, 900)
+def test_history_route_reports_database_errors_as_json(metrics, monkeypatch):
+    def locked(*args, **kwargs):
+        raise metrics.sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(metrics, 'query_metrics_history', locked)
+    server_id = metrics.load_servers()['servers'][0]['id']
+    response = metrics.app.test_client().get(f'/api/server/{server_id}/metrics/history')
+    assert response.status_code == 503
+    assert response.get_json() == {'status': 'error', 'message': 'Histórico de métricas indisponível: database is locked'}
@@ -0,0 +1,67 @@
+import json
+import os
+import stat
+import pytest
+@pytest.fixture
+def histograms(panel, tmp_path, monkeypatch):
+    """Histogramas zerados e diretório de publicação próprio do teste"""
+    monkeypatch.setattr(panel, 'PANEL_METRICS_DIR', str(tmp_path / 'metrics'))
+    monkeypatch.setattr(panel, '_histogram_series', {name: {} for name in panel.HISTOGRAMS})
+    monkeypatch.setattr(panel, '_published_histograms', {})
+    os.makedirs(panel.PANEL_METRICS_DIR)
+    return panel
+def test_publish_round_trip(histograms):
+    histograms.observe_histogram('ark_panel_a2s_query_seconds', 0.003)
+    histograms.observe_histogram('ark_panel_http_request_seconds', 0.2, {'endpoint': 'status'})
+    histograms.publish_process_histograms()
+    histograms.refresh_published_histograms()
+    assert os.listdir(histograms.PANEL_METRICS_DIR) == [f'{os.getpid()}.json']
+    assert stat.S_IMODE(os.stat(os.path.join(histograms.PANEL_METRICS_DIR, f'{os.getpid()}.json')).st_mode) == 0o644
+    # O próprio arquivo não é somado de novo às séries vivas
+    assert histograms.merge_published_histograms() == histograms.copy_histogram_series()
+def test_merge_sums_other_workers(histograms):
+    name = 'ark_panel_http_request_seconds'
+    buckets = histograms.HISTOGRAMS[name][1]
+    histograms.observe_histogram(name, 0.2, {'endpoint': 'status'})
+    other = [0] * len(buckets)
+    other[0] = 2
+    worker = {name: [[[['endpoint', 'status']], other, 0.002, 2], [[['endpoint', 'logs']], other, 0.002, 2]],
+              'metrica_removida': [[[], [1], 1.0, 1]]}
+    with open(os.path.join(histograms.PANEL_METRICS_DIR, '99999999.json'), 'w') as f:
+        json.dump(worker, f)
+    with open(os.path.join(histograms.PANEL_METRICS_DIR, '99999998.json'), 'w') as f:
+        f.write('{incompleto')
+    histograms.refresh_published_histograms()
+    merged = histograms.merge_published_histograms()
+    status = merged[name][(('endpoint', 'status'),)]
+    assert status['count'] == 3
+    assert status['sum'] == pytest.approx(0.202)
+    assert status['counts'][0] == 2 and sum(status['counts']) == 3
+    assert merged[name][(('endpoint', 'logs'),)]['count'] == 2
+    assert 'metrica_removida' not in merged
+    # As séries vivas do processo não são alteradas pela soma
+    assert histograms.copy_histogram_series()[name][(('endpoint', 'status'),)]['count'] == 1
+def test_render_uses_merged_snapshot(histograms):
+    name = 'ark_panel_a2s_query_seconds'
+    histograms.observe_histogram(name, 0.003)
+    with open(os.path.join(histograms.PANEL_METRICS_DIR, '99999999.json'), 'w') as f:
+        json.dump({name: [[[], [1] + [0] * (len(histograms.HISTOGRAMS[name][1]) - 1), 0.001, 1]]}, f)
+    histograms.refresh_published_histograms()
+    lines = []
+    histograms.render_histograms(lines, histograms.merge_published_histograms())
+    assert f'{name}_count 2' in lines
+def test_merge_reads_no_files(histograms, monkeypatch):
+    name = 'ark_panel_a2s_query_seconds'
+    with open(os.path.join(histograms.PANEL_METRICS_DIR, '99999999.json'), 'w') as f:
+        json.dump({name: [[[], [1] + [0] * (len(histograms.HISTOGRAMS[name][1]) - 1), 0.001, 1]]}, f)
+    assert histograms.merge_published_histograms()[name] == {}  # Ainda não relido pelo publicador
+    histograms.refresh_published_histograms()
+    def no_io(*args, **kwargs):
+        raise AssertionError('E/S durante /metrics')
+    monkeypatch.setattr(os, 'listdir', no_io)
+    monkeypatch.setattr('builtins.open', no_io)
+    histograms.observe_histogram(name, 0.003)
+    merged = histograms.merge_published_histograms()
+    assert merged[name][()]['count'] == 2
+    # A soma não altera o cache: a próxima requisição parte dos mesmos valores
+    assert histograms.merge_published_histograms()[name][()]['count'] == 2
@@ -0,0 +1,61 @@
+import os
+import shutil
+import subprocess
+import pytest
+SERVER = {'id': 1, 'name': 'Servidor 1', 'map': 'TheIsland', 'game_port': 7777}
+@pytest.fixture
+def registry(panel, tmp_path, monkeypatch):
+    """Registro de PIDs vazio com pidfiles num diretório run próprio do teste"""
+    run_dir = tmp_path / 'run'
+    run_dir.mkdir()
+    monkeypatch.setattr(panel, 'RUN_DIR', str(run_dir))
+    monkeypatch.setattr(panel, '_server_processes', {})
+    monkeypatch.setattr(panel, '_last_process_scan', 0.0)
+    return panel
+@pytest.fixture
+def game_server(tmp_path):
+    """Processo real chamado ShooterGameServer com a linha de comando de TheIsland na porta 7777"""
+    exe = tmp_path / 'ShooterGameServer'
+    shutil.copy('/bin/sh', exe)
+    process = subprocess.Popen([str(exe), '-c', 'sleep 30; exit 0', 'TheIsland?listen?SessionName=ARK', '-Port=7777'])
+    yield process
+    process.kill()
+    process.wait()
+def read_pid_file(panel, server_id):
+    with open(panel.get_pid_file(server_id)) as f:
+        return int(f.read())
+def test_register_then_exit_unregisters(registry, game_server):
+    registry.register_server_process(SERVER, game_server.pid)
+    assert read_pid_file(registry, 1) == game_server.pid
+    assert registry.get_tracked_process(SERVER).pid == game_server.pid
+    game_server.kill()
+    game_server.wait()
+    assert registry.get_tracked_process(SERVER) is None
+    assert not os.path.exists(registry.get_pid_file(1))
+def test_adopt_running_server_from_pidfile(registry, game_server):
+    with open(registry.get_pid_file(1), 'w') as f:
+        f.write(f'{game_server.pid}\n')
+    registry.adopt_server_processes([SERVER])
+    assert registry.get_tracked_process(SERVER).pid == game_server.pid
+@pytest.mark.parametrize('content', ['abc\n', f'{os.getpid()}\n', '999999999\n'])
+def test_stale_pidfile_is_removed(registry, content):
+    # Lixo, PID de outro processo (reutilizado) ou PID que não existe mais
+    with open(registry.get_pid_file(1), 'w') as f:
+        f.write(content)
+    registry.adopt_server_processes([SERVER])
+    assert registry.get_tracked_process(SERVER) is None
+    assert not os.path.exists(registry.get_pid_file(1))
+def test_process_matches_server(registry, game_server):
+    proc = registry.psutil.Process(game_server.pid)
+    assert registry.process_matches_server(proc, SERVER)
+    assert not registry.process_matches_server(proc, dict(SERVER, game_port=7779))
+    assert not registry.process_matches_server(registry.psutil.Process(), SERVER)
+def test_scan_registers_servers_started_outside_the_panel(registry, game_server, monkeypatch):
+    other = dict(SERVER, id=2, map='Ragnarok', game_port=7779)
+    index = registry.get_server_processes([SERVER, other], force_scan=True)
+    assert list(index) == [('TheIsland', 7777)]
+    assert read_pid_file(registry, 1) == game_server.pid
+    # Já registrado: a próxima coleta não varre a tabela de processos
+    monkeypatch.setattr(registry, 'build_process_index', lambda: pytest.fail('varredura desnecessária'))
+    monkeypatch.setitem(registry.PANEL_SETTINGS, 'process_rescan_interval', 3600)
+    assert registry.get_server_processes([SERVER])[('TheIsland', 7777)].pid == game_server.pid
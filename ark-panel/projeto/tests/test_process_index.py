@@ -0,0 +1,61 @@
+import pytest
+class FakeProcess:
+    """Processo mínimo para psutil.process_iter(['name']), contando as leituras de cmdline"""
+    def __init__(self, pid, name, cmdline, error=None):
+        self.pid = pid
+        self.info = {'name': name}
+        self._cmdline = cmdline
+        self._error = error
+        self.cmdline_reads = 0
+    def cmdline(self):
+        self.cmdline_reads += 1
+        if self._error is not None:
+            raise self._error
+        return self._cmdline
+def server_process(pid, map_name, port, in_url=False):
+    url = f'{map_name}?listen?SessionName=ARK?Port={port}' if in_url else f'{map_name}?listen?SessionName=ARK'
+    args = ['ShooterGameServer', url, '-server', '-log']
+    if not in_url:
+        args.insert(2, f'-Port={port}')
+    return FakeProcess(pid, 'ShooterGameServ', args)
+@pytest.fixture
+def process_table(panel, monkeypatch):
+    """Tabela de processos falsa servida por psutil.process_iter"""
+    table = []
+    monkeypatch.setattr(panel.psutil, 'process_iter', lambda attrs=None: iter(table))
+    return table
+@pytest.mark.parametrize('cmdline, expected', [
+    (['ShooterGameServer', 'TheIsland?listen?SessionName=A', '-Port=7777', '-server'], ('TheIsland', 7777)),
+    (['ShooterGameServer', 'Ragnarok?listen?Port=7779?QueryPort=27017'], ('Ragnarok', 7779)),
+    (['ShooterGameServer', 'Aberration_P?listen?Port=1', '-Port=7781'], ('Aberration_P', 7781)),
+    (['ShooterGameServer', 'TheCenter?listen', '-Port=abc'], ('TheCenter', None)),
+    (['ShooterGameServer', '-server', '-log'], (None, None)),
+])
+def test_parse_server_cmdline(panel, cmdline, expected):
+    assert panel.parse_server_cmdline(cmdline) == expected
+def test_index_by_map_and_game_port(panel, process_table):
+    island_a = server_process(101, 'TheIsland', 7777)
+    island_b = server_process(102, 'TheIsland', 7779, in_url=True)
+    ragnarok = server_process(103, 'Ragnarok', 7781)
+    process_table.extend([island_a, island_b, ragnarok])
+    index = panel.build_process_index()
+    assert index == {('TheIsland', 7777): island_a, ('TheIsland', 7779): island_b, ('Ragnarok', 7781): ragnarok}
+    # Dois servidores do mesmo mapa não se confundem: a porta faz parte da chave
+    assert panel.find_server_process({'map': 'TheIsland', 'game_port': 7779}, index) is island_b
+    assert not panel.check_server_process({'map': 'TheIsland', 'game_port': 7783}, index)
+def test_cmdline_read_only_for_server_processes(panel, process_table):
+    others = [FakeProcess(pid, name, [f'/usr/bin/{name}']) for pid, name in ((1, 'systemd'), (2, 'sshd'), (3, None))]
+    island = server_process(104, 'TheIsland', 7777)
+    process_table.extend(others + [island])
+    assert list(panel.build_process_index()) == [('TheIsland', 7777)]
+    assert [proc.cmdline_reads for proc in others] == [0, 0, 0]
+    assert island.cmdline_reads == 1
+def test_vanished_or_protected_processes_are_skipped(panel, process_table):
+    island = server_process(105, 'TheIsland', 7777)
+    process_table.extend([
+        FakeProcess(106, 'ShooterGameServ', None, error=panel.psutil.NoSuchProcess(106)),
+        FakeProcess(107, 'ShooterGameServ', None, error=panel.psutil.AccessDenied(107)),
+        FakeProcess(108, 'ShooterGameServ', []),
+        island,
+    ])
+    assert panel.build_process_index() == {('TheIsland', 7777): island}
@@ -0,0 +1,71 @@
+import json
+import os
+import pytest
+def make_server(server_id, game_port, **extra):
+    server = {'id': server_id, 'name': f'Servidor {server_id}', 'map': 'TheIsland', 'game_port': game_port,
+              'query_port': game_port + 20000, 'rcon_port': game_port + 25000, 'path': f'/srv/ark/{server_id}'}
+    server.update(extra)
+    return server
+@pytest.fixture
+def registry(panel, tmp_path, monkeypatch):
+    """Registro vazio lendo um servers.json próprio do teste, sem o intervalo entre verificações"""
+    monkeypatch.setattr(panel, 'CONFIG_DIR', str(tmp_path))
+    monkeypatch.setattr(panel, 'SERVERS_FILE', str(tmp_path / 'servers.json'))
+    monkeypatch.setattr(panel, 'SERVER_REGISTRY_CHECK_INTERVAL', 0)
+    monkeypatch.setattr(panel, '_server_registry', {'data': None, 'by_id': {},
+                                                    'by_port': {key: {} for key in panel.SERVER_PORT_KEYS},
+                                                    'signature': None, 'checked_at': 0.0, 'errors': []})
+    return panel
+def write_servers(panel, data):
+    """Gravar o arquivo por fora do painel (como um editor faria), mudando a assinatura"""
+    with open(panel.SERVERS_FILE, 'w') as f:
+        json.dump(data, f)
+    st = os.stat(panel.SERVERS_FILE)
+    os.utime(panel.SERVERS_FILE, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+def test_reload_only_when_file_changes(registry):
+    write_servers(registry, {'servers': [make_server(1, 7777)]})
+    data = registry.load_servers()
+    assert registry.load_servers() is data  # Mesmo arquivo: sem reler
+    write_servers(registry, {'servers': [make_server(1, 7777), make_server(2, 7779)]})
+    assert [s['id'] for s in registry.load_servers()['servers']] == [1, 2]
+    assert registry.get_server(2)['path'] == '/srv/ark/2'
+    assert registry.get_server_by_port(27779, 'query_port')['id'] == 2
+def test_missing_file_is_created_with_defaults(registry):
+    data = registry.load_servers()
+    assert os.path.exists(registry.SERVERS_FILE)
+    assert data == registry.ALL_ARK_MAPS
+def test_port_conflicts_reported(registry):
+    write_servers(registry, {'servers': [make_server(1, 7777), make_server(2, 7778)]})
+    registry.load_servers()
+    errors = registry.get_server_config_errors(2)
+    assert errors and errors[0]['server_ids'] == [1, 2]
+    assert registry.get_server_config_errors(3) == []
+@pytest.mark.parametrize('bad', [
+    {'oops': []},
+    {'servers': {'1': make_server(1, 7777)}},
+    {'servers': [make_server(1, 7777), {k: v for k, v in make_server(2, 7779).items() if k != 'game_port'}]},
+    {'servers': [{k: v for k, v in make_server(1, 7777).items() if k != 'path'}]},
+    {'servers': [dict(make_server(1, 7777), game_port='7777')]},
+    [make_server(1, 7777)],
+])
+def test_invalid_file_keeps_last_valid_config(registry, bad):
+    write_servers(registry, {'servers': [make_server(1, 7777)]})
+    good = registry.load_servers()
+    write_servers(registry, bad)
+    assert registry.load_servers() is good
+    assert registry.get_server(1)['game_port'] == 7777
+    assert registry.get_server_by_port(7777)['id'] == 1
+    assert registry.get_server(2) is None
+    # Corrigido o arquivo, a nova configuração é carregada
+    write_servers(registry, {'servers': [make_server(1, 7777), make_server(2, 7779)]})
+    assert registry.get_server(2)['game_port'] == 7779
+def test_invalid_file_on_first_load_uses_defaults(registry):
+    write_servers(registry, {'oops': []})
+    assert registry.load_servers() == registry.ALL_ARK_MAPS
+    with open(registry.SERVERS_FILE) as f:
+        assert json.load(f) == {'oops': []}  # O arquivo do usuário não é sobrescrito
+def test_save_rejects_invalid_config(registry):
+    registry.save_servers({'servers': [make_server(1, 7777)]})
+    with pytest.raises(ValueError):
+        registry.save_servers({'servers': [{'id': 2}]})
+    assert [s['id'] for s in registry.load_servers()['servers']] == [1]
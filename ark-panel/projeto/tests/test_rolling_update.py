@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+import pytest
+SERVERS = [{'id': n, 'name': f'Servidor {n}', 'map': 'TheIsland', 'game_port': 7775 + 2 * n, 'ip': '127.0.0.1',
+            'query_port': 27013 + 2 * n, 'path': f'/srv/ark/{n}'} for n in (1, 2, 3)]
+@pytest.fixture
+def fleet(panel, monkeypatch):
+    """Frota falsa: servidores rodando com jogadores, steamcmd e A2S simulados, registro das chamadas"""
+    state = SimpleNamespace(running={}, players={}, never_back=set(), update_fails=set(), up_to_date=set(),
+                            calls=[], results={})
+    def get_server_processes(servers):
+        return {(s['map'], s['game_port']): object() for s in servers if s['id'] in state.running}
+    def query_players(servers):
+        return {s['id']: {'state': 'ok', 'player_count': state.players.get(s['id'], 0)} for s in servers}
+    def terminate(server):
+        state.calls.append(('stop', server['id']))
+        state.running.pop(server['id'], None)
+    def launch(server):
+        state.calls.append(('start', server['id']))
+        state.running[server['id']] = True
+    def update(path, server_id, branch, job_id):
+        state.calls.append(('update', server_id))
+        return server_id not in state.update_fails
+    def player_count(server, timeout=None):
+        ok = server['id'] in state.running and server['id'] not in state.never_back
+        return {'state': 'ok' if ok else 'timeout', 'player_count': 0}
+    def build(path, branch):
+        return {'up_to_date': any(path == f'/srv/ark/{n}' for n in state.up_to_date), 'installed': '100'}
+    monkeypatch.setattr(panel, 'get_servers_by_ids', lambda ids: [s for s in SERVERS if s['id'] in ids])
+    monkeypatch.setattr(panel, 'get_server_processes', get_server_processes)
+    monkeypatch.setattr(panel, 'query_players_concurrently', query_players)
+    monkeypatch.setattr(panel, 'terminate_server', terminate)
+    monkeypatch.setattr(panel, 'launch_server', launch)
+    monkeypatch.setattr(panel, 'update_server_steamcmd', update)
+    monkeypatch.setattr(panel, 'get_real_player_count', player_count)
+    monkeypatch.setattr(panel, 'check_build_current', build)
+    monkeypatch.setattr(panel, 'get_installed_build', lambda path: '100')
+    monkeypatch.setattr(panel, 'update_job', lambda job_id, results: state.results.update(results))
+    monkeypatch.setattr(panel, 'log_installation', lambda message, server_id=None: None)
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'shared_install', False)
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'rolling_update_poll_interval', 0.01)
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'rolling_update_boot_timeout', 0.2)
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'rolling_update_drain_timeout', 0.3)
+    return state
+def run_job(panel, concurrency=1):
+    job = {'id': 1, 'params': {'server_ids': [1, 2, 3], 'branch': 'preaquatica', 'concurrency': concurrency}}
+    return panel.execute_rolling_update_job(job)
+def test_empty_servers_first_and_busy_ones_after_drain(panel, fleet):
+    fleet.running.update({1: True, 2: True})
+    fleet.players.update({1: 4})  # 3 está parado, 2 está vazio
+    success, message = run_job(panel)
+    assert success
+    assert [server_id for action, server_id in fleet.calls if action == 'update'] == [3, 2, 1]
+    assert ('start', 3) not in fleet.calls  # Parado antes da atualização: continua parado
+    assert fleet.results['1']['players_at_start'] == 4
+    assert {r['status'] for r in fleet.results.values()} == {'updated'}
+    assert fleet.running == {1: True, 2: True}
+def test_server_not_coming_back_aborts_the_rest(panel, fleet):
+    fleet.running.update({1: True, 2: True, 3: True})
+    fleet.players.update({2: 1, 3: 2})
+    fleet.never_back.add(1)
+    success, message = run_job(panel)
+    assert not success
+    assert fleet.results['1']['status'] == 'failed'
+    assert 'A2S' in fleet.results['1']['error']
+    assert fleet.results['2'] == fleet.results['3'] == {'status': 'not_started'}
+    assert [server_id for action, server_id in fleet.calls if action == 'update'] == [1]
+    assert message.startswith('0 de 3')
+def test_failed_update_restarts_old_build_and_halts(panel, fleet):
+    fleet.running.update({1: True, 2: True})
+    fleet.up_to_date.add(3)
+    fleet.update_fails.add(1)
+    success, _ = run_job(panel)
+    assert not success
+    assert fleet.results['1']['status'] == 'failed'
+    assert 'atualização' in fleet.results['1']['error']
+    assert fleet.calls == [('stop', 1), ('update', 1), ('start', 1)]  # De volta ao ar com a build anterior
+    assert fleet.results['2'] == {'status': 'not_started'}
+    assert fleet.running == {1: True, 2: True}
+def test_up_to_date_servers_are_skipped(panel, fleet):
+    fleet.up_to_date.update({1, 3})
+    success, _ = run_job(panel, concurrency=2)
+    assert success
+    assert fleet.results['1']['status'] == fleet.results['3']['status'] == 'skipped'
+    assert [server_id for action, server_id in fleet.calls if action == 'update'] == [2]
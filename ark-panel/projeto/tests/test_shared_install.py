@@ -0,0 +1,58 @@
+import os
+import pytest
+BASE_FILES = {
+    'ShooterGame/Binaries/Linux/ShooterGameServer': b'\x7fELF binario',
+    'ShooterGame/Content/Maps/TheIsland.umap': b'mapa' * 100,
+    'ShooterGame/Content/Mods/111111111/mod.pak': b'mod oficial',
+    'ShooterGame/Content/Mods/111111111.mod': b'descritor',
+    'ShooterGame/Saved/Config/LinuxServer/GameUserSettings.ini': b'[base]',
+    'ShooterGame/Config/DefaultGame.ini': b'[ini]',
+    'steamapps/workshop/content/346110/1/mod.pak': b'workshop',
+    'steamapps/appmanifest_376030.acf': b'"AppState" {}',
+}
+@pytest.fixture
+def base(tmp_path):
+    base_path = tmp_path / 'base'
+    for rel, content in BASE_FILES.items():
+        path = base_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return str(base_path)
+def same_file(a, b):
+    return os.path.samefile(a, b)
+def test_materialize_links_game_files_and_copies_writable_ones(panel, base, tmp_path):
+    server = {'id': 1, 'path': str(tmp_path / 'server')}
+    stats = panel.materialize_server_from_base(server, base, 'preaquatica', mode='auto')
+    server_path = server['path']
+    join = os.path.join
+    assert same_file(join(base, 'ShooterGame/Content/Maps/TheIsland.umap'),
+                     join(server_path, 'ShooterGame/Content/Maps/TheIsland.umap'))
+    for rel in ('ShooterGame/Content/Mods/111111111/mod.pak', 'ShooterGame/Content/Mods/111111111.mod',
+                'ShooterGame/Config/DefaultGame.ini', 'steamapps/appmanifest_376030.acf'):
+        assert not same_file(join(base, rel), join(server_path, rel)), rel
+        with open(join(server_path, rel), 'rb') as f:
+            assert f.read() == BASE_FILES[rel]
+    assert not os.path.exists(join(server_path, 'ShooterGame/Saved'))
+    assert not os.path.exists(join(server_path, 'steamapps/workshop'))
+    assert stats['hardlink'] == 2
+    # Mod atualizado pelo servidor não altera a base
+    with open(join(server_path, 'ShooterGame/Content/Mods/111111111/mod.pak'), 'wb') as f:
+        f.write(b'baixado pelo servidor')
+    with open(join(base, 'ShooterGame/Content/Mods/111111111/mod.pak'), 'rb') as f:
+        assert f.read() == BASE_FILES['ShooterGame/Content/Mods/111111111/mod.pak']
+def test_materialize_replaces_old_hardlink_into_mods(panel, base, tmp_path):
+    # Clone anterior com o mod ligado à base por hardlink
+    server_path = tmp_path / 'server'
+    rel = 'ShooterGame/Content/Mods/111111111/mod.pak'
+    (server_path / rel).parent.mkdir(parents=True)
+    os.link(os.path.join(base, rel), server_path / rel)
+    panel.materialize_server_from_base({'id': 1, 'path': str(server_path)}, base, 'preaquatica', mode='auto')
+    assert not same_file(os.path.join(base, rel), server_path / rel)
+def test_materialize_is_incremental(panel, base, tmp_path):
+    server = {'id': 1, 'path': str(tmp_path / 'server')}
+    panel.materialize_server_from_base(server, base, 'preaquatica', mode='auto')
+    os.remove(os.path.join(base, 'ShooterGame/Content/Maps/TheIsland.umap'))
+    stats = panel.materialize_server_from_base(server, base, 'preaquatica', mode='auto')
+    assert stats['removed'] == 1
+    assert stats['hardlink'] == stats['copy'] == stats['reflink'] == 0
+    assert not os.path.exists(os.path.join(server['path'], 'ShooterGame/Content/Maps/TheIsland.umap'))
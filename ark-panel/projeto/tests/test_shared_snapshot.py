@@ -0,0 +1,25 @@
+import os
+import stat
+import pytest
+@pytest.fixture
+def shared(panel, tmp_path, monkeypatch):
+    """Snapshot compartilhado num diretório run próprio do teste"""
+    monkeypatch.setattr(panel, 'RUN_DIR', str(tmp_path))
+    monkeypatch.setattr(panel, 'STATUS_SNAPSHOT_FILE', str(tmp_path / 'status_snapshot.json'))
+    monkeypatch.setattr(panel, '_panel_role', dict(panel._panel_role, leader=True, snapshot_signature=None))
+    monkeypatch.setattr(panel, '_status_snapshot', dict(panel._status_snapshot))
+    return panel
+def test_snapshot_round_trip_and_readable_by_other_users(shared):
+    servers = [{'id': 1, 'status': 'online', 'players': 3}, {'id': 2, 'status': 'offline', 'players': 0}]
+    shared.write_shared_snapshot(servers, 1000.0, 0.25)
+    assert stat.S_IMODE(os.stat(shared.STATUS_SNAPSHOT_FILE).st_mode) == 0o644
+    assert [name for name in os.listdir(shared.RUN_DIR) if name.startswith('.')] == []
+    shared._panel_role['leader'] = False
+    shared.load_shared_snapshot()
+    assert shared._status_snapshot['servers'] == servers
+    assert shared._status_snapshot['by_id'][2]['status'] == 'offline'
+    assert shared._status_snapshot['updated_at'] == 1000.0
+def test_follower_does_not_write(shared):
+    shared._panel_role['leader'] = False
+    shared.write_shared_snapshot([], 1000.0, 0.1)
+    assert not os.path.exists(shared.STATUS_SNAPSHOT_FILE)
@@ -0,0 +1,46 @@
+import pytest
+SERVERS = [{'id': 1, 'name': 'Servidor 1', 'map': 'TheIsland', 'game_port': 7777},
+           {'id': 2, 'name': 'Servidor 2', 'map': 'Ragnarok', 'game_port': 7779}]
+@pytest.fixture
+def collected(panel, tmp_path, monkeypatch):
+    """Snapshot vazio, coletor sem thread e métricas falsas; devolve os ids de cada coleta"""
+    collected = []
+    def fake_metrics(server, *args, **kwargs):
+        collected.append(server['id'])
+        return {'status': 'online' if server['id'] == 1 else 'offline', 'players': 3 if server['id'] == 1 else 0}
+    monkeypatch.setattr(panel, '_status_snapshot', {'servers': [], 'by_id': {}, 'updated_at': None, 'duration': 0.0})
+    monkeypatch.setattr(panel, 'start_status_collector', lambda: None)
+    monkeypatch.setattr(panel, '_panel_role', dict(panel._panel_role, started=True, leader=True))
+    monkeypatch.setattr(panel, 'RUN_DIR', str(tmp_path))
+    monkeypatch.setattr(panel, 'STATUS_SNAPSHOT_FILE', str(tmp_path / 'status_snapshot.json'))
+    monkeypatch.setitem(panel.PANEL_SETTINGS, 'metrics_history_enabled', False)
+    monkeypatch.setattr(panel, 'load_servers', lambda: {'servers': SERVERS})
+    monkeypatch.setattr(panel, 'get_server_metrics', fake_metrics)
+    return collected
+def test_refresh_publishes_snapshot(panel, collected):
+    servers, by_id, age = panel.get_status_snapshot()
+    assert (servers, by_id, age) == ([], {}, None)
+    panel.refresh_status_snapshot()
+    servers, by_id, age = panel.get_status_snapshot()
+    assert [s['status'] for s in servers] == ['online', 'offline']
+    assert by_id[1]['players'] == 3 and by_id[1]['map'] == 'TheIsland'
+    assert 0 <= age < 5
+    assert panel._status_snapshot['duration'] >= 0
+    servers.clear()  # Cópias: quem lê não altera o snapshot publicado
+    assert len(panel.get_status_snapshot()[0]) == 2
+def test_requests_are_served_from_snapshot(panel, collected):
+    panel.refresh_status_snapshot()
+    assert collected == [1, 2]
+    client = panel.app.test_client()
+    for _ in range(3):
+        response = client.get('/api/servers')
+        assert response.status_code == 200
+        assert [s['id'] for s in response.get_json()] == [1, 2]
+        assert response.get_json()[0]['snapshot_age'] is not None
+        assert float(response.headers['X-Snapshot-Age']) >= 0
+    assert collected == [1, 2]  # Nenhuma coleta por requisição
+def test_request_status_refresh_wakes_collector(panel, collected):
+    panel._status_refresh_event.clear()
+    panel.request_status_refresh()
+    assert panel._status_refresh_event.is_set()
+    panel._status_refresh_event.clear()
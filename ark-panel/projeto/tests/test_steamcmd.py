@@ -0,0 +1,55 @@
+import pytest
+ENTRIES = [{'server_id': sid, 'path': f'/srv/ark/{sid}', 'branch': 'preaquatica'} for sid in (11, 12, 13)]
+def batch_output(*results):
+    """Saída de uma sessão em lote: bootstrap, login e um bloco de progresso + resultado por entrada"""
+    lines = ['Redirecting stderr to \'/home/arkserver/Steam/logs/stderr.txt\'\n',
+             'Logging in user \'anonymous\' to Steam Public...OK\n']
+    for result in results:
+        lines.append(' Update state (0x61) downloading, progress: 50.00 (500 / 1000)\n')
+        lines.append(result + '\n')
+    return lines
+@pytest.mark.parametrize('line, success, detail', [
+    ("Success! App '376030' fully installed.", True, 'fully installed.'),
+    ("Success! App '376030' already up to date.", True, 'already up to date.'),
+    ("Error! App '376030' state is 0x602 after update job.", False, 'state is 0x602 after update job.'),
+    ("ERROR! Failed to install app '376030' (Disk write failure)", False, '(Disk write failure)'),
+    ("ERROR! App '376030' state is 0x202 after update job.", False, 'state is 0x202 after update job.'),
+    ("  Success! App '376030' fully installed.  \n", True, 'fully installed.'),
+])
+def test_parse_steamcmd_result_lines(panel, line, success, detail):
+    assert panel.parse_steamcmd_line(line) == {'event': 'result', 'success': success, 'detail': detail}
+@pytest.mark.parametrize('line', [
+    'Loading Steam API...OK',
+    "Logging in user 'anonymous' to Steam Public...OK",
+    'Error: something unrelated',
+    "Please use force_install_dir before logon! App '376030'",
+])
+def test_parse_steamcmd_ignores_other_lines(panel, line):
+    assert panel.parse_steamcmd_line(line) is None
+def test_build_steamcmd_runscript(panel):
+    script = panel.build_steamcmd_runscript([
+        {'server_id': 1, 'path': '/srv/a', 'branch': 'preaquatica'},
+        {'server_id': 2, 'path': '/srv/b', 'branch': 'public'},
+    ])
+    lines = script.splitlines()
+    assert lines[0] == '@ShutdownOnFailedCommand 0'
+    assert lines.count('login anonymous') == 1
+    assert lines[-5:] == ['force_install_dir /srv/a', 'app_update 376030 -beta preaquatica',
+                          'force_install_dir /srv/b', 'app_update 376030', 'quit']
+def test_batch_output_attributes_each_result_in_order(panel):
+    output = batch_output("Success! App '376030' fully installed.",
+                          "ERROR! Failed to install app '376030' (Disk write failure)",
+                          "Success! App '376030' already up to date.")
+    results, completed = panel.consume_steamcmd_batch_output(output, ENTRIES)
+    assert results == [True, False, True]
+    assert completed == 3
+    for entry, result in zip(ENTRIES, ('success', 'error', 'success')):
+        progress = panel.get_steamcmd_progress(entry['server_id'])
+        assert progress['result'] == result
+        assert progress['state'] == ('succeeded' if result == 'success' else 'failed')
+def test_batch_output_session_ending_early_fails_remaining(panel):
+    output = batch_output("Success! App '376030' fully installed.")
+    results, completed = panel.consume_steamcmd_batch_output(output, ENTRIES)
+    assert results == [True, False, False]
+    assert completed == 1
+    assert panel.get_steamcmd_progress(12)['state'] == 'failed'
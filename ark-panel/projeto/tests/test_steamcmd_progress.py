@@ -0,0 +1,51 @@
+import pytest
+def progress_line(code, phase, done, total):
+    return f' Update state (0x{code:x}) {phase}, progress: {done * 100 / total:.2f} ({done} / {total})'
+def test_parse_steamcmd_progress_line(panel):
+    assert panel.parse_steamcmd_line(progress_line(0x61, 'downloading', 8123456789, 18000000000) + '\n') == {
+        'event': 'progress', 'state_code': 0x61, 'phase': 'downloading', 'percent': 45.13,
+        'bytes_done': 8123456789, 'bytes_total': 18000000000}
+def test_progress_rate_eta_and_phases(panel):
+    mb = 1024 * 1024
+    progress = panel.new_steamcmd_progress(1, 'update', now=0)
+    events = [(0, 0x3, 'reconfiguring', 0), (10, 0x61, 'downloading', 0), (20, 0x61, 'downloading', 100 * mb),
+              (30, 0x61, 'downloading', 200 * mb), (40, 0x81, 'verifying update', 1000 * mb)]
+    for now, code, phase, done in events:
+        panel.apply_steamcmd_event(progress, panel.parse_steamcmd_line(progress_line(code, phase, done, 1000 * mb)), now)
+        if now == 30:
+            assert progress['rate_instant'] == pytest.approx(10 * mb)
+            assert progress['rate_average'] == pytest.approx(10 * mb)
+            assert progress['eta_seconds'] == 80
+    assert progress['phase'] == 'verifying update'
+    assert progress['rate_instant'] == 0.0
+    assert progress['eta_seconds'] == 0
+    panel.apply_steamcmd_event(progress, panel.parse_steamcmd_line("Success! App '376030' fully installed."), 45)
+    summary = panel.finish_steamcmd_progress(progress, True, now=50)
+    assert progress['state'] == 'succeeded'
+    assert summary['result'] == 'success'
+    assert summary['phases'] == {'starting': 0.0, 'reconfiguring': 10.0, 'downloading': 30.0, 'verifying update': 10.0}
+    # Bytes baixados contam até a última amostra em "downloading"; o salto de 200 MB a 1000 MB foi na verificação
+    assert summary['download_bytes'] == 200 * mb
+    assert summary['download_seconds'] == 30.0
+    assert summary['peak_mbps'] == 10.0
+    assert summary['duration_seconds'] == 50.0
+def test_rate_is_smoothed(panel):
+    progress = panel.new_steamcmd_progress(1, 'update', now=0)
+    for now, done in ((0, 0), (1, 1000), (2, 3000)):
+        panel.apply_steamcmd_event(progress, panel.parse_steamcmd_line(progress_line(0x61, 'downloading', done, 10000)), now)
+    alpha = panel.STEAMCMD_RATE_SMOOTHING
+    assert progress['rate_instant'] == pytest.approx(alpha * 2000 + (1 - alpha) * 1000)
+    assert progress['rate_average'] == pytest.approx(1500)
+def test_summarize_transcript_with_timestamps(panel):
+    lines = ['[2026-01-01 10:00:00] Iniciando atualização\n',
+             '[2026-01-01 10:00:00] ' + progress_line(0x61, 'downloading', 0, 4000) + '\n',
+             '[2026-01-01 10:00:20] ' + progress_line(0x61, 'downloading', 4000, 4000) + '\n',
+             "[2026-01-01 10:00:30] Error! App '376030' state is 0x602 after update job.\n"]
+    summary = panel.summarize_steamcmd_transcript(lines, server_id=3)
+    assert summary['state'] == 'failed'
+    assert summary['result'] == 'error'
+    assert summary['duration_seconds'] == 30.0
+    assert summary['download_bytes'] == 4000
+    assert summary['phases']['downloading'] == 30.0
+def test_summarize_transcript_without_events(panel):
+    assert panel.summarize_steamcmd_transcript(['Loading Steam API...OK\n']) is None